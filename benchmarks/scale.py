@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+Scale benchmarks for the high level client API.
+
+Seeds an offline provider with "networks" networks, "services" services in each network, and
+"paths" paths in each network, then times the read operations of the client against it.  For each
+operation this records the wall time and how many provider calls it made, as reported by
+"client.stats()", and the results are written as JSON so scaling curves can be compared between
+releases.
+
+Usage:
+
+    python benchmarks/scale.py --config 10,100,100 --config 20,500,500 --output results.json
+
+Each "--config" is a "networks,services,paths" triple, and gets its own fresh environment.
+"""
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import time
+import uuid
+
+import click
+import butter
+from butter.types.networking import CidrBlock
+
+BLUEPRINTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blueprints")
+NETWORK_BLUEPRINT = os.path.join(BLUEPRINTS_DIR, "network.yml")
+SERVICE_BLUEPRINT = os.path.join(BLUEPRINTS_DIR, "service.yml")
+DEFAULT_CONFIGS = ["1,10,10", "10,100,100", "20,500,500"]
+PORTS = [22, 80, 443, 5432, 8080]
+
+
+def seed(client, networks, services, paths, rng):
+    """
+    Create the environment to benchmark against.  Returns the services created and the
+    (source, destination, port) tuples of the paths added.
+    """
+    all_services = []
+    all_paths = []
+    internet = CidrBlock("0.0.0.0/0")
+    for network_num in range(networks):
+        network = client.network.create("bench-%s" % network_num, blueprint=NETWORK_BLUEPRINT)
+        network_services = [client.service.create(network, "service-%s" % service_num,
+                                                  SERVICE_BLUEPRINT, {})
+                            for service_num in range(services)]
+        all_services.extend(network_services)
+        if not network_services:
+            continue
+        client.paths.add(internet, network_services[0], 443)
+        all_paths.append((internet, network_services[0], 443))
+        for _ in range(paths):
+            source, destination = rng.choice(network_services), rng.choice(network_services)
+            port = rng.choice(PORTS)
+            client.paths.add(source, destination, port)
+            all_paths.append((source, destination, port))
+    return all_services, all_paths
+
+
+def measure(client, operation, function, repeat):
+    """
+    Run "function" "repeat" times, and return the timing and provider call count summary.  The
+    function should return how many high level calls it made, so we can report per call times.
+    """
+    wall_times = []
+    calls = 0
+    client.stats(reset=True)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calls = function()
+        wall_times.append(time.perf_counter() - start)
+    provider_calls = {name: stats["count"] / repeat
+                      for name, stats in sorted(client.stats()["calls"].items())}
+    return {
+        "operation": operation,
+        "repeat": repeat,
+        "calls": calls,
+        "wall_time": {
+            "min": min(wall_times),
+            "median": statistics.median(wall_times),
+            "mean": statistics.mean(wall_times),
+            "max": max(wall_times),
+            },
+        "wall_time_per_call": statistics.median(wall_times) / calls if calls else None,
+        "provider_calls": {
+            "total": sum(provider_calls.values()),
+            "per_call": sum(provider_calls.values()) / calls if calls else None,
+            "by_method": provider_calls,
+            },
+        }
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def run_benchmark(provider, networks, services, paths, repeat=3, samples=100, seed_value=0):
+    """
+    Run the benchmark for one environment size and return the results.
+    """
+    rng = random.Random(seed_value)
+    credentials = {"account": "benchmark-%s" % uuid.uuid4()}
+    client = butter.Client(provider, credentials)
+
+    start = time.perf_counter()
+    all_services, all_paths = seed(client, networks, services, paths, rng)
+    seed_time = time.perf_counter() - start
+    seed_calls = sum(stats["count"] for stats in client.stats()["calls"].values())
+
+    service_samples = [rng.choice(all_services) for _ in range(samples)] if all_services else []
+    path_samples = [rng.choice(all_paths) for _ in range(samples)] if all_paths else []
+
+    def network_list():
+        client.network.list()
+        return 1
+
+    def service_get():
+        for service in service_samples:
+            client.service.get(service.network, service.name)
+        return len(service_samples)
+
+    def service_list():
+        client.service.list()
+        return 1
+
+    def paths_list():
+        client.paths.list()
+        return 1
+
+    def paths_has_access():
+        for source, destination, port in path_samples:
+            client.paths.has_access(source, destination, port)
+        return len(path_samples)
+
+    def internet_accessible():
+        for service in service_samples:
+            client.paths.internet_accessible(service, 443)
+        return len(service_samples)
+
+    def graph():
+        client.graph()
+        return 1
+
+    operations = [("network.list", network_list), ("service.get", service_get),
+                  ("service.list", service_list), ("paths.list", paths_list),
+                  ("paths.has_access", paths_has_access),
+                  ("paths.internet_accessible", internet_accessible), ("graph", graph)]
+    return {
+        "parameters": {"networks": networks, "services": services, "paths": paths,
+                       "repeat": repeat, "samples": samples, "seed": seed_value},
+        "seed": {"wall_time": seed_time, "provider_calls": seed_calls,
+                 "services": len(all_services), "paths": len(all_paths)},
+        "results": [measure(client, name, function, repeat) for name, function in operations],
+        }
+
+
+@click.command()
+@click.option('--provider', default="memory", help="Offline provider to benchmark against.")
+@click.option('--config', "configs", multiple=True,
+              help="Environment size as \"networks,services,paths\".  Can be repeated.")
+@click.option('--repeat', default=3, help="How many times to time each operation.")
+@click.option('--samples', default=100,
+              help="How many services or paths to sample for single item operations.")
+@click.option('--seed', "seed_value", default=0, help="Random seed for the environment.")
+@click.option('--output', default="-", help="File to write the JSON results to.")
+# pylint: disable=too-many-arguments
+def main(provider, configs, repeat, samples, seed_value, output):
+    """
+    Benchmark the butter client against environments of increasing size.
+    """
+    # Logging every call would swamp the operations we are trying to time.
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("butter"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+    runs = []
+    for config in configs or DEFAULT_CONFIGS:
+        networks, services, paths = [int(value) for value in config.split(",")]
+        runs.append(run_benchmark(provider, networks, services, paths, repeat, samples,
+                                  seed_value))
+    results = json.dumps({
+        "benchmark": "scale",
+        "provider": provider,
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "runs": runs,
+        }, indent=2, sort_keys=True)
+    if output == "-":
+        click.echo(results)
+    else:
+        with open(output, "w") as output_file:
+            output_file.write(results)
+
+
+if __name__ == '__main__':
+    # pylint: disable=no-value-for-parameter
+    main()
@@ -14,10 +14,25 @@ The goal is to provide an intuitive abstraction that is powerful enough to build
 on, so that building other layers on top is easy and anything built on it is
 automatically cross cloud.
 """
+import io
+import threading
+from contextlib import contextmanager
+
 from butter import network, service, paths
+from butter.providers import get_provider
+from butter.types.common import Snapshot
+from butter.types.compact import compact_snapshot
+from butter.util.call_stats import CallRecorder, recorded_operation
+from butter.util.environment import DEFAULT_MAX_WORKERS, apply_environment
+from butter.util.exceptions import DisallowedOperationException
+from butter.util.graph_export import FORMATS, export_graph
+from butter.util.reachability import Reachability
+from butter.util.regions import regional_credentials
+from butter.util.state_store import StateStore
+from butter.util.tracing import Tracer
 
 
-# pylint: disable=too-few-public-methods
+# pylint: disable=too-many-instance-attributes
 class Client:
     """
     Butter Client Object
@@ -32,107 +47,232 @@ class Client:
         client.paths.*
 
     See the documentation on those sub-components for more details.
+
+    The network, service, and paths clients are only created the first time they are used, and they
+    all share the same provider driver.  Call "warmup" to create everything up front instead.
+
+    Every call made to the provider is recorded and attributed to the client operation that made
+    it.  See "stats" for how to get at this information.
+
+    To work with several regions at once, pass their names as "regions".  Listing then covers all of
+    them, in parallel, and everything else happens in the region of the network it's about, or the
+    first region for new networks.  See butter.util.regions.
+
+        client = butter.Client("aws", {}, regions=["us-east-1", "eu-west-1"])
+
+    To keep what the client knows in a local database, so that listing, graphs, and access checks
+    can be answered without calling the provider, pass "state_store", either the path of the
+    database or a butter.util.state_store.StateStore.  Reads then use it whenever they're given a
+    "max_staleness" it meets.  See butter.util.state_store.
+
+        client = butter.Client("aws", {}, state_store="butter-state.db")
+        client.refresh()
+        client.graph(max_staleness=300)
     """
 
-    def __init__(self, provider, credentials):
-        self.network = network.NetworkClient(provider, credentials)
-        self.service = service.ServiceClient(provider, credentials)
-        self.paths = paths.PathsClient(provider, credentials)
-
-    # pylint: disable=too-many-locals
-    def graph(self):
-        """
-        Return a human readable formatted string representation of the paths
-        graph.
-        """
-
-        def start_graph():
-            return "digraph services {\n\n"
-
-        def end_graph(graph_string):
-            graph_string += "\n}\n"
-            return graph_string
-
-        def start_cluster(graph_string, cluster_id, cluster_name):
-            graph_string += "subgraph cluster_%s {\n" % cluster_id
-            graph_string += "    label = \"%s\";\n" % cluster_name
-            return graph_string
-
-        def end_cluster(graph_string):
-            graph_string += "\n}\n"
-            return graph_string
-
-        def add_path(graph_string, from_node, to_node, protocol, port):
-            if not from_node.name:
-                cidr_blocks = [subnetwork.cidr_block for subnetwork in from_node.subnetworks]
-                from_name = ",".join(cidr_blocks)
-                from_network_name = "external"
-            else:
-                from_name = from_node.name
-                from_network_name = from_node.network.name
-            path_template = "\"%s (%s)\" -> \"%s (%s)\" [ label=\"(%s:%s)\" ];\n"
-            graph_string += path_template % (from_name, from_network_name, to_node.name,
-                                             to_node.network.name, protocol, port)
-            return graph_string
-
-        def add_node(graph_string, node_name, network_name):
-            graph_string += "    \"%s (%s)\";\n" % (node_name, network_name)
-            return graph_string
-
-        def group_paths_by_network(paths_info):
-            net_to_path = {}
-            for path in paths_info:
-                if path.network.name not in net_to_path:
-                    net_to_path[path.network.name] = []
-                net_to_path[path.network.name].append(path)
-            return net_to_path
-
-        def group_services_by_network(services_info):
-            net_to_service = {}
-            for service_info in services_info:
-                if service_info.network.name not in net_to_service:
-                    net_to_service[service_info.network.name] = []
-                net_to_service[service_info.network.name].append(service_info)
-            return net_to_service
-
-        # First group paths and services by network
-        paths_info = self.paths.list()
-        net_to_path = group_paths_by_network(paths_info)
-        services_info = self.service.list()
-        net_to_service = group_services_by_network(services_info)
-        networks_info = self.network.list()
-
-        graph_string = start_graph()
-        cluster_id = 0
-        for network_info in networks_info:
-
-            # Skip networks with no name for now
-            if not network_info.name:
-                continue
-
-            # Each network is a "cluster" in graphviz terms
-            graph_string = start_cluster(graph_string, cluster_id, network_info.name)
-            cluster_id += 1
-
-            # If the network is empty just make a placeholder node
-            if network_info.name not in net_to_service and network_info.name not in net_to_path:
-                graph_string = add_node(graph_string, "Empty Network", network_info.name)
-                graph_string = end_cluster(graph_string)
-                continue
-
-            # Otherwise, add all the services and path in this network
-            if network_info.name in net_to_service:
-                for service_info in net_to_service[network_info.name]:
-                    graph_string = add_node(graph_string, service_info.name,
-                                            service_info.network.name)
-            graph_string = end_cluster(graph_string)
-
-            # We do all paths outside the cluster so that public CIDRs will show up outside the
-            # networks.
-            if network_info.name in net_to_path:
-                for path_info in net_to_path[network_info.name]:
-                    graph_string = add_path(graph_string, path_info.source, path_info.destination,
-                                            path_info.protocol, path_info.port)
-
-        graph_string = end_graph(graph_string)
-        return graph_string
+    def __init__(self, provider, credentials, regions=None, state_store=None):
+        # Fail early on unknown providers, before any of the lazy clients get created.
+        get_provider(provider)
+        self.provider = provider
+        self.credentials = credentials
+        self.regions = list(regions) if regions else []
+        if isinstance(state_store, str):
+            state_store = StateStore(state_store)
+        self.state_store = state_store
+        self.recorder = CallRecorder()
+        self._lock = threading.RLock()
+        self._drivers = None
+        self._network = None
+        self._service = None
+        self._paths = None
+
+    @property
+    def drivers(self):
+        """
+        The driver for each region, keyed by region name, or by None if the client wasn't given any
+        regions.
+        """
+        with self._lock:
+            if self._drivers is None:
+                provider = get_provider(self.provider)
+                self._drivers = {
+                    region: provider.get_driver(regional_credentials(self.credentials, region),
+                                                recorder=self.recorder)
+                    for region in self.regions or [None]}
+            return self._drivers
+
+    @property
+    def driver(self):
+        """
+        The provider specific state shared by the network, service, and paths clients, for the
+        first region.
+        """
+        return next(iter(self.drivers.values()))
+
+    @property
+    def network(self):
+        """
+        The network client.  See butter.network.NetworkClient.
+        """
+        with self._lock:
+            if self._network is None:
+                self._network = network.NetworkClient(self.provider, self.credentials,
+                                                      recorder=self.recorder,
+                                                      drivers=self.drivers,
+                                                      state_store=self.state_store)
+            return self._network
+
+    @property
+    def service(self):
+        """
+        The service client.  See butter.service.ServiceClient.
+        """
+        with self._lock:
+            if self._service is None:
+                self._service = service.ServiceClient(self.provider, self.credentials,
+                                                      recorder=self.recorder,
+                                                      drivers=self.drivers,
+                                                      state_store=self.state_store)
+            return self._service
+
+    @property
+    def paths(self):
+        """
+        The paths client.  See butter.paths.PathsClient.
+        """
+        with self._lock:
+            if self._paths is None:
+                self._paths = paths.PathsClient(self.provider, self.credentials,
+                                                recorder=self.recorder, drivers=self.drivers,
+                                                state_store=self.state_store)
+            return self._paths
+
+    def warmup(self):
+        """
+        Create the provider driver and all the sub clients now, rather than on first use.  Useful
+        when the caller would rather pay the setup cost up front.
+        """
+        for sub_client in ["network", "service", "paths"]:
+            getattr(self, sub_client)
+        for driver in self.drivers.values():
+            if hasattr(driver, "warmup"):
+                driver.warmup()
+        return self
+
+    def stats(self, reset=False):
+        """
+        Returns statistics about the calls made to the provider so far, as a dictionary with:
+
+            calls: Stats for each kind of provider call.
+            operations: Stats for each client operation, such as "service.get", including the
+                        stats of the provider calls it made under "calls".
+
+        Each set of stats has the call count, retries, error counts by error code, total, mean,
+        min, and max latency in seconds, and a latency histogram.  Calls made outside any client
+        operation are under the "unattributed" operation.
+
+        The returned value is a snapshot that does not change as more calls are made.  Pass
+        "reset=True" to start collecting from scratch after taking it.
+        """
+        return self.recorder.snapshot(reset=reset)
+
+    @contextmanager
+    def trace(self):
+        """
+        Trace everything this client does inside the "with" block, and return the tracer with the
+        recorded spans.  See butter.util.tracing for how to export them.
+
+        Example:
+
+            with client.trace() as tracer:
+                client.service.create(network, "web", blueprint)
+            with open("trace.json", "w") as trace_file:
+                tracer.to_chrome_trace(trace_file)
+
+        """
+        tracer = Tracer()
+        previous = self.recorder.tracer
+        self.recorder.tracer = tracer
+        try:
+            yield tracer
+        finally:
+            self.recorder.tracer = previous
+
+    @recorded_operation("snapshot")
+    def snapshot(self, compact=False, max_staleness=None):
+        """
+        Returns a butter.types.common.Snapshot of all networks, services, and paths, listing each
+        of them only once.  With "compact", returns a butter.types.compact.CompactSnapshot instead,
+        which takes much less memory for large inventories.
+
+        With a state store, returns what's in the store if it was refreshed at most "max_staleness"
+        seconds ago, and otherwise refreshes it with what was listed.
+        """
+        if self.state_store and self.state_store.fresh(max_staleness):
+            snapshot = self.state_store.snapshot()
+        else:
+            services = self.service.list()
+            snapshot = Snapshot(networks=self.network.list(), services=services,
+                                paths=self.paths.list(services))
+            if self.state_store:
+                self.state_store.replace(snapshot)
+        if compact:
+            return compact_snapshot(snapshot)
+        return snapshot
+
+    @recorded_operation("apply")
+    def apply(self, spec, replace=(), dry_run=False, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Make the environment described by "spec" (a dict, or the path to a YAML file) match it,
+        changing only what's different, and return the plan of what was changed.  Services listed
+        in "replace" are redeployed even if they look up to date.  With "dry_run", only return the
+        plan.  See butter.util.environment for the spec format.
+
+        Example:
+
+            client.apply("environment.yml")
+            client.apply("environment.yml", replace=["web"])
+
+        """
+        return apply_environment(self, spec, replace, dry_run, max_workers)
+
+    def refresh(self):
+        """
+        List everything from the provider into the state store, and return the snapshot of it.
+        """
+        if not self.state_store:
+            raise DisallowedOperationException("This client has no state store to refresh")
+        return self.snapshot()
+
+    def reachability(self, max_staleness=None):
+        """
+        Returns a butter.util.reachability.Reachability index built from a snapshot of all paths,
+        for answering multi hop questions like what the internet can reach without calling the
+        provider for each one.  See "snapshot" for "max_staleness".
+        """
+        return Reachability.from_snapshot(self.snapshot(max_staleness=max_staleness))
+
+    @recorded_operation("graph")
+    def graph(self, output=None, fmt="dot", max_staleness=None):
+        """
+        Return a human readable formatted string representation of the paths graph, or write it to
+        the file object "output" as it is generated.  "fmt" can be "dot", "json", or "graphml".
+        See butter.util.graph_export for the details of each format, and "snapshot" for
+        "max_staleness".
+
+        Example:
+
+            print(client.graph())
+            with open("graph.graphml", "w") as output:
+                client.graph(output, "graphml")
+
+        """
+        if fmt not in FORMATS:
+            raise DisallowedOperationException(
+                "Unknown graph format %s, must be one of: %s" % (fmt, ", ".join(sorted(FORMATS))))
+        snapshot = self.snapshot(max_staleness=max_staleness)
+        if output is None:
+            output = io.StringIO()
+            export_graph(snapshot, output, fmt)
+            return output.getvalue()
+        return export_graph(snapshot, output, fmt)
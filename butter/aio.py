@@ -0,0 +1,309 @@
+"""
+Butter for asyncio
+
+An asyncio version of the butter client, for driving many operations at once from one event loop
+without a thread per operation.
+
+Usage:
+
+    import butter.aio
+    async with butter.aio.Client(provider, credentials) as client:
+        network = await client.network.create("network", blueprint="network.yml")
+        services = await asyncio.gather(*[
+            client.service.create(network, "web-%s" % num, "service.yml") for num in range(100)])
+
+The provider libraries all block, so provider calls run in a thread pool with at most "max_workers"
+threads, no matter how many operations are in flight.  The waits this client does itself, such as
+"service.wait", use "asyncio.sleep" and don't hold a thread.  Creating a service only holds a thread
+while the provider calls that start it are made, and then waits for its instances the same way, so
+thousands of creates can be in flight at once.
+
+Cancelling a task awaiting one of these methods cancels the operation: it's dropped if it hasn't
+started yet, and otherwise raises butter.util.exceptions.OperationCancelled in its thread at its
+next retry or wait.  Provider calls that are already in progress still finish first.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import butter
+from butter.util.blueprint import ServiceBlueprint
+from butter.util.cancellation import CancelToken, cancel_scope
+from butter.util.exceptions import DisallowedOperationException, OperationTimedOut
+
+# Default for how many provider calls can be running at once.
+DEFAULT_MAX_WORKERS = 32
+
+# How often to check on a service while waiting for it, in seconds.
+DEFAULT_WAIT_INTERVAL = 10.0
+
+
+def _running_loop():
+    # Python 3.6 has no "get_running_loop", but there "get_event_loop" returns the running loop
+    # when called from a coroutine.
+    return getattr(asyncio, "get_running_loop", asyncio.get_event_loop)()
+
+
+def _run_in_scope(token, function, args, kwargs):
+    with cancel_scope(token):
+        return function(*args, **kwargs)
+
+
+class Client:
+    """
+    Butter Client Object for asyncio
+
+    Has the same network, service, and paths clients as butter.Client, except that their methods
+    must be awaited.  The synchronous client doing the work is available as "sync_client", and the
+    two share the same provider driver, call stats, and tracing.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, provider, credentials, max_workers=DEFAULT_MAX_WORKERS, regions=None,
+                 state_store=None):
+        self.sync_client = butter.Client(provider, credentials, regions, state_store)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="butter-aio")
+        self.network = NetworkClient(self)
+        self.service = ServiceClient(self)
+        self.paths = PathsClient(self)
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Run the blocking "function" in this client's thread pool and return its result.  If the
+        awaiting task is cancelled, the function is cancelled as described in butter.aio.
+        """
+        token = CancelToken()
+        future = _running_loop().run_in_executor(
+            self._executor, _run_in_scope, token, function, args, kwargs)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            token.cancel()
+            raise
+
+    async def warmup(self):
+        """
+        Create the provider driver and all the sub clients now.  See butter.Client.warmup.
+        """
+        await self.run(self.sync_client.warmup)
+        return self
+
+    async def refresh(self):
+        """
+        List everything from the provider into the state store.  See butter.Client.refresh.
+        """
+        return await self.run(self.sync_client.refresh)
+
+    async def graph(self, output=None, fmt="dot", max_staleness=None):
+        """
+        Return a human readable formatted string representation of the paths graph, or write it to
+        the file object "output".  See butter.Client.graph.
+        """
+        return await self.run(self.sync_client.graph, output, fmt, max_staleness=max_staleness)
+
+    def stats(self, reset=False):
+        """
+        Returns statistics about the calls made to the provider so far.  See butter.Client.stats.
+        """
+        return self.sync_client.stats(reset=reset)
+
+    def trace(self):
+        """
+        Trace everything this client does inside the "with" block.  See butter.Client.trace.
+        """
+        return self.sync_client.trace()
+
+    def close(self, wait=True):
+        """
+        Shut down the thread pool.  Operations that haven't started yet are dropped.
+        """
+        self._executor.shutdown(wait=wait)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await _running_loop().run_in_executor(None, self.close)
+
+
+# pylint: disable=too-few-public-methods
+class _SubClient:
+    """
+    Base for the asyncio sub clients, which call the synchronous sub client named "name".
+    """
+
+    name = None
+
+    def __init__(self, client):
+        self.client = client
+
+    async def _call(self, method, *args, **kwargs):
+        # Look the sub client up in the pool too, since the first use creates it.
+        def call():
+            return getattr(getattr(self.client.sync_client, self.name), method)(*args, **kwargs)
+        return await self.client.run(call)
+
+
+class NetworkClient(_SubClient):
+    """
+    Butter Network Client Object for asyncio.  See butter.network.NetworkClient.
+    """
+
+    name = "network"
+
+    async def create(self, name, blueprint=None, region=None):
+        """
+        Create new network named "name" with blueprint file at "blueprint", in "region" if given.
+        """
+        return await self._call("create", name, blueprint, region)
+
+    async def get(self, name, max_staleness=None):
+        """
+        Get a network named "name" and return some data about it.
+        """
+        return await self._call("get", name, max_staleness=max_staleness)
+
+    async def destroy(self, network):
+        """
+        Destroy the given network.
+        """
+        return await self._call("destroy", network)
+
+    async def list(self, max_staleness=None):
+        """
+        List all networks.
+        """
+        return await self._call("list", max_staleness=max_staleness)
+
+
+class ServiceClient(_SubClient):
+    """
+    Butter Service Client Object for asyncio.  See butter.service.ServiceClient.
+    """
+
+    name = "service"
+
+    # pylint: disable=too-many-arguments
+    async def create(self, network, service_name, blueprint, template_vars=None, count=None,
+                     timeout=None, interval=DEFAULT_WAIT_INTERVAL, region=None):
+        """
+        Create a service in "network" named "service_name" with blueprint file at "blueprint", and
+        return it once all its instances are running.  The provider is only asked to start the
+        instances in the thread pool, and they're waited for as in "wait", with "timeout" and
+        "interval".  See butter.service.ServiceClient.create for "region".
+        """
+        def start():
+            instance_count = count or ServiceBlueprint(
+                blueprint, template_vars).availability_zone_count()
+            self.client.sync_client.service.create(network, service_name, blueprint,
+                                                   template_vars, count, wait=False,
+                                                   region=region)
+            return instance_count
+        instance_count = await self.client.run(start)
+        return await self.wait(network, service_name, instance_count, timeout=timeout,
+                               interval=interval)
+
+    async def get(self, network, service_name, max_staleness=None):
+        """
+        Get a service in "network" named "service_name".
+        """
+        return await self._call("get", network, service_name, max_staleness=max_staleness)
+
+    def get_instances(self, service):
+        """
+        Helper to return the list of instances given a service object.  This doesn't call the
+        provider, so it doesn't need to be awaited.
+        """
+        return self.client.sync_client.service.get_instances(service)
+
+    async def destroy(self, service):
+        """
+        Destroy a service described by the "service" object.
+        """
+        return await self._call("destroy", service)
+
+    async def list(self, max_staleness=None):
+        """
+        List all services.
+        """
+        return await self._call("list", max_staleness=max_staleness)
+
+    async def node_types(self):
+        """
+        Get mapping of node types to the resources.
+        """
+        return await self._call("node_types")
+
+    # pylint: disable=too-many-arguments
+    async def wait(self, network, service_name, count, state="running", timeout=None,
+                   interval=DEFAULT_WAIT_INTERVAL):
+        """
+        Wait until the service in "network" named "service_name" has at least "count" instances in
+        "state", and return it.  Raises OperationTimedOut after "timeout" seconds, if given.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            service = await self.get(network, service_name)
+            if service is None:
+                raise DisallowedOperationException(
+                    "Service %s does not exist in network %s" % (service_name, network.name))
+            if len([instance for instance in self.get_instances(service)
+                    if instance.state == state]) >= count:
+                return service
+            if deadline is not None and time.monotonic() + interval > deadline:
+                raise OperationTimedOut("Timed out waiting for %s instances of %s to be %s" %
+                                        (count, service_name, state))
+            await asyncio.sleep(interval)
+
+
+class PathsClient(_SubClient):
+    """
+    Butter Paths Client Object for asyncio.  See butter.paths.PathsClient.
+    """
+
+    name = "paths"
+
+    async def add(self, source, destination, port):
+        """
+        Make "destination" accessible from "source" on the given port.
+        """
+        return await self._call("add", source, destination, port)
+
+    async def add_many(self, paths):
+        """
+        Add every (source, destination, port) in "paths".
+        """
+        return await self._call("add_many", paths)
+
+    async def remove(self, source, destination, port):
+        """
+        Ensure "destination" is not accessible from "source" on the given port.
+        """
+        return await self._call("remove", source, destination, port)
+
+    async def remove_many(self, paths):
+        """
+        Remove every (source, destination, port) in "paths".
+        """
+        return await self._call("remove_many", paths)
+
+    async def list(self, services=None, max_staleness=None):
+        """
+        List all paths, using "services" rather than listing them again if given.  See
+        butter.paths.PathsClient.list.
+        """
+        return await self._call("list", services, max_staleness=max_staleness)
+
+    async def internet_accessible(self, service, port, max_staleness=None):
+        """
+        Returns true if "service" is internet accessible on the given port.
+        """
+        return await self._call("internet_accessible", service, port, max_staleness=max_staleness)
+
+    async def has_access(self, source, destination, port, max_staleness=None):
+        """
+        Returns true if "destination" is accessible from "source" on the given port.
+        """
+        return await self._call("has_access", source, destination, port,
+                                max_staleness=max_staleness)
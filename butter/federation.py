@@ -0,0 +1,154 @@
+# pylint: disable=too-few-public-methods
+"""
+Butter Federation
+
+Takes inventory of many provider accounts at once, such as dozens of AWS accounts and GCE projects,
+and merges what's in them into one view.
+
+Usage:
+
+    import butter.federation
+    federation = butter.federation.FederatedClient({
+        "prod": {"provider": "aws", "credentials": {}, "regions": ["us-east-1", "eu-west-1"]},
+        "staging": {"provider": "gce", "credentials": gce_credentials},
+        })
+    for account in federation.iter_inventory():
+        print(account.account, account.seconds, account.error)
+    inventory = federation.inventory()
+    inventory.snapshot # Everything in every account that worked
+    inventory.errors   # What went wrong in the ones that didn't
+
+Each account is listed by its own butter client in a worker process, so the work of turning provider
+responses into butter objects, which is what takes the time once the calls are made in parallel,
+runs on every CPU rather than one.  Workers send their snapshot back in the compact form from
+butter.util.snapshot_codec, and results are handed out as each account finishes.
+
+An account that fails, whether from a provider error or its worker process dying, gets its error
+recorded in its result, and doesn't affect any other account.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import attr
+
+import butter
+from butter.log import logger
+from butter.types.common import Snapshot
+from butter.util.snapshot_codec import decode_snapshot, encode_snapshot
+
+
+@attr.s
+class AccountInventory:
+    """
+    What's in one account, or why we couldn't find out.  "snapshot" is None if there was an
+    "error".  "seconds" is how long it took, and "stats" has the account client's call statistics,
+    see butter.Client.stats.
+    """
+    account = attr.ib(type=str)
+    snapshot = attr.ib(type=Snapshot, default=None)
+    error = attr.ib(type=str, default=None)
+    seconds = attr.ib(type=float, default=None)
+    stats = attr.ib(type=dict, default=None)
+
+
+@attr.s
+class FederatedInventory:
+    """
+    What's in every account, as the AccountInventory of each one, keyed by account name.
+    """
+    accounts = attr.ib(type=dict)
+
+    @property
+    def snapshot(self):
+        """
+        One snapshot with the networks, services, and paths of every account that worked.
+        """
+        snapshots = [account.snapshot for account in self.accounts.values() if account.snapshot]
+        return Snapshot(
+            networks=[network for snapshot in snapshots for network in snapshot.networks],
+            services=[service for snapshot in snapshots for service in snapshot.services],
+            paths=[path for snapshot in snapshots for path in snapshot.paths])
+
+    @property
+    def errors(self):
+        """
+        The error of each account that failed, keyed by account name.
+        """
+        return {name: account.error for name, account in self.accounts.items() if account.error}
+
+
+def _take_inventory(provider, credentials, regions):
+    """
+    Runs in a worker process.  Returns the encoded snapshot, or None, the error, the time it took,
+    and the call stats, all of which can be pickled whatever went wrong.
+    """
+    start = time.perf_counter()
+    client = None
+    try:
+        client = butter.Client(provider, credentials, regions)
+        encoded, error = encode_snapshot(client.snapshot()), None
+    # Whatever the provider raises is reported for this account, so it can't take down the rest.
+    # pylint: disable=broad-except
+    except Exception as exception:
+        encoded, error = None, "%s: %s" % (type(exception).__name__, exception)
+    stats = client.stats() if client else None
+    return encoded, error, time.perf_counter() - start, stats
+
+
+class FederatedClient:
+    """
+    Butter Federated Client Object
+
+    Takes inventory of many accounts at once.  "accounts" maps each account's name to its
+    configuration, a dict with the "provider" and "credentials" to create its butter client with,
+    and optionally the "regions" it spans.
+
+    Accounts are listed in a pool of at most "max_workers" processes, by default one for each CPU.
+    Pass "executor" to use another concurrent.futures executor instead.
+    """
+
+    def __init__(self, accounts, max_workers=None, executor=None):
+        self.accounts = dict(accounts)
+        self.max_workers = max_workers
+        self.executor = executor
+
+    def _submit(self, executor):
+        return {executor.submit(_take_inventory, config["provider"],
+                                config.get("credentials", {}), config.get("regions")): name
+                for name, config in self.accounts.items()}
+
+    def _results(self, executor):
+        futures = self._submit(executor)
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                encoded, error, seconds, stats = future.result()
+            # The worker process running this account died, and took the account with it.
+            # pylint: disable=broad-except
+            except Exception as exception:
+                encoded, error, seconds, stats = (
+                    None, "%s: %s" % (type(exception).__name__, exception), None, None)
+            if error:
+                logger.warning("Failed to take inventory of account %s: %s", name, error)
+            yield AccountInventory(account=name,
+                                   snapshot=decode_snapshot(encoded) if encoded else None,
+                                   error=error, seconds=seconds, stats=stats)
+
+    def iter_inventory(self):
+        """
+        Take inventory of every account at once, and yield the AccountInventory of each one as soon
+        as it's done.
+        """
+        if self.executor is not None:
+            yield from self._results(self.executor)
+            return
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from self._results(executor)
+
+    def inventory(self):
+        """
+        Take inventory of every account at once, and return it as a FederatedInventory, with the
+        accounts in the order they were given.
+        """
+        results = {account.account: account for account in self.iter_inventory()}
+        return FederatedInventory(accounts={name: results[name] for name in self.accounts})
@@ -7,7 +7,9 @@ level containers for services.
 from butter.log import logger
 from butter.providers import get_provider
 from butter.types.common import Network
+from butter.util.call_stats import recorded_operation
 from butter.util.exceptions import DisallowedOperationException
+from butter.util.regions import RegionalClients, merge, network_key
 
 
 class NetworkClient:
@@ -26,14 +28,27 @@ class NetworkClient:
         client.network.destroy(client.network.get("network"))
 
     The above commands will create and destroy a network named "network".
-    """
-    def __init__(self, provider, credentials):
-        self.network = get_provider(provider).network.NetworkClient(
-            credentials)
 
-    def create(self, name, blueprint=None):
+    To span several regions, pass "drivers", a map from each region to its driver, instead of
+    "driver".  See butter.util.regions.
+
+    With a butter.util.state_store.StateStore as "state_store", networks created and destroyed are
+    recorded in it, and "get" and "list" read from it when given a "max_staleness" it meets.
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, provider, credentials, driver=None, recorder=None, drivers=None,
+                 state_store=None):
+        self.recorder = recorder
+        self.state_store = state_store
+        self.regions = RegionalClients(get_provider(provider).network.NetworkClient, credentials,
+                                       drivers or {None: driver})
+        self.network = self.regions.default
+
+    @recorded_operation("network.create")
+    def create(self, name, blueprint=None, region=None):
         """
-        Create new network named "name" with blueprint file at "blueprint".
+        Create new network named "name" with blueprint file at "blueprint", in "region" if the
+        client spans more than one region, or else its first region.
 
         Example:
 
@@ -41,11 +56,16 @@ class NetworkClient:
 
         """
         logger.info('Creating network %s with blueprint %s', name, blueprint)
-        return self.network.create(name, blueprint)
+        network = self.regions.region(region).create(name, blueprint)
+        if self.state_store:
+            self.state_store.add_network(network)
+        return network
 
-    def get(self, name):
+    @recorded_operation("network.get")
+    def get(self, name, max_staleness=None):
         """
-        Get a network named "name" and return some data about it.
+        Get a network named "name" and return some data about it.  See the class documentation for
+        "max_staleness".
 
         Example:
 
@@ -53,8 +73,12 @@ class NetworkClient:
 
         """
         logger.info('Getting network %s', name)
-        return self.network.get(name)
+        if self.state_store and self.state_store.fresh(max_staleness):
+            return self.state_store.network(name)
+        networks = self.regions.fan_out(lambda network: network.get(name), self.recorder)
+        return next((network for network in networks if network is not None), None)
 
+    @recorded_operation("network.destroy")
     def destroy(self, network):
         """
         Destroy the given network.
@@ -68,11 +92,15 @@ class NetworkClient:
         if not isinstance(network, Network):
             raise DisallowedOperationException(
                 "Argument to destroy must be of type butter.types.common.Network")
-        return self.network.destroy(network)
+        result = self.regions.for_network(network).destroy(network)
+        if self.state_store:
+            self.state_store.remove_network(network)
+        return result
 
-    def list(self):
+    @recorded_operation("network.list")
+    def list(self, max_staleness=None):
         """
-        List all networks.
+        List all networks, in every region.  See the class documentation for "max_staleness".
 
         Example:
 
@@ -80,4 +108,7 @@ class NetworkClient:
 
         """
         logger.info('Listing networks')
-        return self.network.list()
+        if self.state_store and self.state_store.fresh(max_staleness):
+            return self.state_store.networks()
+        return merge(self.regions.fan_out(lambda network: network.list(), self.recorder),
+                     network_key)
@@ -7,6 +7,9 @@ does the transformation to and from the underlying firewall rules.
 """
 from butter.log import logger
 from butter.providers import get_provider
+from butter.util.call_stats import recorded_operation
+from butter.util.parallel import run_parallel
+from butter.util.regions import RegionalClients, merge, path_key
 # Importing this just so it's available in this namespace.
 # pylint: disable=unused-import
 from butter.types.networking import CidrBlock
@@ -32,11 +35,59 @@ class PathsClient:
 
     The above commands will result in the public internet having access to "load_balancer" on port
     443 and "load_balancer" having access to "internal_service" on port 80.
+
+    To span several regions, pass "drivers", a map from each region to its driver, instead of
+    "driver".  See butter.util.regions.  Paths are changed in the region of their destination's
+    network, or of their source's if the destination is a CIDR block, or if that network is global,
+    the region of the service's subnetworks.
+
+    With a butter.util.state_store.StateStore as "state_store", paths added and removed are recorded
+    in it, and "list", "internet_accessible", and "has_access" read from it when given a
+    "max_staleness" it meets.
     """
 
-    def __init__(self, provider, credentials):
-        self.paths = get_provider(provider).paths.PathsClient(credentials)
+    # pylint: disable=too-many-arguments
+    def __init__(self, provider, credentials, driver=None, recorder=None, drivers=None,
+                 state_store=None):
+        self.recorder = recorder
+        self.state_store = state_store
+        self.regions = RegionalClients(get_provider(provider).paths.PathsClient, credentials,
+                                       drivers or {None: driver})
+        self.paths = self.regions.default
+
+    @staticmethod
+    def _service(source, destination):
+        """
+        Returns the service end of the path from "source" to "destination", for picking its region.
+        """
+        for end in [destination, source]:
+            if getattr(end, "network", None) is not None:
+                return end
+        return None
 
+    def _for_path(self, source, destination):
+        return self.regions.for_service(self._service(source, destination))
+
+    def _run_by_region(self, method, paths):
+        """
+        Call "method" of each region's client with the paths in "paths" that are in its region, all
+        at once, and return the results in the order of "paths".
+        """
+        groups = self.regions.split(enumerate(paths),
+                                    lambda indexed: self._service(*indexed[1][:2]))
+        if len(groups) < 2:
+            return getattr(groups[0][0] if groups else self.paths, method)(paths)
+        results = [None] * len(paths)
+
+        def run(client, indexed_paths):
+            group_results = getattr(client, method)([path for _, path in indexed_paths])
+            for (index, _), result in zip(indexed_paths, group_results or []):
+                results[index] = result
+        run_parallel([lambda group=group: run(*group) for group in groups], len(groups),
+                     self.recorder)
+        return results
+
+    @recorded_operation("paths.add")
     def add(self, source, destination, port):
         """
         Make the service or cidr block described by "destination" accessible from the service or
@@ -45,8 +96,27 @@ class PathsClient:
         Either "source" or "destination" must be a service object.
         """
         logger.info('Adding path from %s to %s on port %s', source, destination, port)
-        return self.paths.add(source, destination, port)
+        result = self._for_path(source, destination).add(source, destination, port)
+        if self.state_store:
+            self.state_store.add_paths([(source, destination, port)])
+        return result
 
+    @recorded_operation("paths.add_many")
+    def add_many(self, paths):
+        """
+        Add every path in "paths", a list of (source, destination, port) tuples, as if by "add",
+        and return what "add" would have returned for each one.
+
+        Providers that can make many firewall changes in one call, like AWS, make all the changes
+        for each destination at once, so this is much faster than calling "add" in a loop.
+        """
+        logger.info('Adding %s paths', len(paths))
+        results = self._run_by_region("add_many", paths)
+        if self.state_store:
+            self.state_store.add_paths(paths)
+        return results
+
+    @recorded_operation("paths.remove")
     def remove(self, source, destination, port):
         """
         Ensure the service or cidr block described by "destination" is not accessible from the
@@ -55,25 +125,61 @@ class PathsClient:
         Either "source" or "destination" must be a service object.
         """
         logger.info('Removing path from %s to %s on port %s', source, destination, port)
-        return self.paths.remove(source, destination, port)
+        result = self._for_path(source, destination).remove(source, destination, port)
+        if self.state_store:
+            self.state_store.remove_paths([(source, destination, port)])
+        return result
 
-    def list(self):
+    @recorded_operation("paths.remove_many")
+    def remove_many(self, paths):
         """
-        List all paths and return a dictionary structure representing a graph.
+        Remove every path in "paths", a list of (source, destination, port) tuples, as if by
+        "remove".  Like "add_many", this batches the changes where the provider allows it.
         """
-        return self.paths.list()
+        logger.info('Removing %s paths', len(paths))
+        results = self._run_by_region("remove_many", paths)
+        if self.state_store:
+            self.state_store.remove_paths(paths)
+        return results
+
+    @recorded_operation("paths.list")
+    def list(self, services=None, max_staleness=None):
+        """
+        List all paths, in every region, and return a dictionary structure representing a graph.
 
-    def internet_accessible(self, service, port):
+        "services" is the result of "client.service.list()", if the caller already has it, so that
+        it doesn't get listed again.  Paths involving services not in it are left out.  See the
+        class documentation for "max_staleness".
+        """
+        if self.state_store and self.state_store.fresh(max_staleness):
+            return self.state_store.paths(services)
+        def list_region(paths):
+            if services is None:
+                return paths.list()
+            return paths.list([service for service in services
+                               if self.regions.for_network(service.network) is paths or
+                               service.network.region not in self.regions.clients])
+        return merge(self.regions.fan_out(list_region, self.recorder), path_key)
+
+    @recorded_operation("paths.internet_accessible")
+    def internet_accessible(self, service, port, max_staleness=None):
         """
         Returns true if the service described by "service" is internet accessible on the given port.
+        See the class documentation for "max_staleness".
         """
-        return self.paths.internet_accessible(service, port)
+        if self.state_store and self.state_store.fresh(max_staleness):
+            return self.state_store.internet_accessible(service, port)
+        return self.regions.for_service(service).internet_accessible(service, port)
 
-    def has_access(self, source, destination, port):
+    @recorded_operation("paths.has_access")
+    def has_access(self, source, destination, port, max_staleness=None):
         """
         Returns true if the service or cidr block described by "destination" is accessible from the
         service or cidr block described by "source" on the given port.
 
-        Either "source" or "destination" must be a service object.
+        Either "source" or "destination" must be a service object.  See the class documentation for
+        "max_staleness".
         """
-        return self.paths.has_access(source, destination, port)
+        if self.state_store and self.state_store.fresh(max_staleness):
+            return self.state_store.has_access(source, destination, port)
+        return self._for_path(source, destination).has_access(source, destination, port)
@@ -2,21 +2,97 @@
 Backend Providers
 
 Each directory in this directory should be a single supported backend provider.
+
+Providers are only imported the first time they are asked for, so that a process using one provider
+does not pay for importing the libraries every other provider depends on.  Providers that live
+outside this package can be added with "register_provider", or by publishing an entry point in the
+"butter.providers" group that points at the provider module:
+
+    entry_points={
+        'butter.providers': ['myprovider = mypackage.butter_provider'],
+    }
+
+A provider module must have "network", "service", and "paths" submodules implementing the same
+interfaces as the built in providers, and a "get_driver(credentials, recorder=None)" function.  The
+driver it returns holds whatever state the network, service, and paths clients of a single butter
+client should share, and is passed to each of them as the "driver" argument.  Every call the driver
+makes to the provider should be recorded with "recorder" (see butter.util.call_stats), the simplest
+way being to return "recorder.instrument(driver)".
 """
+import importlib
+import threading
 
-from butter.providers import aws, aws_mock, gce
+ENTRY_POINT_GROUP = "butter.providers"
 
-PROVIDERS_MAP = {
-    "aws": aws,
-    "mock-aws": aws_mock,
-    "gce": gce
+PROVIDER_MODULES = {
+    "aws": "butter.providers.aws",
+    "mock-aws": "butter.providers.aws_mock",
+    "gce": "butter.providers.gce",
+    "memory": "butter.providers.memory",
     }
 
+_LOADED_PROVIDERS = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def register_provider(provider, module):
+    """
+    Register "module" as the implementation of the provider named "provider".  "module" can be
+    either an already imported module or the import path of one, in which case it will be imported
+    the first time it is used.
+    """
+    with _REGISTRY_LOCK:
+        _LOADED_PROVIDERS.pop(provider, None)
+        if isinstance(module, str):
+            PROVIDER_MODULES[provider] = module
+        else:
+            PROVIDER_MODULES.pop(provider, None)
+            _LOADED_PROVIDERS[provider] = module
+
+
+def _entry_points():
+    """
+    Returns all entry points registered in our entry point group.  This is only called when a
+    provider isn't found in the registry, since reading package metadata is slow.
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        from importlib.metadata import entry_points
+    except ImportError:
+        # pylint: disable=import-outside-toplevel
+        import pkg_resources
+        return list(pkg_resources.iter_entry_points(ENTRY_POINT_GROUP))
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, "select"):
+        return list(all_entry_points.select(group=ENTRY_POINT_GROUP))
+    return list(all_entry_points.get(ENTRY_POINT_GROUP, []))
+
+
+def list_providers():
+    """
+    Returns the names of all available providers, without importing any of them.
+    """
+    names = set(PROVIDER_MODULES) | set(_LOADED_PROVIDERS)
+    names.update(entry_point.name for entry_point in _entry_points())
+    return sorted(names)
+
 
 def get_provider(provider):
     """
-    Given a provider string, returns the provider module object.
+    Given a provider string, returns the provider module object, importing it if necessary.
     """
-    if provider in PROVIDERS_MAP:
-        return PROVIDERS_MAP[provider]
-    raise NotImplementedError("Provider %s not implemented" % provider)
+    if provider in _LOADED_PROVIDERS:
+        return _LOADED_PROVIDERS[provider]
+    with _REGISTRY_LOCK:
+        if provider in _LOADED_PROVIDERS:
+            return _LOADED_PROVIDERS[provider]
+        if provider in PROVIDER_MODULES:
+            module = importlib.import_module(PROVIDER_MODULES[provider])
+        else:
+            matches = [entry_point for entry_point in _entry_points()
+                       if entry_point.name == provider]
+            if not matches:
+                raise NotImplementedError("Provider %s not implemented" % provider)
+            module = matches[0].load()
+        _LOADED_PROVIDERS[provider] = module
+        return module
@@ -4,3 +4,4 @@ AWS Provider
 This module implements support for using AWS as a backing provider.
 """
 from butter.providers.aws import (network, service, paths)
+from butter.providers.aws.driver import get_aws_driver as get_driver
@@ -0,0 +1,213 @@
+"""
+Amazon Web Services Driver Setup
+
+Holds the state that all the AWS clients belonging to one butter client share, so that things like
+the boto3 session and the service clients created from it only get built once.
+
+This is also where we keep our API calls under the AWS request rate limits.  Every call takes a
+token from the rate limiter bucket for its API family first, and calls that get throttled anyway are
+retried with backoff, so callers never see throttling errors unless AWS keeps throttling us.
+"""
+import threading
+import time
+import boto3
+
+from butter.providers.aws.overlay import ResourceOverlay
+from butter.util.rate_limiter import RateLimiter, backoff_delay
+from butter.util.tracing import current_tracer
+
+# Error codes AWS uses to say we are making calls too fast.
+THROTTLE_ERROR_CODES = frozenset([
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottledException",
+    "RequestLimitExceeded", "RequestThrottled", "TooManyRequestsException", "SlowDown"])
+
+# How many times to retry a throttled call before giving up and raising the error.
+THROTTLE_RETRIES = 10
+
+# The (rate, burst capacity) that the bucket for each API family starts with.  The EC2 ones are its
+# documented request token bucket sizes, and AWS throttles describe calls and mutating calls
+# separately.  The rates then adapt to what AWS actually lets us do.
+AWS_RATE_LIMITS = {
+    "ec2.describe": (20, 100),
+    "ec2.mutate": (5, 200),
+    "autoscaling.describe": (10, 40),
+    "autoscaling.mutate": (5, 40),
+    }
+DEFAULT_RATE_LIMIT = (10, 40)
+
+READ_OPERATION_PREFIXES = ("Describe", "List", "Get")
+
+# Services whose API is only served from some regions, and the region to call them in.  The price
+# list API covers every region from there.
+SERVICE_REGIONS = {
+    "pricing": "us-east-1",
+    }
+
+
+class AwsDriver:
+    """
+    Shared AWS state for a butter client.  This wraps a boto3 session and caches the service clients
+    created from it, since creating a boto3 client is expensive.  The boto3 clients themselves are
+    thread safe, so they can be shared by every thread using this driver.  It also holds the
+    overlay of resources this butter client created, see butter.providers.aws.overlay.
+
+    API calls are rate limited with "rate_limits", by default AWS_RATE_LIMITS, unless
+    "rate_limited" is false.
+    """
+
+    def __init__(self, session, recorder=None, rate_limits=None, rate_limited=True):
+        self.session = session
+        self.recorder = recorder
+        self.rate_limiter = None
+        if rate_limited:
+            self.rate_limiter = RateLimiter(dict(rate_limits or AWS_RATE_LIMITS),
+                                            DEFAULT_RATE_LIMIT)
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.overlay = ResourceOverlay()
+
+    @property
+    def region_name(self):
+        """
+        The region this driver's session is using.
+        """
+        return self.session.region_name
+
+    def client(self, service_name):
+        """
+        Returns the boto3 client for "service_name", creating it if necessary.
+        """
+        with self._lock:
+            if service_name not in self._clients:
+                client = self.session.client(service_name,
+                                             region_name=SERVICE_REGIONS.get(service_name))
+                if self.rate_limiter:
+                    rate_limit_calls(client, service_name, self.rate_limiter)
+                if self.recorder:
+                    record_calls(client, service_name, self.recorder)
+                self._clients[service_name] = client
+            return self._clients[service_name]
+
+    def warmup(self):
+        """
+        Create the clients that every operation uses ahead of time.
+        """
+        for service_name in ["ec2", "autoscaling"]:
+            self.client(service_name)
+
+
+def record_calls(client, service_name, recorder):
+    """
+    Record every API call made with the boto3 "client" with "recorder", as "<service>.<operation>".
+
+    This hooks into the botocore events rather than wrapping the client, so that calls made through
+    paginators and waiters are recorded too.  The request context is unique to each API call, so we
+    use it to carry the start time and the number of attempts (botocore retries internally).
+    """
+    def start(model, context, **_):
+        context["butter_call"] = "%s.%s" % (service_name, model.name)
+        context["butter_start"] = time.perf_counter()
+        context["butter_attempts"] = 0
+
+    def attempt(request, **_):
+        context = getattr(request, "context", None)
+        if context and "butter_attempts" in context:
+            context["butter_attempts"] += 1
+
+    def finish(context, error_code=None):
+        if "butter_start" not in context:
+            return
+        recorder.record_call(context.pop("butter_call"),
+                             time.perf_counter() - context.pop("butter_start"), error_code,
+                             max(context.pop("butter_attempts") - 1, 0))
+
+    def after_call(context, http_response, parsed, **_):
+        error_code = None
+        if http_response.status_code >= 300:
+            error_code = parsed.get("Error", {}).get("Code", str(http_response.status_code))
+        finish(context, error_code)
+
+    def after_call_error(context, exception, **_):
+        finish(context, type(exception).__name__)
+
+    # Each client has its own copy of the event emitter, and handlers registered for an event
+    # prefix get called for every service and operation.
+    events = client.meta.events
+    events.register("before-parameter-build", start)
+    events.register("request-created", attempt)
+    events.register("after-call", after_call)
+    events.register("after-call-error", after_call_error)
+
+
+def api_family(service_name, operation_name):
+    """
+    Returns the rate limiting family of the API call "operation_name" of "service_name".
+    """
+    if operation_name.startswith(READ_OPERATION_PREFIXES):
+        return "%s.describe" % service_name
+    return "%s.mutate" % service_name
+
+
+def rate_limit_calls(client, service_name, rate_limiter):
+    """
+    Rate limit every API call made with the boto3 "client" using the buckets in "rate_limiter", and
+    retry calls that get throttled.
+
+    This takes a token for every attempt botocore makes, not just every call, and uses botocore's
+    own retry loop to retry throttled calls, by answering its "needs-retry" event before its default
+    retry handler does.  Throttles slow down the family's bucket, and successes speed it back up.
+    """
+    def start(model, context, **_):
+        context["butter_family"] = api_family(service_name, model.name)
+
+    def acquire(request, **_):
+        context = getattr(request, "context", None)
+        if not context or "butter_family" not in context:
+            return
+        waited = rate_limiter.bucket(context["butter_family"]).acquire()
+        tracer = current_tracer()
+        if waited and tracer:
+            tracer.add_span("rate_limit", "wait", waited, family=context["butter_family"])
+
+    def needs_retry(response, attempts, request_dict, **_):
+        family = request_dict.get("context", {}).get("butter_family")
+        if family is None or response is None:
+            return None
+        http_response, parsed = response
+        error_code = parsed.get("Error", {}).get("Code")
+        if error_code not in THROTTLE_ERROR_CODES:
+            if http_response.status_code < 300:
+                rate_limiter.bucket(family).succeeded()
+            return None
+        rate_limiter.bucket(family).throttled()
+        if attempts > THROTTLE_RETRIES:
+            return None
+        return backoff_delay(attempts)
+
+    # Unlike the other events, botocore registers its retry handler for this service only, and more
+    # specific handlers get called first, so we have to do the same to get called before it.
+    events = client.meta.events
+    events.register("before-parameter-build", start)
+    events.register("request-created", acquire)
+    events.register_first("needs-retry.%s" % client.meta.service_model.service_id.hyphenize(),
+                          needs_retry)
+
+
+def _session(credentials):
+    return boto3.session.Session(region_name=(credentials or {}).get("region"))
+
+
+def get_aws_driver(credentials, recorder=None):
+    """
+    Get a driver object for AWS.  Currently only the global boto3 configuration is supported for
+    authentication, but the "region" in the credentials, if any, overrides its default region.  API
+    calls are recorded with "recorder", if one is given.
+    """
+    return AwsDriver(_session(credentials), recorder)
+
+
+def get_mock_aws_driver(credentials, recorder=None):
+    """
+    Get a driver object for AWS mocked with moto.  Moto never throttles, so this doesn't rate limit.
+    """
+    return AwsDriver(_session(credentials), recorder, rate_limited=False)
@@ -5,4 +5,4 @@ Backing libraries to interact with AWS resources.
 """
 # pylint: disable=W0611
 from butter.providers.aws.impl import (asg, security_groups, internet_gateways,
-                                       subnets, availability_zones)
+                                       subnets, availability_zones, access_index)
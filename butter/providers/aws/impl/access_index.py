@@ -0,0 +1,191 @@
+"""
+Access Index
+
+Compiled form of security group ingress rules, for answering "does this source have access to this
+destination on this port" without scanning every rule of the destination security group each time.
+
+Usage:
+
+    index = AccessIndex()
+    index.load(ec2.describe_security_groups(GroupIds=[dest_sg_id])["SecurityGroups"])
+    index.has_access(dest_sg_id, 443, source_group_id=src_sg_id)
+    index.has_access(dest_sg_id, 443, source_cidrs=["0.0.0.0/0"])
+
+    ec2.authorize_security_group_ingress(GroupId=dest_sg_id, IpPermissions=ip_permissions)
+    index.add_permissions(dest_sg_id, ip_permissions) # Keep it up to date without reloading it
+
+Like the rest of the AWS paths implementation, a rule only matches a port if it starts at that port.
+"""
+import bisect
+import ipaddress
+
+
+class CidrIntervals:
+    """
+    Set of CIDR blocks, kept as sorted, disjoint address intervals so that checking whether a CIDR
+    block overlaps any of them is a binary search.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._starts = []
+        self._ends = []
+
+    def __bool__(self):
+        return bool(self._counts)
+
+    @staticmethod
+    def _interval(cidr_block):
+        network = ipaddress.IPv4Network(cidr_block)
+        return int(network.network_address), int(network.broadcast_address)
+
+    def _rebuild(self):
+        self._starts, self._ends = [], []
+        for start, end in sorted(self._interval(cidr_block) for cidr_block in self._counts):
+            if self._ends and start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    def add(self, cidr_block):
+        """
+        Add "cidr_block".  Adding the same block twice means it has to be removed twice.
+        """
+        self.update([cidr_block])
+
+    def update(self, cidr_blocks):
+        """
+        Add every block in "cidr_blocks", rebuilding the intervals once rather than once per block.
+        """
+        new = False
+        for cidr_block in cidr_blocks:
+            cidr_block = str(ipaddress.IPv4Network(cidr_block))
+            self._counts[cidr_block] = self._counts.get(cidr_block, 0) + 1
+            new = new or self._counts[cidr_block] == 1
+        if new:
+            self._rebuild()
+
+    def remove(self, cidr_block):
+        """
+        Remove "cidr_block", if it's there.
+        """
+        cidr_block = str(ipaddress.IPv4Network(cidr_block))
+        if cidr_block not in self._counts:
+            return
+        self._counts[cidr_block] -= 1
+        if not self._counts[cidr_block]:
+            del self._counts[cidr_block]
+            self._rebuild()
+
+    def overlaps(self, cidr_block):
+        """
+        Returns true if "cidr_block" overlaps any block in this set.
+        """
+        start, end = self._interval(cidr_block)
+        position = bisect.bisect_right(self._starts, end) - 1
+        return position >= 0 and self._ends[position] >= start
+
+
+# pylint: disable=too-few-public-methods
+class _Entry:
+    """
+    The sources allowed into one security group on one port.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.cidrs = CidrIntervals()
+
+    def __bool__(self):
+        return bool(self.groups) or bool(self.cidrs)
+
+
+class AccessIndex:
+    """
+    Index of ingress rules by destination security group and port.  Only the security groups that
+    have been loaded are in the index, see "loaded".
+    """
+
+    def __init__(self):
+        # Security group id to port to _Entry, so a group can be replaced without scanning the rest.
+        self._entries = {}
+        self._loaded = set()
+
+    def loaded(self, security_group_id):
+        """
+        Returns true if the rules of "security_group_id" are in this index.
+        """
+        return security_group_id in self._loaded
+
+    def load(self, security_groups):
+        """
+        Load the rules of "security_groups", as returned by "describe_security_groups", replacing
+        whatever this index had for them before.
+        """
+        for security_group in security_groups:
+            group_id = security_group["GroupId"]
+            self._entries.pop(group_id, None)
+            self._loaded.add(group_id)
+            self.add_permissions(group_id, security_group["IpPermissions"])
+
+    @staticmethod
+    def _permission_sources(ip_permissions):
+        """
+        Returns a map from port to the source groups and CIDR blocks "ip_permissions" allow on it.
+        """
+        sources = {}
+        for ip_permission in ip_permissions:
+            # Rules for all ports and protocols have no port, and never match one.
+            if "FromPort" not in ip_permission:
+                continue
+            groups, cidr_blocks = sources.setdefault(ip_permission["FromPort"], ([], []))
+            groups.extend(pair["GroupId"] for pair in ip_permission.get("UserIdGroupPairs", [])
+                          if "GroupId" in pair)
+            cidr_blocks.extend(ip_range["CidrIp"]
+                               for ip_range in ip_permission.get("IpRanges", []))
+        return sources
+
+    def add_permissions(self, security_group_id, ip_permissions):
+        """
+        Add "ip_permissions", in the format "authorize_security_group_ingress" takes, to the rules
+        of "security_group_id".
+        """
+        ports = self._entries.setdefault(security_group_id, {})
+        for port, (groups, cidr_blocks) in self._permission_sources(ip_permissions).items():
+            entry = ports.setdefault(port, _Entry())
+            for group in groups:
+                entry.groups[group] = entry.groups.get(group, 0) + 1
+            entry.cidrs.update(cidr_blocks)
+
+    def remove_permissions(self, security_group_id, ip_permissions):
+        """
+        Remove "ip_permissions", in the format "revoke_security_group_ingress" takes, from the rules
+        of "security_group_id".
+        """
+        ports = self._entries.get(security_group_id, {})
+        for port, (groups, cidr_blocks) in self._permission_sources(ip_permissions).items():
+            entry = ports.get(port)
+            if not entry:
+                continue
+            for group in groups:
+                if group in entry.groups:
+                    entry.groups[group] -= 1
+                    if not entry.groups[group]:
+                        del entry.groups[group]
+            for cidr_block in cidr_blocks:
+                entry.cidrs.remove(cidr_block)
+            if not entry:
+                del ports[port]
+
+    def has_access(self, security_group_id, port, source_group_id=None, source_cidrs=()):
+        """
+        Returns true if "security_group_id" allows "source_group_id", or any CIDR block overlapping
+        one of "source_cidrs", on "port".
+        """
+        entry = self._entries.get(security_group_id, {}).get(port)
+        if not entry:
+            return False
+        if source_group_id and source_group_id in entry.groups:
+            return True
+        return any(entry.cidrs.overlaps(source_cidr) for source_cidr in source_cidrs)
@@ -8,8 +8,12 @@ Implementation of some common helpers necessary to work with ASGs.
 from botocore.exceptions import ClientError
 
 from butter.util.exceptions import BadEnvironmentStateException
+from butter.util.tracing import traced
 from butter.providers.aws.log import logger
 
+# The most launch configuration names "describe_launch_configurations" takes at once.
+LAUNCH_CONFIGURATION_NAMES_LIMIT = 50
+
 
 # pylint: disable=too-few-public-methods
 class AsgName:
@@ -35,6 +39,54 @@ class AsgName:
         return "%s.%s" % (self.network, self.subnetwork)
 
 
+class SecurityGroupIndex:
+    """
+    Map from each service, as a (network name, service name) tuple, to the security group of its
+    launch configuration, and back.
+
+    The index covers the whole account, so launch configurations that are in a bad state, given as
+    "errors" (a map from service to what's wrong with it), or that share a security group, only
+    raise BadEnvironmentStateException when they're looked up, and don't affect other services.
+    """
+    def __init__(self, by_service, errors=None):
+        self.by_service = by_service
+        self.errors = dict(errors or {})
+        self.by_group = {}
+        shared = {}
+        for service, security_group_id in by_service.items():
+            if security_group_id in self.by_group:
+                shared.setdefault(security_group_id, [self.by_group[security_group_id]]).append(
+                    service)
+            self.by_group[security_group_id] = service
+        self.shared = shared
+
+    def _check_group(self, security_group_id):
+        if security_group_id in self.shared:
+            raise BadEnvironmentStateException(
+                "Services %s have same security group: %s" %
+                (", ".join("%s.%s" % service for service in self.shared[security_group_id]),
+                 security_group_id))
+
+    def security_group(self, network_name, service_name):
+        """
+        Returns the security group of the given service, or None if it has no launch
+        configuration.
+        """
+        if (network_name, service_name) in self.errors:
+            raise BadEnvironmentStateException(self.errors[(network_name, service_name)])
+        security_group_id = self.by_service.get((network_name, service_name))
+        self._check_group(security_group_id)
+        return security_group_id
+
+    def service(self, security_group_id):
+        """
+        Returns the (network name, service name) tuple of the service using the given security
+        group, or None if no service uses it.
+        """
+        self._check_group(security_group_id)
+        return self.by_group.get(security_group_id)
+
+
 class ASG:
     """
     Autoscaling groups helpers class.
@@ -72,7 +124,45 @@ class ASG:
                                                launch_configuration)
         return security_groups[0]
 
+    def _launch_configuration_pages(self, services=None):
+        paginator = self.driver.client("autoscaling").get_paginator(
+            "describe_launch_configurations")
+        if services is None:
+            yield from paginator.paginate()
+            return
+        names = [str(AsgName(network=network, subnetwork=service))
+                 for network, service in services]
+        for start in range(0, len(names), LAUNCH_CONFIGURATION_NAMES_LIMIT):
+            yield from paginator.paginate(
+                LaunchConfigurationNames=names[start:start + LAUNCH_CONFIGURATION_NAMES_LIMIT])
+
+    def security_group_index(self, services=None):
+        """
+        Returns a SecurityGroupIndex of every launch configuration butter created, built from one
+        paginated listing rather than a call per launch configuration.  If "services", a list of
+        (network name, service name) tuples, is given, only their launch configurations are
+        described.
+        """
+        by_service = {}
+        errors = {}
+        for page in self._launch_configuration_pages(services):
+            for launch_configuration in page["LaunchConfigurations"]:
+                name = launch_configuration["LaunchConfigurationName"]
+                # Launch configurations not named like an AsgName weren't created by butter.
+                if not all(name.split(".")) or len(name.split(".")) != 2:
+                    continue
+                asg_name = AsgName(name_string=name)
+                service = (asg_name.network, asg_name.subnetwork)
+                security_groups = launch_configuration["SecurityGroups"]
+                if len(security_groups) != 1:
+                    errors[service] = ("Expected launch configuration %s to have exactly one "
+                                       "security group: %s" % (name, launch_configuration))
+                    continue
+                by_service[service] = security_groups[0]
+        return SecurityGroupIndex(by_service, errors)
+
     # pylint: disable=invalid-name
+    @traced("auto_scaling_group.scale_down")
     def destroy_auto_scaling_group_instances(self, asg_name):
         autoscaling = self.driver.client("autoscaling")
         try:
@@ -90,6 +180,7 @@ class ASG:
             else:
                 raise client_error
 
+    @traced("auto_scaling_group.destroy")
     def destroy_auto_scaling_group(self, asg_name):
         autoscaling = self.driver.client("autoscaling")
         try:
@@ -107,6 +198,7 @@ class ASG:
             else:
                 raise client_error
 
+    @traced("launch_configuration.destroy")
     def destroy_launch_configuration(self, asg_name):
         autoscaling = self.driver.client("autoscaling")
         try:
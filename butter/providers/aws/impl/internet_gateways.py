@@ -23,15 +23,23 @@ class InternetGateways:
         in the given VPC.
         """
         ec2 = self.driver.client("ec2")
-        count = 0
         route_tables = ec2.describe_route_tables(Filters=[{'Name': 'vpc-id',
                                                            'Values':
                                                            [vpc_id]}])
-        for route_table in route_tables["RouteTables"]:
+        return self.route_counts(route_tables["RouteTables"]).get(igw_id, 0)
+
+    def route_counts(self, route_tables):
+        """
+        Returns a map from each gateway to the number of routes in the
+        given route tables that go through it, so callers that already have
+        the route tables for a VPC don't have to describe them again.
+        """
+        counts = {}
+        for route_table in route_tables:
             for route in route_table["Routes"]:
-                if "GatewayId" in route and route["GatewayId"] == igw_id:
-                    count = count + 1
-        return count
+                if "GatewayId" in route:
+                    counts[route["GatewayId"]] = counts.get(route["GatewayId"], 0) + 1
+        return counts
 
     def get_internet_gateway(self, vpc_id):
         """
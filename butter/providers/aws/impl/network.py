@@ -4,21 +4,16 @@ Butter Network on AWS
 This component should allow for intuitive and transparent control over networks, which are the top
 level containers for groups of instances/services.  This is the AWS implementation.
 """
-import time
-
 from butter.util.blueprint import NetworkBlueprint
 from butter.util.subnet_generator import generate_subnets
 from butter.util.exceptions import (BadEnvironmentStateException,
                                     DisallowedOperationException,
-                                    OperationTimedOut,
                                     NotEnoughIPSpaceException)
 from butter.providers.aws.impl.internet_gateways import InternetGateways
-from butter.providers.aws.schemas import canonicalize_network_info
+from butter.providers.aws.schemas import (canonicalize_network_info, get_name,
+                                          name_tags)
 from butter.providers.aws.log import logger
 
-RETRY_COUNT = int(60)
-RETRY_DELAY = float(1.0)
-
 class NetworkClient:
     """
     Butter Network Client Object for AWS
@@ -55,32 +50,15 @@ class NetworkClient:
                                             (prefix, address_range_includes,
                                              address_range_includes))
 
+        # Tag it as we create it, and record it so that this client can see it right away even
+        # though describe_vpcs might not return it yet.
+        tags = name_tags(name)
         vpc = ec2.create_vpc(CidrBlock=get_cidr(
-            network_blueprint.get_prefix(), [allocation_blocks], []))
-        vpc_id = vpc["Vpc"]["VpcId"]
-        try:
-            creation_retries = 0
-            while creation_retries < RETRY_COUNT:
-                try:
-                    ec2.create_tags(Resources=[vpc_id],
-                                    Tags=[{"Key": "Name",
-                                           "Value": name}])
-                    if not self.get(name):
-                        time.sleep(float(RETRY_DELAY))
-                    else:
-                        break
-                except ec2.exceptions.ClientError as client_error:
-                    logger.debug("Received exception tagging VPC: %s", client_error)
-                    time.sleep(float(RETRY_DELAY))
-                    creation_retries = creation_retries + 1
-                    if creation_retries >= RETRY_COUNT:
-                        raise OperationTimedOut(
-                            "Cannot find created VPC: %s" % vpc_id)
-        except OperationTimedOut as exception:
-            ec2.delete_vpc(VpcId=vpc_id)
-            raise exception
+            network_blueprint.get_prefix(), [allocation_blocks], []),
+                             TagSpecifications=[{"ResourceType": "vpc", "Tags": tags}])
+        self.driver.overlay.record("vpc", vpc["Vpc"]["VpcId"], dict(vpc["Vpc"], Tags=tags))
         return canonicalize_network_info(name, vpc["Vpc"],
-                                         self.driver.session.Session().region_name)
+                                         self.driver.region_name)
 
     # pylint: disable=no-self-use
     def get(self, name):
@@ -90,16 +68,18 @@ class NetworkClient:
         ec2 = self.driver.client("ec2")
         deployment_filter = {'Name': "tag:Name",
                              'Values': [name]}
-        vpcs = ec2.describe_vpcs(Filters=[deployment_filter])
-        if len(vpcs["Vpcs"]) > 1:
+        vpcs = self.driver.overlay.merge(
+            "vpc", "VpcId", ec2.describe_vpcs(Filters=[deployment_filter])["Vpcs"],
+            lambda vpc: get_name(vpc) == name)
+        if len(vpcs) > 1:
             raise BadEnvironmentStateException(
                 "Expected to find at most one VPC named: %s, "
                 "output: %s" % (name, vpcs))
-        elif not vpcs["Vpcs"]:
+        elif not vpcs:
             return None
         else:
-            return canonicalize_network_info(name, vpcs["Vpcs"][0],
-                                             self.driver.session.Session().region_name)
+            return canonicalize_network_info(name, vpcs[0],
+                                             self.driver.region_name)
 
     # pylint: disable=no-self-use
     def destroy(self, network):
@@ -162,27 +142,22 @@ class NetworkClient:
             if client_error.response['Error']['Code'] == 'DependencyViolation':
                 logger.info("Dependency violation deleting VPC: %s", client_error)
             raise client_error
+        self.driver.overlay.forget(network.network_id)
         return deletion_result
 
-    # pylint: disable=no-self-use
-    def list(self):
+    def describe_vpcs(self):
         """
-        List all networks.
+        Returns every VPC, as returned by "describe_vpcs", including ones this client created that
+        AWS doesn't return yet.
         """
         ec2 = self.driver.client("ec2")
+        vpcs = [vpc for page in ec2.get_paginator("describe_vpcs").paginate()
+                for vpc in page["Vpcs"]]
+        return self.driver.overlay.merge("vpc", "VpcId", vpcs)
 
-        def get_deployment_tag(vpc):
-            if "Tags" not in vpc:
-                return None
-            for tag in vpc["Tags"]:
-                if tag["Key"] == "Name":
-                    return tag["Value"]
-            return None
-
-        vpcs = ec2.describe_vpcs()
-        result = []
-        for vpc in vpcs["Vpcs"]:
-            name = get_deployment_tag(vpc)
-            result.append(canonicalize_network_info(name, vpc,
-                                                    self.driver.session.Session().region_name))
-        return result
+    def list(self):
+        """
+        List all networks.
+        """
+        return [canonicalize_network_info(get_name(vpc), vpc, self.driver.region_name)
+                for vpc in self.describe_vpcs()]
@@ -5,12 +5,12 @@ This is a the AWS implmentation for the paths API, a high level interface to add
 routes between services, doing the conversion to security groups and firewall
 rules.
 """
-import ipaddress
-
 import butter.providers.aws.service
+from butter.providers.aws.impl.access_index import AccessIndex
 from butter.providers.aws.impl.asg import ASG
 from butter.providers.aws.log import logger
-from butter.util.exceptions import BadEnvironmentStateException, DisallowedOperationException
+from butter.util.exceptions import DisallowedOperationException
+from butter.util.operation_cache import OperationCache, cached_operation
 from butter.util.public_blocks import get_public_blocks
 from butter.types.common import Service, Path, Subnetwork
 from butter.types.networking import CidrBlock
@@ -26,10 +26,33 @@ class PathsClient:
         self.mock = mock
         self.service = butter.providers.aws.impl.service.ServiceClient(driver, credentials, mock)
         self.asg = ASG(driver, credentials)
+        self.cache = OperationCache()
+
+    def _security_group_index(self):
+        """
+        Returns the index of every service's security group, which is only built once per
+        operation no matter how many paths the operation looks at.
+        """
+        return self.cache.get("security_group_index", self.asg.security_group_index)
 
-    def _extract_service_info(self, source, destination, port):
+    def _services_index(self, services):
+        """
+        Returns an index with the security groups of "services".  Unless this operation already
+        has the index of every service, only the launch configurations of "services" are described,
+        so changing or checking a few paths doesn't page through every one in the account.
+        """
+        index = self.cache.peek("security_group_index")
+        if index is not None:
+            return index
+        keys = tuple(sorted({(service.network.name, service.name) for service in services
+                             if isinstance(service, Service)}))
+        return self.cache.get(("security_group_index", keys),
+                              lambda: self.asg.security_group_index(keys))
+
+    def _extract_service_info(self, source, destination, port, index=None):
         """
         Helper to extract the necessary information from the source and destination arguments.
+        Security groups are looked up in "index", if given.
         """
 
         if (not isinstance(source, Service) and not isinstance(destination, Service) and
@@ -47,13 +70,14 @@ class PathsClient:
             raise DisallowedOperationException(
                 "Destination and source must be in the same network if specified as services")
 
+        if index is None:
+            index = self._services_index([source, destination])
         src_ip_permissions = []
         dest_ip_permissions = []
         src_sg_id = None
         dest_sg_id = None
         if isinstance(source, Service):
-            src_sg_id = self.asg.get_launch_configuration_security_group(source.network.name,
-                                                                         source.name)
+            src_sg_id = index.security_group(source.network.name, source.name)
             src_ip_permissions.append({
                 'FromPort': port,
                 'ToPort': port,
@@ -72,8 +96,7 @@ class PathsClient:
                     }]
                 })
         if isinstance(destination, Service):
-            dest_sg_id = self.asg.get_launch_configuration_security_group(destination.network.name,
-                                                                          destination.name)
+            dest_sg_id = index.security_group(destination.network.name, destination.name)
             dest_ip_permissions.append({
                 'FromPort': port,
                 'ToPort': port,
@@ -93,55 +116,116 @@ class PathsClient:
                 })
         return dest_sg_id, src_sg_id, dest_ip_permissions, src_ip_permissions
 
+    def _extract_batch_info(self, paths):
+        """
+        Runs "_extract_service_info" on every (source, destination, port) in "paths".
+        """
+        # Currently controlling egress in AWS is not supported.  All egress is always allowed.
+        if not all(isinstance(destination, Service) for _, destination, _ in paths):
+            raise DisallowedOperationException(
+                "Destination must be a butter.types.networking.Service object")
+        index = self._services_index([service for source, destination, _ in paths
+                                      for service in [source, destination]])
+        return [self._extract_service_info(source, destination, port, index)
+                for source, destination, port in paths]
+
+    def _access_index(self, security_group_ids=()):
+        """
+        Returns the index of ingress rules for this operation, after loading any of the given
+        security groups that aren't in it yet with one call.
+        """
+        index = self.cache.get("access_index", AccessIndex)
+        missing = sorted({security_group_id for security_group_id in security_group_ids
+                          if not index.loaded(security_group_id)})
+        if missing:
+            ec2 = self.driver.client("ec2")
+            index.load(ec2.describe_security_groups(GroupIds=missing)["SecurityGroups"])
+        return index
+
+    @staticmethod
+    def _source_cidrs(src_ip_permissions):
+        return [ip_range["CidrIp"] for ip_permission in src_ip_permissions
+                for ip_range in ip_permission.get("IpRanges", [])]
+
+    @cached_operation
     def add(self, source, destination, port):
         """
         Adds a route from "source" to "destination".
         """
         logger.debug("Adding path from %s to %s", source, destination)
-        if self.has_access(source, destination, port):
-            logger.info("Service %s already has access to %s on port: %s", source, destination,
-                        port)
-            return True
+        return self.add_many([(source, destination, port)])[0]
 
-        # Currently controlling egress in AWS is not supported.  All egress is always allowed.
-        if not isinstance(destination, Service):
-            raise DisallowedOperationException(
-                "Destination must be a butter.types.networking.Service object")
+    @cached_operation
+    def add_many(self, paths):
+        """
+        Adds a route for every (source, destination, port) in "paths".  All the new rules for each
+        destination security group are authorized in one call.  Returns what "add" would have
+        returned for each path, in order.
+        """
+        batch_info = self._extract_batch_info(paths)
+        index = self._access_index([dest_sg_id for dest_sg_id, _, _, _ in batch_info])
+        results = []
+        to_authorize = {}
+        for (source, destination, port), (dest_sg_id, src_sg_id, _, src_ip_permissions) in zip(
+                paths, batch_info):
+            if index.has_access(dest_sg_id, port, src_sg_id,
+                                self._source_cidrs(src_ip_permissions)):
+                logger.info("Service %s already has access to %s on port: %s", source,
+                            destination, port)
+                results.append(True)
+                continue
+            # Adding it to the index now means repeats later in the batch are skipped.
+            index.add_permissions(dest_sg_id, src_ip_permissions)
+            to_authorize.setdefault(dest_sg_id, []).extend(src_ip_permissions)
+            results.append(Path(destination.network, source, destination, "tcp", port))
 
-        dest_sg_id, _, _, src_ip_permissions = self._extract_service_info(source, destination, port)
         ec2 = self.driver.client("ec2")
-        ec2.authorize_security_group_ingress(GroupId=dest_sg_id, IpPermissions=src_ip_permissions)
-        return Path(destination.network, source, destination, "tcp", port)
+        for dest_sg_id, ip_permissions in to_authorize.items():
+            ec2.authorize_security_group_ingress(GroupId=dest_sg_id, IpPermissions=ip_permissions)
+        return results
 
+    @cached_operation
     def remove(self, source, destination, port):
         """
         Remove a route from "source" to "destination".
         """
-        # Currently controlling egress in AWS is not supported.  All egress is always allowed.
-        if not isinstance(destination, Service):
-            raise DisallowedOperationException(
-                "Destination must be a butter.types.networking.Service object")
+        self.remove_many([(source, destination, port)])
+
+    @cached_operation
+    def remove_many(self, paths):
+        """
+        Removes the route for every (source, destination, port) in "paths".  All the rules for each
+        destination security group are revoked in one call.
+        """
+        to_revoke = {}
+        for dest_sg_id, _, _, src_ip_permissions in self._extract_batch_info(paths):
+            pending = to_revoke.setdefault(dest_sg_id, [])
+            pending.extend(permission for permission in src_ip_permissions
+                           if permission not in pending)
 
         ec2 = self.driver.client("ec2")
-        dest_sg_id, _, _, src_ip_permissions = self._extract_service_info(source, destination, port)
-        ec2.revoke_security_group_ingress(GroupId=dest_sg_id, IpPermissions=src_ip_permissions)
+        index = self._access_index()
+        for dest_sg_id, ip_permissions in to_revoke.items():
+            ec2.revoke_security_group_ingress(GroupId=dest_sg_id, IpPermissions=ip_permissions)
+            if index.loaded(dest_sg_id):
+                index.remove_permissions(dest_sg_id, ip_permissions)
 
-    # pylint: disable=too-many-locals
-    def list(self):
+    @cached_operation
+    def list(self, services=None):
         """
-        List all paths and return a dictionary structure representing a graph.
+        List all paths and return a dictionary structure representing a graph.  Uses "services" as
+        the list of all services, if given, rather than listing them again.
         """
         ec2 = self.driver.client("ec2")
+        index = self._security_group_index()
         sg_to_service = {}
-        for service in self.service.list():
-            sg_id = self.asg.get_launch_configuration_security_group(
-                service.network.name, service.name)
-            if sg_id in sg_to_service:
-                raise BadEnvironmentStateException(
-                    "Service %s and %s have same security group: %s" %
-                    (sg_to_service[sg_id], service, sg_id))
-            sg_to_service[sg_id] = service
+        for service in services if services is not None else self.service.list():
+            sg_id = index.security_group(service.network.name, service.name)
+            if sg_id:
+                sg_to_service[sg_id] = service
         security_groups = ec2.describe_security_groups()
+        # Anything else this operation does can check access against these rules.
+        self._access_index().load(security_groups["SecurityGroups"])
 
         def make_path(destination, source, rule):
             return Path(destination.network, source, destination, rule["IpProtocol"],
@@ -183,6 +267,7 @@ class PathsClient:
 
         return paths
 
+    @cached_operation
     def internet_accessible(self, service, port):
         """
         Return true if the given service is accessible on the internet.
@@ -192,45 +277,12 @@ class PathsClient:
                 return True
         return False
 
+    @cached_operation
     def has_access(self, source, destination, port):
         """
         Return true if there is a route from "source" to "destination".
         """
-        ec2 = self.driver.client("ec2")
         dest_sg_id, src_sg_id, _, src_ip_permissions = self._extract_service_info(
             source, destination, port)
-        security_group = ec2.describe_security_groups(GroupIds=[dest_sg_id])
-
-        def extract_cidr_port(ip_permissions):
-            cidr_port_list = []
-            for ip_permission in ip_permissions:
-                if "IpRanges" in ip_permission:
-                    for ip_range in ip_permission["IpRanges"]:
-                        cidr_port_list.append({"port": ip_permission["FromPort"],
-                                               "cidr": ip_range["CidrIp"]})
-            return cidr_port_list
-
-        def sg_allowed(ip_permissions, sg_id, port):
-            for ip_permission in ip_permissions:
-                if (ip_permission["UserIdGroupPairs"] and
-                        ip_permission["FromPort"] == port):
-                    for pair in ip_permission["UserIdGroupPairs"]:
-                        if "GroupId" in pair and pair["GroupId"] == sg_id:
-                            return True
-            return False
-
-        ip_permissions = security_group["SecurityGroups"][0]["IpPermissions"]
-        logger.debug("ip_permissions: %s", ip_permissions)
-        if src_sg_id and sg_allowed(ip_permissions, src_sg_id, port):
-            return True
-
-        src_cidr_port_info = extract_cidr_port(src_ip_permissions)
-        cidr_port_info = extract_cidr_port(ip_permissions)
-        for cidr_port in cidr_port_info:
-            if cidr_port["port"] != port:
-                continue
-            for src_cidr_port in src_cidr_port_info:
-                if (ipaddress.IPv4Network(src_cidr_port["cidr"]).overlaps(
-                        ipaddress.IPv4Network(cidr_port["cidr"]))):
-                    return True
-        return False
+        return self._access_index([dest_sg_id]).has_access(
+            dest_sg_id, port, src_sg_id, self._source_cidrs(src_ip_permissions))
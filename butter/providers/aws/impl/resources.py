@@ -0,0 +1,56 @@
+# pylint: disable=too-few-public-methods
+"""
+Created Resources
+
+Records of the AWS resources created for a service, passed from each step of creating it to the
+next, so that later steps use the ids the earlier ones got back from AWS rather than discovering
+the same resources again.
+"""
+import attr
+
+from butter.providers.aws.schemas import canonicalize_subnetwork_info
+
+
+@attr.s
+class SubnetResources:
+    """
+    A subnet and the route table created for it.  "subnet" is the subnet as returned by
+    "create_subnet".
+    """
+    subnet_id = attr.ib(type=str)
+    route_table_id = attr.ib(type=str)
+    subnet = attr.ib(type=dict)
+
+
+@attr.s
+class SubnetworkResources:
+    """
+    The subnets of a subnetwork, and the internet gateway they route through.
+    """
+    name = attr.ib(type=str)
+    subnets = attr.ib(type=list)
+    internet_gateway_id = attr.ib(type=str, default=None)
+
+    def subnet_ids(self):
+        """
+        Returns the ids of all the subnets.
+        """
+        return [subnet.subnet_id for subnet in self.subnets]
+
+    def subnetworks(self):
+        """
+        Returns new butter.types.common.Subnetwork objects, with no instances, for all the subnets.
+        """
+        return [canonicalize_subnetwork_info(None, subnet.subnet, []) for subnet in self.subnets]
+
+
+@attr.s
+class ServiceResources:
+    """
+    Everything created for a service.  The launch configuration and auto scaling group are both
+    named after the service's AsgName.
+    """
+    subnetwork = attr.ib(type=SubnetworkResources)
+    security_group_id = attr.ib(type=str, default=None)
+    launch_configuration_name = attr.ib(type=str, default=None)
+    auto_scaling_group_name = attr.ib(type=str, default=None)
@@ -5,10 +5,11 @@ Security Groups Impl
 Implementation of some common helpers necessary to work with security groups.
 """
 
-import time
 from botocore.exceptions import ClientError
+from butter.util import cancellation
 from butter.util.exceptions import (OperationTimedOut,
                                     BadEnvironmentStateException)
+from butter.util.tracing import traced
 from butter.providers.aws.log import logger
 
 
@@ -23,12 +24,14 @@ class SecurityGroups:
             # Currently only using the global defaults is supported
             raise NotImplementedError("Passing credentials not implemented")
 
+    @traced("security_group.create")
     def create(self, name, vpc_id):
         ec2 = self.driver.client("ec2")
         group = ec2.create_security_group(VpcId=vpc_id, GroupName=name,
                                           Description=name)
         return group["GroupId"]
 
+    @traced("security_group.delete_referencing_rules")
     def delete_referencing_rules(self, vpc_id, security_group_id):
         """
         Removes all rules referencing the given security group in the given
@@ -41,6 +44,7 @@ class SecurityGroups:
             Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
         for security_group in security_groups["SecurityGroups"]:
             logger.info("Checking security group: %s", security_group_id)
+            rules_to_remove = []
             for rule in security_group["IpPermissions"]:
                 for uigp in rule["UserIdGroupPairs"]:
                     if "GroupId" not in uigp:
@@ -53,11 +57,14 @@ class SecurityGroups:
                     rule_to_remove["IpProtocol"] = rule["IpProtocol"]
                     rule_to_remove["UserIdGroupPairs"] = [{"GroupId":
                                                            uigp["GroupId"]}]
-                    logger.info("Revoking rule: %s in security group %s",
-                                rule_to_remove, security_group)
-                    ec2.revoke_security_group_ingress(
-                        GroupId=security_group["GroupId"],
-                        IpPermissions=[rule_to_remove])
+                    rules_to_remove.append(rule_to_remove)
+            # Revoke all the rules in this group at once, rather than one call per rule.
+            if rules_to_remove:
+                logger.info("Revoking rules: %s in security group %s",
+                            rules_to_remove, security_group)
+                ec2.revoke_security_group_ingress(
+                    GroupId=security_group["GroupId"],
+                    IpPermissions=rules_to_remove)
 
     def delete_by_name(self, vpc_id, security_group_name, retries, retry_delay):
         ec2 = self.driver.client("ec2")
@@ -77,6 +84,7 @@ class SecurityGroups:
         security_group_id = security_groups["SecurityGroups"][0]["GroupId"]
         return self.delete_with_retries(security_group_id, retries, retry_delay)
 
+    @traced("security_group.delete")
     def delete_with_retries(self, security_group_id, retries, retry_delay):
         ec2 = self.driver.client("ec2")
 
@@ -101,4 +109,4 @@ class SecurityGroups:
                 raise OperationTimedOut(
                     "Exceeded max retries while deleting security group: %s"
                     % security_group_id)
-            time.sleep(float(retry_delay))
+            cancellation.sleep(float(retry_delay))
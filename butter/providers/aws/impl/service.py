@@ -4,20 +4,22 @@ Butter Service on AWS
 This is the AWS implmentation for the service API, a high level interface to manage groups of
 instances.
 """
-import time
 import json
 import itertools
 import requests
 import dateutil.parser
 from botocore.exceptions import ClientError
 
+from butter.util import cancellation
 from butter.util.blueprint import ServiceBlueprint
 from butter.util.instance_fitter import get_fitting_instance
+from butter.util.tracing import span, traced
 from butter.util.exceptions import (BadEnvironmentStateException,
                                     OperationTimedOut)
 import butter.providers.aws.impl.network
 import butter.providers.aws.impl.subnetwork
 from butter.providers.aws.impl.asg import (ASG, AsgName)
+from butter.providers.aws.impl.resources import ServiceResources
 from butter.providers.aws.impl.security_groups import SecurityGroups
 from butter.providers.aws.log import logger
 from butter.providers.aws.schemas import (canonicalize_instance_info,
@@ -44,21 +46,27 @@ class ServiceClient:
         self.security_groups = SecurityGroups(driver, credentials)
 
     # pylint: disable=too-many-arguments, too-many-locals
-    def create(self, network, service_name, blueprint, template_vars=None, count=None):
+    def create(self, network, service_name, blueprint, template_vars=None, count=None,
+               wait=True):
         """
         Create a group of instances in "network" named "service_name" with blueprint file at
-        "blueprint".
+        "blueprint".  Unless "wait" is false, waits for all the instances to be running before
+        returning.
+
+        Every resource created along the way is recorded in a ServiceResources record, and the
+        later steps use the ids in it rather than discovering the resources again.
         """
-        subnet_ids = [subnet_info.subnetwork_id for subnet_info
-                      in self.subnetwork.create(network, service_name,
-                                                blueprint=blueprint)]
+        resources = ServiceResources(
+            subnetwork=self.subnetwork.create(network, service_name, blueprint=blueprint))
 
         # Security Group
         asg_name = AsgName(network=network.name, subnetwork=service_name)
         vpc_id = network.network_id
         security_group_id = self.security_groups.create(str(asg_name), vpc_id)
+        resources.security_group_id = security_group_id
 
         # Launch Configuration
+        @traced("ami.lookup")
         def lookup_ami(ami_name):
             ec2 = self.driver.client("ec2")
             images = ec2.describe_images(Filters=[{"Name": "name",
@@ -72,6 +80,7 @@ class ServiceClient:
                     result_image = image
             return result_image["ImageId"]
 
+        @traced("launch_configuration.create")
         def create_launch_configuration(asg_name, blueprint, template_vars):
             instances_blueprint = ServiceBlueprint(blueprint, template_vars)
             ami_id = lookup_ami(instances_blueprint.image())
@@ -85,6 +94,7 @@ class ServiceClient:
                 AssociatePublicIpAddress=associate_public_ip,
                 InstanceType=instance_type)
         create_launch_configuration(asg_name, blueprint, template_vars)
+        resources.launch_configuration_name = str(asg_name)
 
         # Auto Scaling Group
         if count:
@@ -93,15 +103,20 @@ class ServiceClient:
             instances_blueprint = ServiceBlueprint(blueprint, template_vars)
             instance_count = instances_blueprint.availability_zone_count()
         autoscaling = self.driver.client("autoscaling")
-        autoscaling.create_auto_scaling_group(
-            AutoScalingGroupName=str(asg_name),
-            LaunchConfigurationName=str(asg_name), MinSize=instance_count,
-            MaxSize=instance_count, DesiredCapacity=instance_count,
-            VPCZoneIdentifier=",".join(subnet_ids), LoadBalancerNames=[],
-            HealthCheckType='ELB', HealthCheckGracePeriod=120)
-
+        with span("auto_scaling_group.create", instance_count=instance_count):
+            autoscaling.create_auto_scaling_group(
+                AutoScalingGroupName=str(asg_name),
+                LaunchConfigurationName=str(asg_name), MinSize=instance_count,
+                MaxSize=instance_count, DesiredCapacity=instance_count,
+                VPCZoneIdentifier=",".join(resources.subnetwork.subnet_ids()),
+                LoadBalancerNames=[], HealthCheckType='ELB', HealthCheckGracePeriod=120)
+        resources.auto_scaling_group_name = str(asg_name)
+        if not wait:
+            return self.get(network, service_name, resources)
+
+        @traced("wait_until_running")
         def wait_until(state):
-            asg = self.get(network, service_name)
+            asg = self.get(network, service_name, resources)
 
             def instance_list(service, state):
                 return [instance for subnetwork in service.subnetworks
@@ -111,14 +126,13 @@ class ServiceClient:
             retries = 0
             while len(instance_list(asg, state)) < instance_count:
                 logger.info("Waiting for instance creation in asg: %s", asg)
-                asg = self.get(network, service_name)
+                cancellation.sleep(RETRY_DELAY)
+                asg = self.get(network, service_name, resources)
                 retries = retries + 1
                 if retries > RETRY_COUNT:
                     raise OperationTimedOut("Timed out waiting for ASG to be created")
-                time.sleep(RETRY_DELAY)
-        wait_until("running")
-
-        return self.get(network, service_name)
+            return asg
+        return wait_until("running")
 
     def list(self):
         """
@@ -133,9 +147,11 @@ class ServiceClient:
                 services.append(self.get(self.network.get(asg_name.network), asg_name.subnetwork))
         return services
 
-    def get(self, network, service_name):
+    def get(self, network, service_name, resources=None):
         """
-        Discover a service in "network" named "service_name".
+        Discover a service in "network" named "service_name".  If "resources" is the
+        ServiceResources record from creating the service, its subnets are used rather than
+        discovered again.
         """
         logger.info("Discovering autoscaling group named %s in network: %s",
                     service_name, network)
@@ -198,27 +214,36 @@ class ServiceClient:
                 raise OperationTimedOut(
                     "Exceeded retries while discovering %s, in network %s" %
                     (service_name, network))
-            time.sleep(RETRY_DELAY)
+            cancellation.sleep(RETRY_DELAY)
+
+        # 2. Get List Of Subnets, and 3. Group Services By Subnet
+        subnetworks = self._subnetworks_with_instances(network, service_name, instances, resources)
+
+        # 4. Profit!
+        return Service(network=network, name=service_name, subnetworks=subnetworks)
 
-        # 2. Get List Of Subnets
-        subnetworks = self.subnetwork.get(network, service_name)
+    def _subnetworks_with_instances(self, network, service_name, instances, resources=None):
+        """
+        Returns the subnetworks of the service named "service_name" in "network", taken from
+        "resources" if given, with each of "instances" in the subnetwork it's in.
+        """
+        if resources:
+            subnetworks = resources.subnetwork.subnetworks()
+        else:
+            subnetworks = self.subnetwork.get(network, service_name)
 
         # NOTE: In moto instance objects do not include a "SubnetId" and the IP addresses are
         # assigned randomly in the VPC, so for now just stripe instances across subnets.
         if self.mock:
             for instance, subnetwork, in zip(instances, itertools.cycle(subnetworks)):
                 subnetwork.instances.append(canonicalize_instance_info(instance))
-            return Service(network=network, name=service_name, subnetworks=subnetworks)
+            return subnetworks
 
-        # 3. Group Services By Subnet
         for subnetwork in subnetworks:
             for instance in instances:
                 if "SubnetId" in instance and subnetwork.subnetwork_id == instance["SubnetId"]:
                     subnetwork.instances.append(canonicalize_instance_info(instance))
-
-        # 4. Profit!
-        return Service(network=network, name=service_name, subnetworks=subnetworks)
-
+        return subnetworks
 
     def destroy(self, service):
         """
@@ -244,7 +269,7 @@ class ServiceClient:
             retries = retries + 1
             if retries > 60:
                 raise OperationTimedOut("Timed out waiting for ASG scale down")
-            time.sleep(float(10))
+            cancellation.sleep(float(10))
 
         self.asg.destroy_auto_scaling_group(asg_name)
 
@@ -258,7 +283,7 @@ class ServiceClient:
             retries = retries + 1
             if retries > 60:
                 raise OperationTimedOut("Timed out waiting for ASG deletion")
-            time.sleep(float(10))
+            cancellation.sleep(float(10))
 
         vpc_id = service.network.network_id
         lc_security_group = self.asg.get_launch_configuration_security_group(
@@ -278,13 +303,13 @@ class ServiceClient:
     def node_types(self):
         """
         Get a list of node sizes to use for matching resource requirements to
-        instance type.
+        instance type, as offered in the region this client is in.
         """
         pricing = self.driver.client("pricing")
 
         filters = [
             {"Type":"TERM_MATCH", "Field":"ServiceCode", "Value":"AmazonEC2"},
-            {"Type":"TERM_MATCH", "Field":"location", "Value":"US East (N. Virginia)"},
+            {"Type":"TERM_MATCH", "Field":"regionCode", "Value":self.driver.region_name},
             {"Type":"TERM_MATCH", "Field":"instanceFamily", "Value":"General Purpose"},
             {"Type":"TERM_MATCH", "Field":"currentGeneration", "Value":"Yes"},
             {"Type":"TERM_MATCH", "Field":"operatingSystem", "Value":"Linux"},
@@ -5,12 +5,12 @@ Subnets Impl
 Implementation of some common helpers necessary to work with AWS subnets.
 """
 
-import time
-
+from butter.util import cancellation
 from butter.util.subnet_generator import generate_subnets
 from butter.util.exceptions import (NotEnoughIPSpaceException,
                                     OperationTimedOut)
-from butter.providers.aws.log import logger
+from butter.providers.aws.impl.resources import SubnetResources
+from butter.providers.aws.schemas import name_tags
 
 
 class Subnets:
@@ -28,10 +28,13 @@ class Subnets:
         ec2 = self.driver.client("ec2")
 
         # Get existing subnets, to make sure we don't overlap CIDR blocks
-        existing_subnets = ec2.describe_subnets(Filters=[{'Name': 'vpc-id',
-                                                          'Values': [vpc_id]}])
+        existing_subnets = self.driver.overlay.merge(
+            "subnet", "SubnetId",
+            ec2.describe_subnets(Filters=[{'Name': 'vpc-id',
+                                           'Values': [vpc_id]}])["Subnets"],
+            lambda subnet: subnet["VpcId"] == vpc_id)
         existing_cidrs = [subnet["CidrBlock"]
-                          for subnet in existing_subnets["Subnets"]]
+                          for subnet in existing_subnets]
 
         # Finally, iterate the list of all subnets of the given prefix that can
         # fit in the given VPC
@@ -48,17 +51,20 @@ class Subnets:
         while deletion_retries < retry_count:
             try:
                 ec2.delete_subnet(SubnetId=subnet_id)
+                self.driver.overlay.forget(subnet_id)
+                return
             except ec2.exceptions.ClientError as client_error:
                 if (client_error.response['Error']['Code'] ==
                         'DependencyViolation'):
                     # A dependency violation might be transient if
                     # something is being actively deleted by AWS, so sleep
                     # and retry if we get this specific error.
-                    time.sleep(float(retry_delay))
+                    cancellation.sleep(float(retry_delay))
                 elif (client_error.response['Error']['Code'] ==
                       'InvalidSubnetID.NotFound'):
                     # Just return successfully if the subnet is already gone
                     # for some reason.
+                    self.driver.overlay.forget(subnet_id)
                     return
                 else:
                     raise client_error
@@ -67,43 +73,26 @@ class Subnets:
                     raise OperationTimedOut(
                         "Failed to delete subnet: %s" % str(client_error))
 
-    # pylint: disable=too-many-arguments,too-many-locals
-    def create(self, subnetwork_name, subnet_cidr,
-               availability_zone, dc_id, retry_count, retry_delay):
+    def create(self, subnetwork_name, subnet_cidr, availability_zone, dc_id):
         """
-        Provision a single subnet with a route table and the proper tags.
+        Provision a single subnet with a route table and the proper tags, and
+        return the SubnetResources record of what was created.
         """
         ec2 = self.driver.client("ec2")
-        created_subnet = ec2.create_subnet(CidrBlock=subnet_cidr,
-                                           AvailabilityZone=availability_zone,
-                                           VpcId=dc_id)
+        # Tag it as we create it, and record it so that this client can see
+        # it right away even though describe_subnets might not return it yet.
+        tags = name_tags(subnetwork_name)
+        created_subnet = ec2.create_subnet(
+            CidrBlock=subnet_cidr, AvailabilityZone=availability_zone,
+            VpcId=dc_id,
+            TagSpecifications=[{"ResourceType": "subnet", "Tags": tags}])
         subnet_id = created_subnet["Subnet"]["SubnetId"]
+        self.driver.overlay.record("subnet", subnet_id,
+                                   dict(created_subnet["Subnet"], Tags=tags))
         route_table = ec2.create_route_table(VpcId=dc_id)
         route_table_id = route_table["RouteTable"]["RouteTableId"]
         ec2.associate_route_table(RouteTableId=route_table_id,
                                   SubnetId=subnet_id)
-        creation_retries = 0
-        while creation_retries < retry_count:
-            try:
-                ec2.create_tags(Resources=[subnet_id],
-                                Tags=[{"Key": "Name",
-                                       "Value": subnetwork_name}])
-                subnets = ec2.describe_subnets(
-                    Filters=[{'Name': "vpc-id",
-                              'Values': [dc_id]},
-                             {'Name': "tag:Name",
-                              'Values': [subnetwork_name]}])
-                subnet_ids = [subnet["SubnetId"] for subnet
-                              in subnets["Subnets"]]
-                if subnet_id not in subnet_ids:
-                    time.sleep(float(retry_delay))
-                else:
-                    break
-            except ec2.exceptions.ClientError as client_error:
-                logger.info("Caught exception creating tags: %s", client_error)
-                time.sleep(float(retry_delay))
-                creation_retries = creation_retries + 1
-                if creation_retries >= retry_count:
-                    raise OperationTimedOut(
-                        "Cannot find created Subnet: %s" % subnet_id)
-        return created_subnet["Subnet"]
+        return SubnetResources(subnet_id=subnet_id,
+                               route_table_id=route_table_id,
+                               subnet=created_subnet["Subnet"])
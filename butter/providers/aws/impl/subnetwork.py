@@ -8,16 +8,19 @@ This is also in flux because of the differences between how cloud providers mana
 it might go away.
 """
 import math
-import time
 
+from butter.util import cancellation
 from butter.util.blueprint import ServiceBlueprint
 from butter.util.exceptions import BadEnvironmentStateException
+from butter.util.parallel import run_parallel
+from butter.util.tracing import traced
 import butter.providers.aws.impl.network
 from butter.providers.aws.impl.internet_gateways import InternetGateways
+from butter.providers.aws.impl.resources import SubnetworkResources
 from butter.providers.aws.impl.subnets import Subnets
 from butter.providers.aws.impl.availability_zones import AvailabilityZones
 from butter.providers.aws.log import logger
-from butter.providers.aws.schemas import canonicalize_subnetwork_info
+from butter.providers.aws.schemas import canonicalize_subnetwork_info, get_name
 
 RETRY_COUNT = int(60)
 RETRY_DELAY = float(1.0)
@@ -36,12 +39,13 @@ class SubnetworkClient:
         self.subnets = Subnets(driver, credentials)
         self.availability_zones = AvailabilityZones(driver, credentials, mock)
 
+    @traced("subnetwork.create")
     def create(self, network, subnetwork_name, blueprint):
         """
-        Provision the subnets with AWS.
+        Provision the subnets with AWS, and return the SubnetworkResources
+        record of what was created.
         """
         # 1. Create subnets across availability zones.
-        subnets_info = []
         instances_blueprint = ServiceBlueprint(blueprint)
         az_count = instances_blueprint.availability_zone_count()
         max_count = instances_blueprint.max_count()
@@ -49,49 +53,59 @@ class SubnetworkClient:
         cidr_az_list = zip(self.subnets.carve_subnets(network.network_id, network.cidr_block,
                                                       prefix, az_count),
                            self.availability_zones.get_availability_zones())
-        for subnet_cidr, availability_zone in cidr_az_list:
-            subnet_info = canonicalize_subnetwork_info(
-                None,
-                self.subnets.create(subnetwork_name, subnet_cidr, availability_zone,
-                                    network.network_id, RETRY_COUNT, RETRY_DELAY), [])
-            subnets_info.append(subnet_info)
+        subnets = [self.subnets.create(subnetwork_name, subnet_cidr, availability_zone,
+                                       network.network_id)
+                   for subnet_cidr, availability_zone in cidr_az_list]
+        resources = SubnetworkResources(name=subnetwork_name, subnets=subnets)
 
         # 2. Make sure we have a route to the internet.
-        self._make_internet_routable(network, subnetwork_name)
+        self._make_internet_routable(network, resources)
 
-        return subnets_info
+        return resources
 
-    def _make_internet_routable(self, network, subnetwork_name):
+    @traced("route_tables.create")
+    def _make_internet_routable(self, network, resources):
         """
         Create an internet gateway for this network and add routes to it for
-        all subnets.
+        all subnets in "resources", a SubnetworkResources record.
 
         Steps:
 
-        1. Discover current VPC.
-        2. Create and attach internet gateway only if it doesn't exist.
-        4. Add route to it from all subnets.
+        1. Create and attach internet gateway only if it doesn't exist.
+        2. Add route to it from the route table of each subnet.
         """
         ec2 = self.driver.client("ec2")
 
         # 1. Get the internet gateway for this VPC.
         igw_id = self.internet_gateways.get_internet_gateway(network.network_id)
+        resources.internet_gateway_id = igw_id
 
-        # 2. Add route to it from all subnets.
-        subnet_ids = [subnet_info.subnetwork_id for subnet_info
-                      in self.get(network, subnetwork_name)]
-        for subnet_id in subnet_ids:
-            subnet_filter = {'Name': 'association.subnet-id',
-                             'Values': [subnet_id]}
-            route_tables = ec2.describe_route_tables(Filters=[subnet_filter])
-            if len(route_tables["RouteTables"]) != 1:
-                raise Exception("Expected to find exactly one route table: %s"
-                                % route_tables)
-            route_table = route_tables["RouteTables"][0]
-            ec2.create_route(RouteTableId=route_table["RouteTableId"],
+        # 2. Add route to it from all subnets.  The route tables were created
+        # along with the subnets, so there's no need to look them up.
+        for subnet in resources.subnets:
+            ec2.create_route(RouteTableId=subnet.route_table_id,
                              GatewayId=igw_id,
                              DestinationCidrBlock="0.0.0.0/0")
 
+    @staticmethod
+    def _route_tables_by_subnet(route_tables, subnet_ids):
+        """
+        Returns a map from each of "subnet_ids" to the route table in
+        "route_tables" associated with it, if any.
+        """
+        by_subnet = {}
+        for route_table in route_tables:
+            for association in route_table["Associations"]:
+                subnet_id = association.get("SubnetId")
+                if subnet_id not in subnet_ids:
+                    continue
+                if subnet_id in by_subnet:
+                    raise BadEnvironmentStateException(
+                        "Expected to find at most one route table associated "
+                        "with: %s, output: %s" % (subnet_id, route_tables))
+                by_subnet[subnet_id] = route_table
+        return by_subnet
+
     def get(self, network, subnetwork_name):
         """
         Get a subnetwork group in "network" named "subnetwork_name".
@@ -102,9 +116,48 @@ class SubnetworkClient:
                                                  'Values': [dc_id]},
                                                 {'Name': "tag:Name",
                                                  'Values': [subnetwork_name]}])
+        subnets = self.driver.overlay.merge(
+            "subnet", "SubnetId", subnets["Subnets"],
+            lambda subnet: (subnet["VpcId"] == dc_id and
+                            get_name(subnet) == subnetwork_name))
         return [canonicalize_subnetwork_info(None, subnet, [])
-                for subnet in subnets["Subnets"]]
+                for subnet in subnets]
+
+    def _delete_route_tables(self, route_tables):
+        """
+        Disassociate and delete every route table in "route_tables", in parallel.
+        """
+        ec2 = self.driver.client("ec2")
+
+        def delete_route_table(route_table):
+            for association in route_table["Associations"]:
+                ec2.disassociate_route_table(
+                    AssociationId=association["RouteTableAssociationId"])
+            ec2.delete_route_table(RouteTableId=route_table["RouteTableId"])
+        run_parallel([lambda route_table=route_table: delete_route_table(route_table)
+                      for route_table in route_tables],
+                     recorder=self.driver.recorder)
 
+    def _delete_unused_internet_gateways(self, dc_id, route_tables, deleted):
+        """
+        Detach and delete the internet gateways that the route tables in "deleted", a map from id
+        to route table, routed through, unless a route table in "route_tables", all the route
+        tables in the VPC, that wasn't deleted still routes through them.
+        """
+        ec2 = self.driver.client("ec2")
+        remaining_routes = self.internet_gateways.route_counts(
+            [route_table for route_table in route_tables
+             if route_table["RouteTableId"] not in deleted])
+        gateways = {route["GatewayId"] for route_table in deleted.values()
+                    for route in route_table["Routes"]
+                    if "GatewayId" in route and route["GatewayId"] != "local"}
+        for igw_id in sorted(gateways):
+            if not remaining_routes.get(igw_id):
+                ec2.detach_internet_gateway(InternetGatewayId=igw_id,
+                                            VpcId=dc_id)
+                ec2.delete_internet_gateway(InternetGatewayId=igw_id)
+
+    @traced("subnetwork.destroy")
     def destroy(self, network, subnetwork_name):
         """
         Destroy all networks represented by this object.  Also destroys the
@@ -126,39 +179,28 @@ class SubnetworkClient:
         # 1. Discover the current VPC.
         dc_id = network.network_id
 
-        # 2. Destroy route tables.
-        def delete_route_table(route_table):
-            # 2.a. Disassociate and delete route table.
-            associations = route_table["Associations"]
-            for association in associations:
-                ec2.disassociate_route_table(
-                    AssociationId=association["RouteTableAssociationId"])
-            ec2.delete_route_table(
-                RouteTableId=route_table["RouteTableId"])
-            # 2.b. Delete non referenced internet gateways.
-            routes = route_table["Routes"]
-            for route in routes:
-                if "GatewayId" in route and route["GatewayId"] != "local":
-                    igw_id = route["GatewayId"]
-                    if not self.internet_gateways.route_count(dc_id, igw_id):
-                        ec2.detach_internet_gateway(InternetGatewayId=igw_id,
-                                                    VpcId=dc_id)
-                        ec2.delete_internet_gateway(InternetGatewayId=igw_id)
-
-        for subnet_id in subnet_ids:
-            subnet_filter = {'Name': 'association.subnet-id',
-                             'Values': [subnet_id]}
-            route_tables = ec2.describe_route_tables(Filters=[subnet_filter])
-            if len(route_tables["RouteTables"]) > 1:
-                raise BadEnvironmentStateException(
-                    "Expected to find at most one route table associated "
-                    "with: %s, output: %s" % (subnet_id, route_tables))
-            if len(route_tables["RouteTables"]) == 1:
-                delete_route_table(route_tables["RouteTables"][0])
+        # 2. Destroy route tables.  All the route tables in the VPC are
+        # fetched at once, since they're needed to count the routes through
+        # each internet gateway anyway.
+        route_tables = ec2.describe_route_tables(
+            Filters=[{'Name': 'vpc-id', 'Values': [dc_id]}])["RouteTables"]
+        to_delete = {}
+        for route_table in self._route_tables_by_subnet(route_tables,
+                                                        subnet_ids).values():
+            to_delete[route_table["RouteTableId"]] = route_table
+
+        # 2.a. Disassociate and delete route tables.
+        self._delete_route_tables(to_delete.values())
+
+        # 2.b. Delete non referenced internet gateways.
+        self._delete_unused_internet_gateways(dc_id, route_tables, to_delete)
 
         # 3. Delete all subnets.
-        for subnet_id in subnet_ids:
+        def delete_subnet(subnet_id):
             self.subnets.delete(subnet_id, RETRY_COUNT, RETRY_DELAY)
+        run_parallel([lambda subnet_id=subnet_id: delete_subnet(subnet_id)
+                      for subnet_id in subnet_ids],
+                     recorder=self.driver.recorder)
 
         # 4. Wait until subnets are deleted.
         remaining_subnets = ec2.describe_subnets(
@@ -176,32 +218,36 @@ class SubnetworkClient:
             remaining_subnet_ids = [subnet["SubnetId"] for subnet
                                     in remaining_subnets["Subnets"]]
             retries = retries + 1
-            time.sleep(1)
+            cancellation.sleep(1)
 
-    def list(self):
+    def iter_list(self):
         """
-        Return a list of all subnetworks.
+        Generate a (network name, {subnetwork name: [subnetworks]}) tuple for every network with
+        subnets in it.  This makes two calls no matter how many subnets there are: one to get the
+        name of every VPC, and one to get every subnet.
         """
         ec2 = self.driver.client("ec2")
+        vpc_names = {vpc["VpcId"]: get_name(vpc) for vpc in self.network.describe_vpcs()}
+        subnets = [subnet for page in ec2.get_paginator("describe_subnets").paginate()
+                   for subnet in page["Subnets"]]
+        by_vpc = {}
+        for subnet in self.driver.overlay.merge("subnet", "SubnetId", subnets):
+            by_vpc.setdefault(subnet["VpcId"], []).append(subnet)
+        for vpc_id, vpc_subnets in by_vpc.items():
+            subnet_info = {}
+            for subnet in vpc_subnets:
+                subnet_info.setdefault(get_name(subnet), []).append(
+                    canonicalize_subnetwork_info(None, subnet, []))
+            yield vpc_names.get(vpc_id), subnet_info
 
-        def get_name(tagged_resource):
-            if "Tags" not in tagged_resource:
-                return None
-            for tag in tagged_resource["Tags"]:
-                if tag["Key"] == "Name":
-                    return tag["Value"]
-            return None
-
+    def list(self):
+        """
+        Return a list of all subnetworks, as a map from network name to a map
+        from subnetwork name to its subnets.
+        """
         subnet_info = {}
-        subnets = ec2.describe_subnets()
-        for subnet in subnets["Subnets"]:
-            vpcs = ec2.describe_vpcs(VpcIds=[subnet["VpcId"]])
-            vpc_name = get_name(vpcs["Vpcs"][0])
-            subnet_name = get_name(subnet)
-            if vpc_name not in subnet_info:
-                subnet_info[vpc_name] = {}
-            if subnet_name not in subnet_info[vpc_name]:
-                subnet_info[vpc_name][subnet_name] = []
-            subnet_info[vpc_name][subnet_name].append(
-                canonicalize_subnetwork_info(None, subnet, []))
+        for vpc_name, vpc_subnet_info in self.iter_list():
+            for subnet_name, subnetworks in vpc_subnet_info.items():
+                subnet_info.setdefault(vpc_name, {}).setdefault(
+                    subnet_name, []).extend(subnetworks)
         return subnet_info
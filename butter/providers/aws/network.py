@@ -4,8 +4,8 @@ Butter Network on AWS
 This component should allow for intuitive and transparent control over networks, which are the top
 level containers for groups of instances/services.  This is the AWS implementation.
 """
-import boto3
 import butter.providers.aws.impl.network
+from butter.providers.aws.driver import get_aws_driver
 
 class NetworkClient:
     """
@@ -14,8 +14,10 @@ class NetworkClient:
     This is the object through which all network related calls are made for AWS.
     """
 
-    def __init__(self, credentials):
-        self.network = butter.providers.aws.impl.network.NetworkClient(boto3, credentials,
+    def __init__(self, credentials, driver=None):
+        if not driver:
+            driver = get_aws_driver(credentials)
+        self.network = butter.providers.aws.impl.network.NetworkClient(driver, credentials,
                                                                        mock=False)
 
     def create(self, name, blueprint):
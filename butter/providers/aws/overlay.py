@@ -0,0 +1,79 @@
+"""
+Read Your Writes Overlay for AWS
+
+EC2 describe calls are eventually consistent, so a VPC or subnet that was just created, or just
+tagged, can be missing from describe results (or be there without its tags) for a few seconds.
+Rather than polling until AWS catches up, every AWS client belonging to one butter client records
+the resources it creates here, and merges them into what it gets back from describe calls.
+
+Usage:
+
+    vpc = ec2.create_vpc(CidrBlock=cidr_block,
+                         TagSpecifications=[{"ResourceType": "vpc", "Tags": name_tags(name)}])
+    overlay.record("vpc", vpc["Vpc"]["VpcId"], dict(vpc["Vpc"], Tags=name_tags(name)))
+    ...
+    vpcs = overlay.merge("vpc", "VpcId", ec2.describe_vpcs(Filters=filters)["Vpcs"],
+                         lambda vpc: get_name(vpc) == name)
+
+A recorded resource is dropped from the overlay as soon as a describe call returns it with all of
+its tags, since from then on AWS is consistent with what we know, and when it's deleted.
+
+The tag helpers used with it are in butter.providers.aws.schemas.
+"""
+import copy
+import threading
+
+
+class ResourceOverlay:
+    """
+    Resources created or tagged through one butter client that describe calls might not return yet.
+    Safe to use from multiple threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resources = {}
+
+    def record(self, kind, resource_id, resource):
+        """
+        Record "resource", with the id "resource_id", as created or tagged just now.  "kind" groups
+        resources that are described by the same call, like "vpc" or "subnet".
+        """
+        with self._lock:
+            self._resources[resource_id] = (kind, copy.deepcopy(resource))
+
+    def forget(self, resource_id):
+        """
+        Stop merging the resource with the id "resource_id", for example because it was deleted.
+        """
+        with self._lock:
+            self._resources.pop(resource_id, None)
+
+    def merge(self, kind, id_key, described, matches=None):
+        """
+        Returns "described", the resources of "kind" returned by a describe call, with the recorded
+        ones that "matches" added if they're missing, and with recorded tags added to the ones that
+        AWS returned without them.  "id_key" is the field holding each resource's id.
+        """
+        merged = []
+        with self._lock:
+            recorded = {resource_id: resource
+                        for resource_id, (resource_kind, resource) in self._resources.items()
+                        if resource_kind == kind}
+            for resource in described:
+                resource_id = resource[id_key]
+                if resource_id not in recorded:
+                    merged.append(resource)
+                    continue
+                tags = recorded.pop(resource_id).get("Tags", [])
+                missing = [tag for tag in tags if tag not in resource.get("Tags", [])]
+                if missing:
+                    resource = dict(resource, Tags=resource.get("Tags", []) + missing)
+                else:
+                    # AWS has caught up, so there's nothing left to add.
+                    del self._resources[resource_id]
+                merged.append(resource)
+        for resource in recorded.values():
+            if matches is None or matches(resource):
+                merged.append(copy.deepcopy(resource))
+        return merged
@@ -5,16 +5,18 @@ This is a the AWS implmentation for the paths API, a high level interface to add
 routes between services, doing the conversion to security groups and firewall
 rules.
 """
-import boto3
 import butter.providers.aws.impl.paths
+from butter.providers.aws.driver import get_aws_driver
 
 
 class PathsClient:
     """
     Client object to interact with paths between resources.
     """
-    def __init__(self, credentials):
-        self.paths = butter.providers.aws.impl.paths.PathsClient(boto3, credentials, mock=False)
+    def __init__(self, credentials, driver=None):
+        if not driver:
+            driver = get_aws_driver(credentials)
+        self.paths = butter.providers.aws.impl.paths.PathsClient(driver, credentials, mock=False)
 
 
     def add(self, source, destination, port):
@@ -23,17 +25,29 @@ class PathsClient:
         """
         return self.paths.add(source, destination, port)
 
+    def add_many(self, paths):
+        """
+        Adds a route for every (source, destination, port) in "paths".
+        """
+        return self.paths.add_many(paths)
+
     def remove(self, source, destination, port):
         """
         Remove a route from "source" to "destination".
         """
         return self.paths.remove(source, destination, port)
 
-    def list(self):
+    def remove_many(self, paths):
+        """
+        Removes the route for every (source, destination, port) in "paths".
+        """
+        return self.paths.remove_many(paths)
+
+    def list(self, services=None):
         """
         List all paths and return a dictionary structure representing a graph.
         """
-        return self.paths.list()
+        return self.paths.list(services)
 
     def internet_accessible(self, service, port):
         """
@@ -4,6 +4,28 @@ Schemas of the results returned by various API calls for AWS.
 from butter.types.common import Network, Subnetwork, Instance
 from butter.util.storage_size_parser import parse_storage_size
 
+def get_tag(resource, key):
+    """
+    Returns the value of the tag "key" on the AWS "resource", or None if it doesn't have one.
+    """
+    for tag in resource.get("Tags", []):
+        if tag["Key"] == key:
+            return tag["Value"]
+    return None
+
+def get_name(resource):
+    """
+    Returns the value of the "Name" tag on the AWS "resource", which is how butter names VPCs and
+    subnets, or None if it doesn't have one.
+    """
+    return get_tag(resource, "Name")
+
+def name_tags(name):
+    """
+    Returns the tags for an AWS resource named "name".
+    """
+    return [{"Key": "Name", "Value": name}]
+
 def canonicalize_network_info(name, vpc, region):
     """
     Convert what is returned from AWS into the butter standard format.
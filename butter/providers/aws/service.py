@@ -4,8 +4,8 @@ Butter Service on AWS
 This is the AWS implmentation for the service API, a high level interface to manage groups of
 instances.
 """
-import boto3
 import butter.providers.aws.impl.service
+from butter.providers.aws.driver import get_aws_driver
 
 
 
@@ -14,12 +14,14 @@ class ServiceClient:
     Client object to manage instances.
     """
 
-    def __init__(self, credentials):
-        self.service = butter.providers.aws.impl.service.ServiceClient(boto3, credentials,
+    def __init__(self, credentials, driver=None):
+        if not driver:
+            driver = get_aws_driver(credentials)
+        self.service = butter.providers.aws.impl.service.ServiceClient(driver, credentials,
                                                                        mock=False)
 
     # pylint: disable=too-many-arguments
-    def create(self, network, service_name, blueprint, template_vars, count):
+    def create(self, network, service_name, blueprint, template_vars, count, wait=True):
         """
         Create a service in "network" named "service_name" with blueprint file at "blueprint".
 
@@ -27,8 +29,10 @@ class ServiceClient:
 
         "count" is the number of instances to create for the service.  Default is one for each
         availability zone.
+
+        Unless "wait" is false, waits for all the instances to be running before returning.
         """
-        return self.service.create(network, service_name, blueprint, template_vars, count)
+        return self.service.create(network, service_name, blueprint, template_vars, count, wait)
 
     def list(self):
         """
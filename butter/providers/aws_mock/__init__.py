@@ -5,3 +5,4 @@ This module uses AWS as a backing provider with moto instead of boto3 so that no
 deployed.
 """
 from butter.providers.aws_mock import (network, service, paths)
+from butter.providers.aws.driver import get_mock_aws_driver as get_driver
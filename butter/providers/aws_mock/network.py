@@ -1,9 +1,9 @@
 """
 Butter Network on Mock AWS
 """
-import boto3
 from moto import mock_ec2
 import butter.providers.aws.impl.network
+from butter.providers.aws.driver import get_mock_aws_driver
 
 @mock_ec2
 class NetworkClient:
@@ -13,8 +13,10 @@ class NetworkClient:
     This is the object through which all network related calls are made for AWS.
     """
 
-    def __init__(self, credentials):
-        self.network = butter.providers.aws.impl.network.NetworkClient(boto3, credentials,
+    def __init__(self, credentials, driver=None):
+        if not driver:
+            driver = get_mock_aws_driver(credentials)
+        self.network = butter.providers.aws.impl.network.NetworkClient(driver, credentials,
                                                                        mock=False)
 
     def create(self, name, blueprint):
@@ -1,9 +1,9 @@
 """
 Butter Mock AWS Service
 """
-import boto3
 from moto import mock_ec2, mock_autoscaling
 import butter.providers.aws.impl.service
+from butter.providers.aws.driver import get_mock_aws_driver
 
 @mock_ec2
 @mock_autoscaling
@@ -11,12 +11,14 @@ class ServiceClient:
     """
     Butter Service Client Object for Mock AWS
     """
-    def __init__(self, credentials):
-        self.service = butter.providers.aws.impl.service.ServiceClient(boto3, credentials,
+    def __init__(self, credentials, driver=None):
+        if not driver:
+            driver = get_mock_aws_driver(credentials)
+        self.service = butter.providers.aws.impl.service.ServiceClient(driver, credentials,
                                                                        mock=True)
 
     # pylint: disable=too-many-arguments
-    def create(self, network, service_name, blueprint, template_vars, count):
+    def create(self, network, service_name, blueprint, template_vars, count, wait=True):
         """
         Create a service in "network" named "service_name" with blueprint file at "blueprint".
 
@@ -24,8 +26,10 @@ class ServiceClient:
 
         "count" is the number of instances to create for the service.  Default is one for each
         availability zone.
+
+        Unless "wait" is false, waits for all the instances to be running before returning.
         """
-        return self.service.create(network, service_name, blueprint, template_vars, count)
+        return self.service.create(network, service_name, blueprint, template_vars, count, wait)
 
     def get(self, network, service_name):
         """
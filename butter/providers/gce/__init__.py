@@ -4,3 +4,4 @@ GCE Provider
 This module implements support for using GCE as a backing provider.
 """
 from butter.providers.gce import (network, service, paths)
+from butter.providers.gce.driver import get_gce_driver as get_driver
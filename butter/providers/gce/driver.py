@@ -3,17 +3,40 @@ Google Compute Engine Driver Setup
 
 GCE uses an oauth process to authenticate, so getting the driver uses the provided credentials to do
 that.
+
+Networks and firewalls are global on GCE, but subnetworks and instances live in a region, which is
+the "region" in the credentials, or "us-east1" if there isn't one.
 """
 from libcloud.compute.types import Provider
 from libcloud.compute.providers import get_driver
 
+DEFAULT_REGION = "us-east1"
+
+
+def get_region(credentials):
+    """
+    Returns the region that clients using "credentials" create and list subnetworks and instances
+    in.
+    """
+    return (credentials or {}).get("region", DEFAULT_REGION)
+
+
+def zone_region(zone_name):
+    """
+    Returns the region of the zone named "zone_name", like "europe-west1" for "europe-west1-b".
+    """
+    return zone_name.rsplit("-", 1)[0]
+
 
-def get_gce_driver(credentials):
+def get_gce_driver(credentials, recorder=None):
     """
-    Uses the given credentials to get a GCE driver object from libcloud.
+    Uses the given credentials to get a GCE driver object from libcloud.  Calls are recorded with
+    "recorder", if one is given.
     """
     compute_engine_driver = get_driver(Provider.GCE)
     driver = compute_engine_driver(user_id=credentials["user_id"],
                                    key=credentials["key"],
                                    project=credentials["project"])
+    if recorder:
+        return recorder.instrument(driver, "gce.")
     return driver
@@ -14,22 +14,25 @@ from libcloud.common.google import ResourceNotFoundError
 from butter.util.blueprint import ServiceBlueprint, NetworkBlueprint
 from butter.util.subnet_generator import generate_subnets
 from butter.util.exceptions import NotEnoughIPSpaceException
-from butter.providers.gce.driver import get_gce_driver
+from butter.util.operation_cache import OperationCache
+from butter.util.tracing import traced
+from butter.providers.gce.driver import get_gce_driver, get_region
 from butter.providers.gce.log import logger
 from butter.providers.gce.schemas import canonicalize_subnetwork_info
 
-DEFAULT_REGION = "us-east1"
-
 
 class SubnetworkClient:
     """
     Client object to manage subnetworks.
     """
 
-    def __init__(self, credentials):
+    def __init__(self, credentials, cache=None, driver=None):
         self.credentials = credentials
-        self.driver = get_gce_driver(credentials)
+        self.driver = driver if driver else get_gce_driver(credentials)
+        self.region = get_region(credentials)
+        self.cache = cache if cache else OperationCache()
 
+    @traced("subnetwork.create")
     def create(self, network_name, subnetwork_name, blueprint):
         """
         Create a group of subnetworks in "network_name" named "subnetwork_name"
@@ -43,7 +46,7 @@ class SubnetworkClient:
         instances_blueprint = ServiceBlueprint(blueprint)
         max_count = instances_blueprint.max_count()
         prefix = 32 - int(math.log(max_count, 2))
-        region = DEFAULT_REGION
+        region = self.region
         # In google compute engine we provision instances across availability
         # zones, not subnets.  This means we only provision one subnetwork and
         # will stripe instances across azs within that.
@@ -64,12 +67,12 @@ class SubnetworkClient:
         """
         logger.info('Discovering subnetwork %s, %s', network.name, subnetwork_name)
         full_name = "%s-%s" % (network.name, subnetwork_name)
-        all_subnetworks = self.driver.ex_list_subnetworks()
-        subnets = [sn for sn in all_subnetworks if
-                   sn.network.name == network.name and
-                   sn.name == full_name]
-        return [canonicalize_subnetwork_info(sn) for sn in subnets]
+        subnets = self._network_subnetworks(network.name)
+        if full_name not in subnets:
+            return []
+        return [canonicalize_subnetwork_info(subnets[full_name])]
 
+    @traced("subnetwork.destroy")
     def destroy(self, network_name, subnetwork_name):
         """
         Destroy a group of subnetworks named "subnetwork_name" in "network_name".
@@ -77,31 +80,26 @@ class SubnetworkClient:
         logger.info('Destroying subnetwork group %s, %s', network_name,
                     subnetwork_name)
         full_name = "%s-%s" % (network_name, subnetwork_name)
-        all_subnetworks = self.driver.ex_list_subnetworks()
-        subnets = [sn for sn in all_subnetworks if
-                   sn.network.name == network_name and
-                   sn.name == full_name]
-        region = DEFAULT_REGION
-        destroy_results = []
-        for subnet in subnets:
-            try:
-                logger.info('Destroying subnetwork %s', subnet.name)
-                subnet_info = self.driver.ex_get_subnetwork(subnet.name,
-                                                            region)
-            except ResourceNotFoundError as not_found:
-                logger.info("Caught exception destroying subnetwork, "
-                            "ignoring: %s", not_found)
-                return True
-            destroy_results.append(self.driver.ex_destroy_subnetwork(
-                subnet_info))
-        return destroy_results
+        subnets = self._network_subnetworks(network_name)
+        if full_name not in subnets:
+            return []
+        subnet = subnets[full_name]
+        logger.info('Destroying subnetwork %s', subnet.name)
+        try:
+            destroy_result = self.driver.ex_destroy_subnetwork(subnet)
+        except ResourceNotFoundError as not_found:
+            logger.info("Caught exception destroying subnetwork, "
+                        "ignoring: %s", not_found)
+            destroy_result = True
+        del subnets[full_name]
+        return [destroy_result]
 
     def list(self):
         """
-        List all subnetworks.
+        List all subnetworks in our region.
         """
         logger.info('Listing subnetworks')
-        subnets = self.driver.ex_list_subnetworks()
+        subnets = self.driver.ex_list_subnetworks(region=self.region)
         subnets_info = {}
         for subnet in subnets:
             if subnet.network.name == "default":
@@ -117,12 +115,29 @@ class SubnetworkClient:
         logger.info('Found subnetworks: %s', subnets_info)
         return subnets_info
 
+    def _subnetworks_index(self):
+        """
+        Returns an index of all subnetworks in our region, keyed by network name and then by
+        subnetwork name.  This is shared by every call in the current operation, so we only list
+        subnetworks from the provider once.
+        """
+        def load_index():
+            index = {}
+            for subnet in self.driver.ex_list_subnetworks(region=self.region):
+                index.setdefault(subnet.network.name, {})[subnet.name] = subnet
+            return index
+        return self.cache.get(("subnetworks", self.region), load_index)
+
+    def _network_subnetworks(self, network_name):
+        """
+        Returns a dictionary of subnetwork name to subnetwork for all subnetworks in "network_name".
+        """
+        return self._subnetworks_index().setdefault(network_name, {})
+
     def _carve_subnets(self, network_name, blueprint, prefix=28, count=3):
         # Get existing subnets, to make sure we don't overlap CIDR blocks
-        all_subnetworks = self.driver.ex_list_subnetworks()
-        existing_subnets = [subnetwork for subnetwork in all_subnetworks if
-                            subnetwork.network.name == network_name]
-        existing_cidrs = [subnet.cidr for subnet in existing_subnets]
+        existing_cidrs = [subnet.cidr for subnet
+                          in self._network_subnetworks(network_name).values()]
 
         if blueprint:
             network_blueprint = NetworkBlueprint(blueprint)
@@ -139,4 +154,8 @@ class SubnetworkClient:
     def _gce_provision_subnet(self, name, cidr, region, network_name):
         subnetwork = self.driver.ex_create_subnetwork(name, cidr, network_name,
                                                       region)
+        # Keep the index for this operation in sync, so the rest of the operation doesn't have to
+        # list subnetworks again to see this one.
+        if self.cache.peek(("subnetworks", region)) is not None:
+            self._network_subnetworks(network_name)[name] = subnetwork
         return canonicalize_subnetwork_info(subnetwork)
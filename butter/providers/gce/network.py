@@ -18,9 +18,9 @@ class NetworkClient:
     This is the object through which all network related calls are made for GCE.
     """
 
-    def __init__(self, credentials):
+    def __init__(self, credentials, driver=None):
         self.credentials = credentials
-        self.driver = get_gce_driver(credentials)
+        self.driver = driver if driver else get_gce_driver(credentials)
 
     # pylint: disable=unused-argument
     def create(self, name, blueprint):
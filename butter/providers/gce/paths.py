@@ -20,10 +20,10 @@ class PathsClient:
     Client object to interact with paths between resources.
     """
 
-    def __init__(self, credentials):
+    def __init__(self, credentials, driver=None):
         self.credentials = credentials
-        self.driver = get_gce_driver(credentials)
-        self.service = ServiceClient(credentials)
+        self.driver = driver if driver else get_gce_driver(credentials)
+        self.service = ServiceClient(credentials, self.driver)
 
     # pylint: disable=no-self-use
     def _validate_args(self, source, destination):
@@ -93,6 +93,12 @@ class PathsClient:
                                                       target_tags=dest_tags)
         return Path(destination.network, source, destination, "tcp", port)
 
+    def add_many(self, paths):
+        """
+        Adds a route for every (source, destination, port) in "paths".
+        """
+        return [self.add(source, destination, port) for source, destination, port in paths]
+
     def remove(self, source, destination, port):
         """
         Remove path between two services on a given port.
@@ -139,14 +145,22 @@ class PathsClient:
             return self.driver.ex_destroy_firewall(firewall)
         return self.driver.ex_update_firewall(firewall)
 
-    def list(self):
+    def remove_many(self, paths):
+        """
+        Removes the route for every (source, destination, port) in "paths".
+        """
+        for source, destination, port in paths:
+            self.remove(source, destination, port)
+
+    def list(self, services=None):
         """
-        List all paths in a dictionary structure.
+        List all paths in a dictionary structure.  Uses "services" as the list of all services, if
+        given, rather than listing them again.
         """
         firewalls = self.driver.ex_list_firewalls()
 
         tag_to_service = {}
-        for service in self.service.list():
+        for service in services if services is not None else self.service.list():
             service_tag = "%s-%s" % (service.network.name, service.name)
             if service_tag in tag_to_service:
                 raise BadEnvironmentStateException(
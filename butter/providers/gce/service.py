@@ -7,12 +7,14 @@ import ipaddress
 import itertools
 import re
 
-from butter.providers.gce.driver import get_gce_driver
+from butter.providers.gce.driver import get_gce_driver, get_region, zone_region
 
 from butter.util.blueprint import ServiceBlueprint
 from butter.util.instance_fitter import get_fitting_instance
 from butter.util.exceptions import (DisallowedOperationException,
                                     BadEnvironmentStateException)
+from butter.util.operation_cache import OperationCache, cached_operation
+from butter.util.tracing import traced
 from butter.providers.gce.impl import subnetwork
 from butter.providers.gce.network import NetworkClient
 from butter.providers.gce.impl.firewalls import Firewalls
@@ -21,25 +23,27 @@ from butter.providers.gce.schemas import (canonicalize_instance_info,
                                           canonicalize_node_size)
 from butter.types.common import Service
 
-DEFAULT_REGION = "us-east1"
-
 
 class ServiceClient:
     """
     Client object to manage services.
     """
 
-    def __init__(self, credentials):
+    def __init__(self, credentials, driver=None):
         self.credentials = credentials
-        self.driver = get_gce_driver(credentials)
-        self.subnetwork = subnetwork.SubnetworkClient(credentials)
-        self.network = NetworkClient(credentials)
+        self.driver = driver if driver else get_gce_driver(credentials)
+        self.region = get_region(credentials)
+        self.cache = OperationCache()
+        self.subnetwork = subnetwork.SubnetworkClient(credentials, self.cache, self.driver)
+        self.network = NetworkClient(credentials, self.driver)
         self.firewalls = Firewalls(self.driver)
 
-    # pylint: disable=too-many-arguments, too-many-locals
-    def create(self, network, service_name, blueprint, template_vars, count):
+    # pylint: disable=too-many-arguments, too-many-locals, unused-argument
+    @cached_operation
+    def create(self, network, service_name, blueprint, template_vars, count, wait=True):
         """
         Create a service in "network" named "service_name" with blueprint file at "blueprint".
+        Creating each node already waits for it to start, so "wait" makes no difference here.
         """
         logger.info('Creating service %s, %s with blueprint %s and ' 'template_vars %s',
                     network.name, service_name, blueprint, template_vars)
@@ -55,6 +59,7 @@ class ServiceClient:
         if count:
             instance_count = count
 
+        @traced("image.lookup")
         def get_image(image_specifier):
             images = [image for image in self.driver.list_images() if re.match(image_specifier,
                                                                                image.name)]
@@ -85,6 +90,7 @@ class ServiceClient:
                                     ex_tags=[full_subnetwork_name])
         return self.get(network, service_name)
 
+    @cached_operation
     def get(self, network, service_name):
         """
         Get a service in "network" named "service_name".
@@ -110,6 +116,7 @@ class ServiceClient:
 
         return Service(network=network, name=service_name, subnetworks=subnetworks)
 
+    @cached_operation
     def destroy(self, service):
         """
         Destroy a service described by "service".
@@ -136,13 +143,16 @@ class ServiceClient:
         return {"Subnetwork": subnetwork_destroy,
                 "Instances": destroy_results}
 
+    @cached_operation
     def list(self):
         """
-        List all instance groups.
+        List all instance groups in our region.
         """
         logger.debug('Listing services')
         instances_info = {}
         for node in self.driver.list_nodes():
+            if zone_region(node.extra["zone"].name) != self.region:
+                continue
             logger.debug("Node metadata: %s", node.extra["metadata"])
             metadata = node.extra["metadata"]["items"]
             network_names = [item["value"] for item in metadata
@@ -168,7 +178,7 @@ class ServiceClient:
 
     def _get_availability_zones(self):
         zones = self.driver.ex_list_zones()
-        return [zone for zone in zones if zone.name.startswith(DEFAULT_REGION)]
+        return [zone for zone in zones if zone_region(zone.name) == self.region]
 
     def node_types(self):
         """
@@ -179,8 +189,7 @@ class ServiceClient:
         # with region strings.
         zones = self.driver.ex_list_zones()
         for zone in zones:
-            if zone.name.startswith(DEFAULT_REGION):
+            if zone_region(zone.name) == self.region:
                 node_sizes = self.driver.list_sizes(location=zone)
                 return [canonicalize_node_size(node_size) for node_size in node_sizes]
-        raise DisallowedOperationException("Could not find zone in region: %s" %
-                                           DEFAULT_REGION)
+        raise DisallowedOperationException("Could not find zone in region: %s" % self.region)
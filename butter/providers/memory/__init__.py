@@ -0,0 +1,10 @@
+"""
+In Memory Provider
+
+This provider keeps everything in python data structures in the current process, so it needs no
+credentials, deploys nothing, and is fast enough to build environments with tens of thousands of
+services.  It follows the same semantics as the AWS provider, and is meant for tests, demos, and
+benchmarks.
+"""
+from butter.providers.memory import (network, service, paths)
+from butter.providers.memory.driver import get_memory_driver as get_driver
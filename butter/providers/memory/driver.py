@@ -0,0 +1,352 @@
+"""
+In Memory Cloud
+
+This is the "cloud" that the memory provider talks to.  It keeps networks, services, and firewall
+rules in plain python data structures, indexed so that every call is a dictionary lookup or close to
+it, which makes it possible to build very large environments for tests and benchmarks in seconds.
+
+The calls here are deliberately shaped like a simplified cloud API (create a network, create a group
+of instances with its subnets and security group, authorize ingress on a security group) so that the
+memory provider's network, service, and paths clients do the same kind of work as the real ones.
+
+Every driver with the same "account" and "region" in its credentials shares the same cloud, just
+like moto shares its backends, so separate clients can see each other's resources.  Each region of
+an account is a separate cloud, like it is on AWS.
+"""
+import bisect
+import ipaddress
+import itertools
+import threading
+
+from butter.util.exceptions import (DisallowedOperationException,
+                                    BadEnvironmentStateException,
+                                    NotEnoughIPSpaceException)
+
+REGION = "memory-1"
+AVAILABILITY_ZONE_SUFFIXES = ["a", "b", "c"]
+PUBLIC_IP_BLOCK = ipaddress.IPv4Network("198.18.0.0/15")
+# Like AWS, don't hand out the first few addresses in a subnet.
+RESERVED_ADDRESS_COUNT = 4
+
+_CLOUDS = {}
+_CLOUDS_LOCK = threading.Lock()
+
+
+class CidrAllocator:
+    """
+    Hands out non overlapping CIDR blocks of a given prefix inside a parent block.
+
+    Allocated blocks are kept as a sorted list of address intervals so that checking a candidate for
+    overlap is a binary search, and we remember where the last search for each prefix ended so we
+    don't rescan the blocks that we already know are taken.
+    """
+
+    def __init__(self, parent_cidr):
+        self.parent = ipaddress.IPv4Network(parent_cidr)
+        self._starts = []
+        self._ends = []
+        self._cursors = {}
+
+    def _overlaps(self, start, end):
+        index = bisect.bisect_right(self._starts, end)
+        return index > 0 and self._ends[index - 1] >= start
+
+    def _reserve(self, start, end):
+        index = bisect.bisect_left(self._starts, start)
+        self._starts.insert(index, start)
+        self._ends.insert(index, end)
+
+    def allocate(self, prefix, count):
+        """
+        Allocate "count" blocks with the given prefix, or raise NotEnoughIPSpaceException.
+        """
+        if prefix < self.parent.prefixlen:
+            raise NotEnoughIPSpaceException("Cannot allocate /%s blocks in %s" %
+                                            (prefix, self.parent))
+        size = 2 ** (32 - prefix)
+        first = int(self.parent.network_address)
+        last = int(self.parent.broadcast_address)
+        candidate = max(self._cursors.get(prefix, first), first)
+        blocks = []
+        while len(blocks) < count and candidate + size - 1 <= last:
+            if not self._overlaps(candidate, candidate + size - 1):
+                blocks.append(candidate)
+            candidate += size
+        if len(blocks) < count:
+            raise NotEnoughIPSpaceException("Could not allocate %s subnets with prefix %s in %s" %
+                                            (count, prefix, self.parent))
+        for block in blocks:
+            self._reserve(block, block + size - 1)
+        self._cursors[prefix] = candidate
+        return [str(ipaddress.IPv4Network((block, prefix))) for block in blocks]
+
+    def free(self, cidr_block):
+        """
+        Return the given block to the pool.
+        """
+        block = ipaddress.IPv4Network(cidr_block)
+        start = int(block.network_address)
+        index = bisect.bisect_left(self._starts, start)
+        if index < len(self._starts) and self._starts[index] == start:
+            del self._starts[index]
+            del self._ends[index]
+        for prefix, cursor in self._cursors.items():
+            self._cursors[prefix] = min(cursor, start)
+
+
+def _copy_service(service):
+    """
+    Copy a service record.  This is much faster than a deep copy, which matters when listing
+    thousands of services.
+    """
+    result = dict(service)
+    result["Subnets"] = []
+    for subnet in service["Subnets"]:
+        subnet_copy = dict(subnet)
+        subnet_copy["Instances"] = [dict(instance) for instance in subnet["Instances"]]
+        result["Subnets"].append(subnet_copy)
+    return result
+
+
+# pylint: disable=too-many-instance-attributes
+class MemoryDriver:
+    """
+    A whole cloud account held in memory.  All calls are safe to make from multiple threads.
+
+    Records are returned as dictionaries in the same style as the AWS API, and are always copies, so
+    callers can't modify the cloud by accident.
+    """
+
+    def __init__(self, account="default", region_name=REGION):
+        self.account = account
+        self.region_name = region_name
+        self.availability_zones = [region_name + suffix for suffix in AVAILABILITY_ZONE_SUFFIXES]
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._public_ips = itertools.count(1)
+        self._networks = {}
+        self._network_names = {}
+        self._allocators = {}
+        self._services = {}
+        self._network_services = {}
+        self._groups = {}
+        self._rules = {}
+
+    def _new_id(self, prefix):
+        return "%s-%08x" % (prefix, next(self._ids))
+
+    def _new_public_ip(self):
+        offset = next(self._public_ips) % PUBLIC_IP_BLOCK.num_addresses
+        return str(PUBLIC_IP_BLOCK.network_address + offset)
+
+    def _get_network_record(self, network_id):
+        if network_id not in self._networks:
+            raise BadEnvironmentStateException("Network %s does not exist" % network_id)
+        return self._networks[network_id]
+
+    def create_network(self, name, cidr_block):
+        """
+        Create a network named "name" with the given CIDR block.
+        """
+        with self._lock:
+            if name in self._network_names:
+                raise DisallowedOperationException("Found existing network named: %s" % name)
+            network_id = self._new_id("net")
+            network = {"NetworkId": network_id, "Name": name, "CidrBlock": str(cidr_block),
+                       "Region": self.region_name}
+            self._networks[network_id] = network
+            self._network_names[name] = network_id
+            self._allocators[network_id] = CidrAllocator(cidr_block)
+            self._network_services[network_id] = {}
+            return dict(network)
+
+    def describe_networks(self, name=None):
+        """
+        Return all networks, or only the one named "name" if given.
+        """
+        with self._lock:
+            if name is not None:
+                if name not in self._network_names:
+                    return []
+                return [dict(self._networks[self._network_names[name]])]
+            return [dict(network) for network in self._networks.values()]
+
+    def delete_network(self, network_id):
+        """
+        Delete the network with the given id.  Fails if there are still services in it.
+        """
+        with self._lock:
+            network = self._get_network_record(network_id)
+            if self._network_services[network_id]:
+                raise DisallowedOperationException(
+                    "Found services in network, cannot delete: %s" %
+                    sorted(self._network_services[network_id]))
+            del self._network_names[network["Name"]]
+            del self._networks[network_id]
+            del self._allocators[network_id]
+            del self._network_services[network_id]
+            return True
+
+    # pylint: disable=too-many-arguments,too-many-locals
+    def create_service(self, network_id, name, prefix, availability_zone_count, instance_count,
+                       public_ip, instance_type):
+        """
+        Create a service in the given network, with one subnet of the given prefix in each
+        availability zone, a security group, and "instance_count" instances striped across the
+        subnets.
+        """
+        with self._lock:
+            self._get_network_record(network_id)
+            services = self._network_services[network_id]
+            if name in services:
+                raise DisallowedOperationException("Found existing service named: %s" % name)
+            if availability_zone_count > len(self.availability_zones):
+                raise DisallowedOperationException("Do not have %s availability zones: %s" % (
+                    availability_zone_count, self.availability_zones))
+            cidr_blocks = self._allocators[network_id].allocate(prefix, availability_zone_count)
+            subnets = []
+            for cidr_block, availability_zone in zip(cidr_blocks, self.availability_zones):
+                subnets.append({"SubnetId": self._new_id("subnet"), "CidrBlock": cidr_block,
+                                "AvailabilityZone": availability_zone, "Instances": []})
+            for instance_num, subnet in zip(range(instance_count), itertools.cycle(subnets)):
+                block = ipaddress.IPv4Network(subnet["CidrBlock"])
+                host = RESERVED_ADDRESS_COUNT + instance_num // len(subnets)
+                if host >= block.num_addresses - 1:
+                    raise NotEnoughIPSpaceException("Not enough addresses in %s for %s instances"
+                                                    % (cidr_blocks, instance_count))
+                subnet["Instances"].append({
+                    "InstanceId": self._new_id("i"),
+                    "InstanceType": instance_type,
+                    "PrivateIpAddress": str(block.network_address + host),
+                    "PublicIpAddress": self._new_public_ip() if public_ip else None,
+                    "State": "running"})
+            group_id = self._new_id("sg")
+            service = {"NetworkId": network_id, "Name": name, "GroupId": group_id,
+                       "Subnets": subnets}
+            services[name] = service
+            self._services[(network_id, name)] = service
+            self._groups[group_id] = (network_id, name)
+            self._rules[group_id] = {}
+            return _copy_service(service)
+
+    def describe_services(self, network_id=None, name=None):
+        """
+        Return all services, optionally only those in "network_id", or only the one named "name".
+        """
+        with self._lock:
+            if network_id is not None and name is not None:
+                if (network_id, name) not in self._services:
+                    return []
+                return [_copy_service(self._services[(network_id, name)])]
+            if network_id is not None:
+                return [_copy_service(service)
+                        for service in self._network_services.get(network_id, {}).values()]
+            return [_copy_service(service) for service in self._services.values()]
+
+    def get_security_group(self, network_id, name):
+        """
+        Return the id of the security group of the service named "name" in "network_id", or None
+        if there is no such service.
+        """
+        with self._lock:
+            service = self._services.get((network_id, name))
+            return service["GroupId"] if service else None
+
+    def describe_security_groups(self):
+        """
+        Return a map from the id of every security group to the (network id, service name) of the
+        service it belongs to.
+        """
+        with self._lock:
+            return dict(self._groups)
+
+    def delete_service(self, network_id, name):
+        """
+        Delete a service and everything in it.  Rules in other security groups that reference this
+        service's security group are removed as well.
+        """
+        with self._lock:
+            if (network_id, name) not in self._services:
+                return False
+            service = self._services.pop((network_id, name))
+            del self._network_services[network_id][name]
+            group_id = service["GroupId"]
+            del self._groups[group_id]
+            del self._rules[group_id]
+            for rules in self._rules.values():
+                for rule in rules.values():
+                    rule["Groups"].discard(group_id)
+            for subnet in service["Subnets"]:
+                self._allocators[network_id].free(subnet["CidrBlock"])
+            return True
+
+    def _rule(self, group_id, port):
+        if group_id not in self._rules:
+            raise BadEnvironmentStateException("Security group %s does not exist" % group_id)
+        rules = self._rules[group_id]
+        if port not in rules:
+            rules[port] = {"Groups": set(), "CidrBlocks": set()}
+        return rules[port]
+
+    def authorize_ingress(self, group_id, port, source_group_ids=(), cidr_blocks=()):
+        """
+        Allow traffic into "group_id" on "port" from the given security groups and CIDR blocks.
+        """
+        with self._lock:
+            for source_group_id in source_group_ids:
+                if source_group_id not in self._groups:
+                    raise BadEnvironmentStateException(
+                        "Security group %s does not exist" % source_group_id)
+            rule = self._rule(group_id, int(port))
+            rule["Groups"].update(source_group_ids)
+            rule["CidrBlocks"].update(str(ipaddress.IPv4Network(cidr_block))
+                                      for cidr_block in cidr_blocks)
+            return True
+
+    def revoke_ingress(self, group_id, port, source_group_ids=(), cidr_blocks=()):
+        """
+        Remove the given security groups and CIDR blocks from the rule for "group_id" on "port".
+        """
+        with self._lock:
+            rule = self._rule(group_id, int(port))
+            rule["Groups"].difference_update(source_group_ids)
+            rule["CidrBlocks"].difference_update(str(ipaddress.IPv4Network(cidr_block))
+                                                 for cidr_block in cidr_blocks)
+            if not rule["Groups"] and not rule["CidrBlocks"]:
+                del self._rules[group_id][int(port)]
+            return True
+
+    def describe_ingress(self, group_ids=None):
+        """
+        Return a dictionary of security group id to port to the sources allowed on that port, for
+        the given groups or all groups.
+        """
+        with self._lock:
+            if group_ids is None:
+                group_ids = list(self._rules)
+            result = {}
+            for group_id in group_ids:
+                if group_id not in self._rules:
+                    continue
+                result[group_id] = {
+                    port: {"Groups": sorted(rule["Groups"]),
+                           "CidrBlocks": sorted(rule["CidrBlocks"])}
+                    for port, rule in self._rules[group_id].items()}
+            return result
+
+
+def get_memory_driver(credentials, recorder=None):
+    """
+    Get the in memory cloud for the account and region named in "credentials", creating it if
+    necessary.  With no account given everyone shares the "default" account, and with no region
+    given the "memory-1" region.  Calls are recorded with "recorder", if one is given.
+    """
+    credentials = credentials or {}
+    key = (credentials.get("account", "default"), credentials.get("region", REGION))
+    with _CLOUDS_LOCK:
+        if key not in _CLOUDS:
+            _CLOUDS[key] = MemoryDriver(*key)
+        driver = _CLOUDS[key]
+    if recorder:
+        return recorder.instrument(driver, "memory.")
+    return driver
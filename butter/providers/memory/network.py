@@ -0,0 +1,63 @@
+"""
+Butter Network in Memory
+
+This component should allow for intuitive and transparent control over networks, which are the top
+level containers for groups of instances/services.  This is the in memory implementation.
+"""
+from butter.util.blueprint import NetworkBlueprint
+from butter.util.subnet_generator import generate_subnets
+from butter.util.exceptions import (DisallowedOperationException,
+                                    NotEnoughIPSpaceException)
+from butter.providers.memory.driver import get_memory_driver
+from butter.providers.memory.schemas import canonicalize_network_info
+
+
+class NetworkClient:
+    """
+    Butter Network Client Object for the in memory provider
+
+    This is the object through which all network related calls are made.
+    """
+
+    def __init__(self, credentials, driver=None):
+        self.credentials = credentials
+        self.driver = driver if driver else get_memory_driver(credentials)
+
+    def create(self, name, blueprint):
+        """
+        Create new network named "name" with blueprint file at "blueprint".
+        """
+        if self.get(name):
+            raise DisallowedOperationException("Found existing network named: %s" % name)
+        if blueprint:
+            network_blueprint = NetworkBlueprint(blueprint)
+        else:
+            network_blueprint = NetworkBlueprint(None, "")
+        allocation_block = network_blueprint.get_allowed_private_cidr()
+        prefix = network_blueprint.get_prefix()
+        # Like AWS, networks are allowed to overlap, so just take the first block.
+        for cidr in generate_subnets(allocation_block, [], prefix, count=1):
+            return canonicalize_network_info(self.driver.create_network(name, str(cidr)))
+        raise NotEnoughIPSpaceException("Could not allocate network of size %s in %s" %
+                                        (prefix, allocation_block))
+
+    def get(self, name):
+        """
+        Get a network named "name" and return some data about it.
+        """
+        networks = self.driver.describe_networks(name=name)
+        if not networks:
+            return None
+        return canonicalize_network_info(networks[0])
+
+    def destroy(self, network):
+        """
+        Destroy a network given the provided network object.
+        """
+        return self.driver.delete_network(network.network_id)
+
+    def list(self):
+        """
+        List all networks.
+        """
+        return [canonicalize_network_info(network) for network in self.driver.describe_networks()]
@@ -0,0 +1,169 @@
+"""
+Butter Paths in Memory
+
+This is the in memory implementation for the paths API, a high level interface to add routes
+between services.  Like AWS, each service has a security group and paths are ingress rules on the
+destination's security group.
+"""
+import ipaddress
+
+from butter.providers.memory.driver import get_memory_driver
+from butter.providers.memory.schemas import (canonicalize_network_info,
+                                             canonicalize_service_info)
+from butter.util.exceptions import BadEnvironmentStateException, DisallowedOperationException
+from butter.util.public_blocks import get_public_blocks
+from butter.types.common import Service, Path, Subnetwork
+from butter.types.networking import CidrBlock
+
+
+class PathsClient:
+    """
+    Client object to interact with paths between resources.
+    """
+    def __init__(self, credentials, driver=None):
+        self.credentials = credentials
+        self.driver = driver if driver else get_memory_driver(credentials)
+
+    def _group_id(self, service):
+        group_id = self.driver.get_security_group(service.network.network_id, service.name)
+        if not group_id:
+            raise BadEnvironmentStateException("Could not find service: %s" % service)
+        return group_id
+
+    def _extract_service_info(self, source, destination):
+        """
+        Helper to extract the security groups and CIDR blocks from the source and destination
+        arguments.
+        """
+        if (not isinstance(source, Service) and not isinstance(destination, Service) and
+                not isinstance(source, CidrBlock) and not isinstance(destination, CidrBlock)):
+            raise DisallowedOperationException(
+                "Source and destination can only be a butter.types.networking.Service object or a "
+                "butter.types.networking.CidrBlock object")
+
+        if not isinstance(destination, Service) and not isinstance(source, Service):
+            raise DisallowedOperationException(
+                "Either destination or source must be a butter.types.networking.Service object")
+
+        if (isinstance(source, Service) and isinstance(destination, Service) and
+                source.network != destination.network):
+            raise DisallowedOperationException(
+                "Destination and source must be in the same network if specified as services")
+
+        # Currently controlling egress is not supported.  All egress is always allowed.
+        if not isinstance(destination, Service):
+            raise DisallowedOperationException(
+                "Destination must be a butter.types.networking.Service object")
+
+        dest_group_id = self._group_id(destination)
+        if isinstance(source, Service):
+            return dest_group_id, [self._group_id(source)], []
+        return dest_group_id, [], [str(source.cidr_block)]
+
+    def add(self, source, destination, port):
+        """
+        Adds a route from "source" to "destination".
+        """
+        if self.has_access(source, destination, port):
+            return True
+        dest_group_id, source_group_ids, cidr_blocks = self._extract_service_info(source,
+                                                                                  destination)
+        self.driver.authorize_ingress(dest_group_id, port, source_group_ids, cidr_blocks)
+        return Path(destination.network, source, destination, "tcp", port)
+
+    def add_many(self, paths):
+        """
+        Adds a route for every (source, destination, port) in "paths".
+        """
+        return [self.add(source, destination, port) for source, destination, port in paths]
+
+    def remove(self, source, destination, port):
+        """
+        Remove a route from "source" to "destination".
+        """
+        dest_group_id, source_group_ids, cidr_blocks = self._extract_service_info(source,
+                                                                                  destination)
+        return self.driver.revoke_ingress(dest_group_id, port, source_group_ids, cidr_blocks)
+
+    def remove_many(self, paths):
+        """
+        Removes the route for every (source, destination, port) in "paths".
+        """
+        for source, destination, port in paths:
+            self.remove(source, destination, port)
+
+    @staticmethod
+    def _rule_paths(destination, port, rule, group_to_service):
+        """
+        Returns the paths into "destination" on "port" that the ingress "rule" allows, from the
+        sources in "group_to_service", a map from security group to service, or CIDR blocks.
+        """
+        paths = []
+        # We treat an explicit CIDR block as a special case of a service with no name.
+        if rule["CidrBlocks"]:
+            subnets = [Subnetwork(subnetwork_id=None, name=None, cidr_block=cidr_block,
+                                  region=None, availability_zone=None, instances=[])
+                       for cidr_block in rule["CidrBlocks"]]
+            source = Service(network=None, name=None, subnetworks=subnets)
+            paths.append(Path(destination.network, source, destination, "tcp", port))
+        for source_group_id in rule["Groups"]:
+            if source_group_id not in group_to_service:
+                continue
+            paths.append(Path(destination.network, group_to_service[source_group_id],
+                              destination, "tcp", port))
+        return paths
+
+    def list(self, services=None):
+        """
+        List all paths and return a dictionary structure representing a graph.  Uses "services" as
+        the list of all services, if given, rather than listing them again.
+        """
+        group_to_service = {}
+        if services is None:
+            networks = {network["NetworkId"]: canonicalize_network_info(network)
+                        for network in self.driver.describe_networks()}
+            for service in self.driver.describe_services():
+                group_to_service[service["GroupId"]] = canonicalize_service_info(
+                    networks[service["NetworkId"]], service)
+        else:
+            by_key = {(service.network.network_id, service.name): service for service in services}
+            for group_id, key in self.driver.describe_security_groups().items():
+                if key in by_key:
+                    group_to_service[group_id] = by_key[key]
+
+        paths = []
+        for group_id, rules in self.driver.describe_ingress().items():
+            # Services created after "services" was listed aren't part of this graph.
+            if group_id not in group_to_service:
+                continue
+            destination = group_to_service[group_id]
+            for port, rule in sorted(rules.items()):
+                paths.extend(self._rule_paths(destination, port, rule, group_to_service))
+        return paths
+
+    def internet_accessible(self, service, port):
+        """
+        Return true if the given service is accessible on the internet.
+        """
+        dest_group_id = self._group_id(service)
+        rule = self.driver.describe_ingress([dest_group_id]).get(dest_group_id, {}).get(int(port))
+        if not rule:
+            return False
+        return any(ipaddress.IPv4Network(cidr_block).overlaps(public_block)
+                   for cidr_block in rule["CidrBlocks"]
+                   for public_block in get_public_blocks())
+
+    def has_access(self, source, destination, port):
+        """
+        Return true if there is a route from "source" to "destination".
+        """
+        dest_group_id, source_group_ids, cidr_blocks = self._extract_service_info(source,
+                                                                                  destination)
+        rule = self.driver.describe_ingress([dest_group_id]).get(dest_group_id, {}).get(int(port))
+        if not rule:
+            return False
+        if set(source_group_ids) & set(rule["Groups"]):
+            return True
+        return any(ipaddress.IPv4Network(source_cidr).overlaps(ipaddress.IPv4Network(cidr_block))
+                   for source_cidr in cidr_blocks
+                   for cidr_block in rule["CidrBlocks"])
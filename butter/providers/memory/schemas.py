@@ -0,0 +1,42 @@
+"""
+Schemas of the records returned by the in memory cloud.
+"""
+from butter.types.common import Network, Service, Subnetwork, Instance
+
+
+def canonicalize_network_info(network):
+    """
+    Convert a network record into the butter standard format.
+    """
+    return Network(name=network["Name"], network_id=network["NetworkId"],
+                   cidr_block=network["CidrBlock"], region=network["Region"])
+
+
+def canonicalize_service_info(network, service):
+    """
+    Convert a service record into the butter standard format, given the network it is in.
+    """
+    return Service(network=network, name=service["Name"],
+                   subnetworks=[canonicalize_subnetwork_info(subnet)
+                                for subnet in service["Subnets"]])
+
+
+def canonicalize_subnetwork_info(subnet):
+    """
+    Convert a subnet record into the butter standard format.
+    """
+    return Subnetwork(subnetwork_id=subnet["SubnetId"], name=None, cidr_block=subnet["CidrBlock"],
+                      region=subnet["AvailabilityZone"][:-1],
+                      availability_zone=subnet["AvailabilityZone"],
+                      instances=[canonicalize_instance_info(instance)
+                                 for instance in subnet["Instances"]])
+
+
+def canonicalize_instance_info(instance):
+    """
+    Convert an instance record into the butter standard format.
+    """
+    return Instance(instance_id=instance["InstanceId"],
+                    private_ip=instance["PrivateIpAddress"] or "N/A",
+                    public_ip=instance["PublicIpAddress"] or "N/A",
+                    state=instance["State"])
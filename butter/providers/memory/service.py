@@ -0,0 +1,113 @@
+"""
+Butter Service in Memory
+
+This is the in memory implementation for the service API, a high level interface to manage groups
+of instances.
+"""
+import json
+import math
+import threading
+
+from butter.util.blueprint import ServiceBlueprint
+from butter.util.instance_fitter import get_fitting_instance
+from butter.util.storage_size_parser import parse_storage_size
+from butter.providers.memory.driver import get_memory_driver
+from butter.providers.memory.schemas import (canonicalize_network_info,
+                                             canonicalize_service_info)
+
+# A small subset of the AWS general purpose instance types, so that blueprints fit the same way.
+NODE_TYPES = [
+    {"type": "t2.nano", "memory": parse_storage_size("0.5GiB"), "cpus": 1.0},
+    {"type": "t2.micro", "memory": parse_storage_size("1GiB"), "cpus": 1.0},
+    {"type": "t2.small", "memory": parse_storage_size("2GiB"), "cpus": 1.0},
+    {"type": "t2.medium", "memory": parse_storage_size("4GiB"), "cpus": 2.0},
+    {"type": "t2.large", "memory": parse_storage_size("8GiB"), "cpus": 2.0},
+    {"type": "t2.xlarge", "memory": parse_storage_size("16GiB"), "cpus": 4.0},
+    {"type": "m4.large", "memory": parse_storage_size("8GiB"), "cpus": 2.0},
+    {"type": "m4.xlarge", "memory": parse_storage_size("16GiB"), "cpus": 4.0},
+    {"type": "m4.2xlarge", "memory": parse_storage_size("32GiB"), "cpus": 8.0},
+    ]
+
+
+class ServiceClient:
+    """
+    Client object to manage instances.
+    """
+
+    def __init__(self, credentials, driver=None):
+        self.credentials = credentials
+        self.driver = driver if driver else get_memory_driver(credentials)
+        self._blueprints = {}
+        self._blueprints_lock = threading.Lock()
+
+    def _blueprint_info(self, blueprint, template_vars):
+        """
+        Parse "blueprint" and return everything we need from it to create a service.  Results are
+        saved so that creating many services from the same blueprint only reads it once.
+        """
+        key = (blueprint, json.dumps(template_vars, sort_keys=True))
+        with self._blueprints_lock:
+            if key in self._blueprints:
+                return self._blueprints[key]
+        instances_blueprint = ServiceBlueprint(blueprint, template_vars)
+        # Validates the template variables, even though nothing ever runs the scripts.
+        instances_blueprint.runtime_scripts()
+        az_count = instances_blueprint.availability_zone_count()
+        info = {
+            "availability_zone_count": az_count,
+            "prefix": 32 - int(math.log(instances_blueprint.max_count() / az_count, 2)),
+            "public_ip": instances_blueprint.public_ip(),
+            "instance_type": get_fitting_instance(self, blueprint),
+            }
+        with self._blueprints_lock:
+            self._blueprints[key] = info
+        return info
+
+    # pylint: disable=too-many-arguments, unused-argument
+    def create(self, network, service_name, blueprint, template_vars=None, count=None, wait=True):
+        """
+        Create a service in "network" named "service_name" with blueprint file at "blueprint".
+
+        "template_vars" are passed to the initialization scripts as jinja2 variables.
+
+        "count" is the number of instances to create for the service.  Default is one for each
+        availability zone.  Instances are running as soon as they're created, so there's never
+        anything to "wait" for.
+        """
+        info = self._blueprint_info(blueprint, template_vars)
+        instance_count = count if count else info["availability_zone_count"]
+        service = self.driver.create_service(network.network_id, service_name, info["prefix"],
+                                             info["availability_zone_count"], instance_count,
+                                             info["public_ip"], info["instance_type"])
+        return canonicalize_service_info(network, service)
+
+    def get(self, network, service_name):
+        """
+        Get a service in "network" named "service_name".
+        """
+        services = self.driver.describe_services(network_id=network.network_id, name=service_name)
+        if not services:
+            return None
+        return canonicalize_service_info(network, services[0])
+
+    def destroy(self, service):
+        """
+        Destroy a service described by the "service" object.
+        """
+        return self.driver.delete_service(service.network.network_id, service.name)
+
+    def list(self):
+        """
+        List all services.
+        """
+        networks = {network["NetworkId"]: canonicalize_network_info(network)
+                    for network in self.driver.describe_networks()}
+        return [canonicalize_service_info(networks[service["NetworkId"]], service)
+                for service in self.driver.describe_services()]
+
+    # pylint: disable=no-self-use
+    def node_types(self):
+        """
+        Get mapping of node types to the resources.
+        """
+        return [dict(node_type) for node_type in NODE_TYPES]
@@ -7,7 +7,9 @@ subnetworks and groups of instances.
 from butter.log import logger
 from butter.providers import get_provider
 from butter.types.common import Network, Service
+from butter.util.call_stats import recorded_operation
 from butter.util.exceptions import DisallowedOperationException
+from butter.util.regions import RegionalClients, merge, service_key
 
 
 class ServiceClient:
@@ -27,34 +29,69 @@ class ServiceClient:
         client.service.destroy(myservice)
 
     The above commands will create and destroy a service named "public" in the network "network".
+
+    To span several regions, pass "drivers", a map from each region to its driver, instead of
+    "driver".  See butter.util.regions.  Services in global networks, like on GCE, are created in
+    the first region unless another "region" is given, and found in whichever region they're in.
+
+    With a butter.util.state_store.StateStore as "state_store", services created and destroyed are
+    recorded in it, and "get" and "list" read from it when given a "max_staleness" it meets.
     """
-    def __init__(self, provider, credentials):
-        self.service = get_provider(provider).service.ServiceClient(credentials)
+    # pylint: disable=too-many-arguments
+    def __init__(self, provider, credentials, driver=None, recorder=None, drivers=None,
+                 state_store=None):
+        self.recorder = recorder
+        self.state_store = state_store
+        self.regions = RegionalClients(get_provider(provider).service.ServiceClient, credentials,
+                                       drivers or {None: driver})
+        self.service = self.regions.default
 
     # pylint: disable=too-many-arguments
-    def create(self, network, service_name, blueprint, template_vars=None, count=None):
+    @recorded_operation("service.create")
+    def create(self, network, service_name, blueprint, template_vars=None, count=None,
+               wait=True, region=None):
         """
         Create a service in "network" named "service_name" with blueprint file at "blueprint".
 
         "template_vars" are passed to the initialization scripts as jinja2
         variables.
+
+        Unless "wait" is false, waits for all the instances to be running before returning.
+
+        "region" picks the region to create the service in, if "network" is global and the client
+        spans more than one region.  Otherwise the service goes in its network's region.
         """
         logger.info('Creating service %s in network %s with blueprint %s, template_vars %s, '
                     'and count %s', service_name, network, blueprint, template_vars, count)
         if not isinstance(network, Network):
             raise DisallowedOperationException(
                 "Network argument to create must be of type butter.types.common.Network")
-        return self.service.create(network, service_name, blueprint, template_vars, count)
+        client = self.regions.for_network(network)
+        if region is not None and self.regions.spans_regions(network):
+            client = self.regions.region(region)
+        service = client.create(network, service_name, blueprint, template_vars, count, wait)
+        if self.state_store:
+            self.state_store.add_service(service)
+        return service
 
-    def get(self, network, service_name):
+    @recorded_operation("service.get")
+    def get(self, network, service_name, max_staleness=None):
         """
-        Get a service in "network" named "service_name".
+        Get a service in "network" named "service_name".  See the class documentation for
+        "max_staleness".
         """
         logger.info('Discovering service %s in network %s', service_name, network)
         if not isinstance(network, Network):
             raise DisallowedOperationException(
                 "Network argument to get must be of type butter.types.common.Network")
-        return self.service.get(network, service_name)
+        if self.state_store and self.state_store.fresh(max_staleness):
+            return self.state_store.service(network, service_name)
+        if not self.regions.spans_regions(network):
+            return self.regions.for_network(network).get(network, service_name)
+        services = self.regions.fan_out(lambda service: service.get(network, service_name),
+                                        self.recorder)
+        return next((service for service in services
+                     if service is not None and service.subnetworks), None)
 
     # pylint: disable=no-self-use
     def get_instances(self, service):
@@ -66,6 +103,7 @@ class ServiceClient:
                 "Service argument to get_instances must be of type butter.types.common.Service")
         return [i for s in service.subnetworks for i in s.instances]
 
+    @recorded_operation("service.destroy")
     def destroy(self, service):
         """
         Destroy a service described by the "service" object.
@@ -74,18 +112,26 @@ class ServiceClient:
         if not isinstance(service, Service):
             raise DisallowedOperationException(
                 "Service argument to destroy must be of type butter.types.common.Service")
-        return self.service.destroy(service)
+        result = self.regions.for_service(service).destroy(service)
+        if self.state_store:
+            self.state_store.remove_service(service)
+        return result
 
-    def list(self):
+    @recorded_operation("service.list")
+    def list(self, max_staleness=None):
         """
-        List all services.
+        List all services, in every region.  See the class documentation for "max_staleness".
         """
         logger.info('Listing services')
-        return self.service.list()
+        if self.state_store and self.state_store.fresh(max_staleness):
+            return self.state_store.services()
+        return merge(self.regions.fan_out(lambda service: service.list(), self.recorder),
+                     service_key)
 
+    @recorded_operation("service.node_types")
     def node_types(self):
         """
-        Get mapping of node types to the resources.
+        Get mapping of node types to the resources, in the client's first region.
         """
         logger.info('Listing node types')
         return self.service.node_types()
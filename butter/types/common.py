@@ -69,3 +69,13 @@ class Path:
     destination = attr.ib()
     protocol = attr.ib(type=str)
     port = attr.ib(type=int)
+
+@attr.s(frozen=True)
+class Snapshot:
+    """
+    Simple container to hold everything in a provider account as of one point in time.  The
+    services in "paths" are the same objects as the ones in "services".
+    """
+    networks = attr.ib(type=list)
+    services = attr.ib(type=list)
+    paths = attr.ib(type=list)
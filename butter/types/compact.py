@@ -0,0 +1,171 @@
+# pylint: disable=too-few-public-methods
+"""
+Compact types.
+
+Variants of the types in butter.types.common for holding very large inventories.  They take their
+fields from those types, so code that only reads them (like butter.util.graph_export and
+butter.util.reachability) works with either, but they:
+
+    - Use slots, so they have no per object "__dict__".
+    - Are frozen, and use tuples rather than lists, so they can't change under an index.
+    - Are hashable, so they can be used as dict keys and in sets.
+
+Compact objects are built for a whole snapshot at once, with one object for each network and each
+service in it, which every service, path, and so on that refers to it shares.  Networks and services
+are compared by identity, which is both cheap and correct within a snapshot, but it means objects
+from two different snapshots are never equal.  Strings that repeat across many objects, like regions
+and instance states, are interned too.
+
+Usage:
+
+    snapshot = compact_snapshot(client.snapshot())
+    by_service = {service: [] for service in snapshot.services}
+    for path in snapshot.paths:
+        by_service[path.destination].append(path)
+
+"""
+import sys
+
+import attr
+
+from butter.types.common import Instance, Network, Path, Service, Snapshot, Subnetwork
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _fields(cls, **types):
+    """
+    Returns the attributes of the butter.types.common class "cls", with the types in "types" instead
+    of theirs, so the compact version has the same fields in the same order.
+    """
+    return {field.name: attr.ib(type=types.get(field.name, field.type), default=field.default)
+            for field in attr.fields(cls)}
+
+
+def service_key(network, service):
+    """
+    Returns what tells "service" apart from the other services in "network", which can be anything
+    that stands for its network.  Services with no name, which stand in for CIDR blocks in paths,
+    are the same service if they have the same blocks.
+    """
+    if service.name:
+        return (network, service.name)
+    return (network, None, tuple(subnetwork.cidr_block for subnetwork in service.subnetworks))
+
+
+@attr.s(slots=True, frozen=True, eq=False, these=_fields(Network))
+class CompactNetwork:
+    """
+    Compact version of butter.types.common.Network, equal only to itself.
+    """
+
+
+@attr.s(slots=True, frozen=True, eq=False, these=_fields(Service, network=CompactNetwork,
+                                                         subnetworks=tuple))
+class CompactService:
+    """
+    Compact version of butter.types.common.Service, equal only to itself.
+    """
+
+
+@attr.s(slots=True, frozen=True, these=_fields(Subnetwork, instances=tuple))
+class CompactSubnetwork:
+    """
+    Compact version of butter.types.common.Subnetwork.
+    """
+
+
+@attr.s(slots=True, frozen=True, these=_fields(Instance))
+class CompactInstance:
+    """
+    Compact version of butter.types.common.Instance.
+    """
+
+
+@attr.s(slots=True, frozen=True, these=_fields(Path, network=CompactNetwork))
+class CompactPath:
+    """
+    Compact version of butter.types.common.Path.
+    """
+
+
+@attr.s(slots=True, frozen=True, these=_fields(Snapshot, networks=tuple, services=tuple,
+                                               paths=tuple))
+class CompactSnapshot:
+    """
+    Compact version of butter.types.common.Snapshot.
+    """
+
+
+class SnapshotInterner:
+    """
+    Builds the compact objects for one snapshot, handing out the same object every time it's asked
+    for the same network or service.
+    """
+
+    def __init__(self):
+        self._networks = {}
+        self._services = {}
+
+    def network(self, network):
+        """
+        Returns the CompactNetwork for "network", which may be None.
+        """
+        if network is None:
+            return None
+        key = (network.name, network.network_id, network.cidr_block, network.region)
+        if key not in self._networks:
+            self._networks[key] = CompactNetwork(*[_intern(value) for value in key])
+        return self._networks[key]
+
+    def service(self, service):
+        """
+        Returns the CompactService for "service".  Services with no name, which stand in for CIDR
+        blocks in paths, are the same service if they have the same blocks.
+        """
+        network = self.network(service.network)
+        key = service_key(network, service)
+        if key not in self._services:
+            self._services[key] = CompactService(
+                network, _intern(service.name),
+                tuple(self.subnetwork(subnetwork) for subnetwork in service.subnetworks))
+        return self._services[key]
+
+    @staticmethod
+    def subnetwork(subnetwork):
+        """
+        Returns the CompactSubnetwork for "subnetwork".
+        """
+        return CompactSubnetwork(
+            subnetwork.subnetwork_id, _intern(subnetwork.name), subnetwork.cidr_block,
+            _intern(subnetwork.region), _intern(subnetwork.availability_zone),
+            tuple(CompactInstance(instance.instance_id, instance.public_ip, instance.private_ip,
+                                  _intern(instance.state))
+                  for instance in subnetwork.instances))
+
+    def path(self, path):
+        """
+        Returns the CompactPath for "path".
+        """
+        return CompactPath(self.network(path.network), self.service(path.source),
+                           self.service(path.destination), _intern(path.protocol), path.port)
+
+    def snapshot(self, snapshot):
+        """
+        Returns the CompactSnapshot for "snapshot".
+        """
+        return CompactSnapshot(networks=tuple(self.network(network)
+                                              for network in snapshot.networks),
+                               services=tuple(self.service(service)
+                                              for service in snapshot.services),
+                               paths=tuple(self.path(path) for path in snapshot.paths))
+
+
+def compact_snapshot(snapshot):
+    """
+    Returns the CompactSnapshot for the butter.types.common.Snapshot "snapshot", with one object for
+    each network and service in it.
+    """
+    return SnapshotInterner().snapshot(snapshot)
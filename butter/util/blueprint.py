@@ -4,6 +4,7 @@ Utilities to deal with blueprint files.  All here so that I can keep them as a
 standard format.
 """
 
+import ipaddress
 import os
 import yaml
 import jinja2
@@ -152,3 +153,80 @@ class ServiceBlueprint(Blueprint):
         Returns the disks to allocate for the instance.  This is required.
         """
         return self.blueprint["instance"]["disks"]
+
+class EnvironmentBlueprint(Blueprint):
+    """
+    Blueprint for a whole environment: one network, its services, and the paths between them.  See
+    butter.util.environment for the format.  Can be given a file name or an already loaded dict.
+    """
+    def __init__(self, blueprint):
+        if isinstance(blueprint, dict):
+            super(EnvironmentBlueprint, self).__init__(blueprint_yaml="{}")
+            self.blueprint = blueprint
+        else:
+            super(EnvironmentBlueprint, self).__init__(blueprint)
+        if "network" not in self.blueprint or "name" not in self.blueprint["network"]:
+            raise BlueprintException(
+                "Environment blueprint must have a \"network\" with a \"name\"")
+
+    def _resolve(self, path):
+        """
+        Blueprint paths are relative to the environment blueprint file, if there is one.
+        """
+        if path and self.blueprint_path and not os.path.isabs(path):
+            return os.path.join(self.blueprint_path, path)
+        return path
+
+    def network_name(self):
+        """
+        Name of the network the environment lives in.
+        """
+        return self.blueprint["network"]["name"]
+
+    def network_blueprint(self):
+        """
+        Path to the blueprint to create the network with, or None for the defaults.
+        """
+        return self._resolve(self.blueprint["network"].get("blueprint"))
+
+    def services(self):
+        """
+        Returns a map from each service name to a dict with its "blueprint" path, "count", and
+        "template_vars".
+        """
+        services = {}
+        for name, service in (self.blueprint.get("services") or {}).items():
+            if not service or "blueprint" not in service:
+                raise BlueprintException("Service \"%s\" must have a \"blueprint\"" % name)
+            services[name] = {
+                "blueprint": self._resolve(service["blueprint"]),
+                "count": service.get("count"),
+                "template_vars": service.get("template_vars") or {},
+                }
+        return services
+
+    def paths(self):
+        """
+        Returns the list of (source, destination, port) paths.  Sources are service names or CIDR
+        blocks, with "internet" meaning "0.0.0.0/0", and destinations are service names.
+        """
+        services = self.services()
+        paths = []
+        for path in self.blueprint.get("paths") or []:
+            if not all(key in path for key in ["source", "destination", "port"]):
+                raise BlueprintException(
+                    "Path %s must have a \"source\", \"destination\", and \"port\"" % path)
+            source = "0.0.0.0/0" if path["source"] == "internet" else path["source"]
+            if source not in services:
+                try:
+                    ipaddress.IPv4Network(source)
+                except ValueError:
+                    raise BlueprintException(
+                        "Path source \"%s\" is not a service in this environment or a CIDR "
+                        "block" % source)
+            if path["destination"] not in services:
+                raise BlueprintException(
+                    "Path destination \"%s\" is not a service in this environment" %
+                    path["destination"])
+            paths.append((source, path["destination"], int(path["port"])))
+        return paths
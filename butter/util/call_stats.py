@@ -0,0 +1,245 @@
+"""
+Provider Call Accounting
+
+Records every call butter makes to a provider (a boto3 API call, a libcloud driver method, ...) with
+its latency, retries, and error code, and attributes it to the high level client operation that
+caused it, so that it's possible to see how many provider calls something like "client.graph()"
+really makes and where the time goes.
+
+Usage:
+
+    recorder = CallRecorder()
+    with recorder.operation("network.get"):
+        recorder.record_call("ec2.DescribeVpcs", 0.12)
+    recorder.snapshot()
+
+Providers record calls at their driver boundary, either by wrapping their driver with
+"recorder.instrument(driver)", or by calling "record_call" directly from hooks in their SDK.
+Operations can be nested, and calls are always attributed to the outermost one.
+
+If the recorder's "tracer" is set (see butter.util.tracing), operations and calls are also recorded
+as spans on it.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from butter.util.tracing import current_tracer, NO_SPAN
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, float("inf")]
+
+# Operation name used for calls made outside of any client operation.
+UNATTRIBUTED = "unattributed"
+
+
+class CallStats:
+    """
+    Count, latency histogram, retries, and errors for one kind of call.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.retries = 0
+        self.errors = {}
+        self.total_time = 0.0
+        self.min_time = None
+        self.max_time = None
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, latency, error_code=None, retries=0):
+        """
+        Add a single call to these stats.
+        """
+        self.count += 1
+        self.retries += retries
+        if error_code is not None:
+            self.errors[error_code] = self.errors.get(error_code, 0) + 1
+        self.total_time += latency
+        self.min_time = latency if self.min_time is None else min(self.min_time, latency)
+        self.max_time = latency if self.max_time is None else max(self.max_time, latency)
+        for bucket, upper_bound in enumerate(LATENCY_BUCKETS):
+            if latency <= upper_bound:
+                self.histogram[bucket] += 1
+                break
+
+    def to_dict(self):
+        """
+        Return these stats as plain data.
+        """
+        return {
+            "count": self.count,
+            "retries": self.retries,
+            "errors": dict(self.errors),
+            "total_time": self.total_time,
+            "mean_time": self.total_time / self.count if self.count else None,
+            "min_time": self.min_time,
+            "max_time": self.max_time,
+            "histogram": {"le_%s" % upper_bound: count
+                          for upper_bound, count in zip(LATENCY_BUCKETS, self.histogram)},
+            }
+
+
+class CallRecorder:
+    """
+    Collects provider call stats for a single butter client.  Safe to use from multiple threads,
+    and each thread tracks its own current operation.
+    """
+
+    def __init__(self):
+        self.tracer = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._calls = {}
+        self._operations = {}
+        self._operation_calls = {}
+
+    def current_operation(self):
+        """
+        Returns the name of the outermost operation in progress on this thread, or None.
+        """
+        stack = getattr(self._local, "stack", None)
+        return stack[0] if stack else None
+
+    @contextmanager
+    def operation(self, name):
+        """
+        Mark the start and end of the client operation "name".  Provider calls made inside are
+        attributed to it, unless this is nested inside another operation.
+        """
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        self._local.stack.append(name)
+        start = time.perf_counter()
+        error_code = None
+        tracer = self.tracer
+        try:
+            with tracer.span(name, "operation") if tracer else NO_SPAN:
+                yield self
+        except Exception as exception:
+            error_code = type(exception).__name__
+            raise
+        finally:
+            self._local.stack.pop()
+            if not self._local.stack:
+                with self._lock:
+                    self._operations.setdefault(name, CallStats()).add(
+                        time.perf_counter() - start, error_code)
+
+    @contextmanager
+    def attributed_to(self, name):
+        """
+        Attribute provider calls made inside the "with" block to the operation "name", which is in
+        progress on another thread, without counting it as another operation.  Does nothing if
+        "name" is None.
+        """
+        if name is None:
+            yield self
+            return
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        self._local.stack.append(name)
+        try:
+            yield self
+        finally:
+            self._local.stack.pop()
+
+    def record_call(self, call, latency, error_code=None, retries=0):
+        """
+        Record one provider call named "call" that took "latency" seconds.
+        """
+        operation = self.current_operation() or UNATTRIBUTED
+        tracer = current_tracer() or self.tracer
+        if tracer:
+            tracer.add_span(call, "call", latency, error=error_code, retries=retries)
+        with self._lock:
+            self._calls.setdefault(call, CallStats()).add(latency, error_code, retries)
+            operation_calls = self._operation_calls.setdefault(operation, {})
+            operation_calls.setdefault(call, CallStats()).add(latency, error_code, retries)
+
+    def instrument(self, target, prefix=""):
+        """
+        Wrap "target" so that every method call on it is recorded as "<prefix><method>".
+        """
+        return InstrumentedDriver(target, self, prefix)
+
+    def snapshot(self, reset=False):
+        """
+        Returns all the stats collected so far as plain data, optionally resetting them.
+        """
+        with self._lock:
+            operations = {}
+            for operation in set(self._operations) | set(self._operation_calls):
+                # Unattributed calls have no operation of their own to time.
+                operations[operation] = self._operations.get(operation, CallStats()).to_dict()
+                operations[operation]["calls"] = {
+                    call: stats.to_dict()
+                    for call, stats in self._operation_calls.get(operation, {}).items()}
+            result = {
+                "calls": {call: stats.to_dict() for call, stats in self._calls.items()},
+                "operations": operations,
+                }
+            if reset:
+                self._reset()
+            return result
+
+    def _reset(self):
+        self._calls = {}
+        self._operations = {}
+        self._operation_calls = {}
+
+    def reset(self):
+        """
+        Throw away all the stats collected so far.
+        """
+        with self._lock:
+            self._reset()
+
+
+# pylint: disable=too-few-public-methods
+class InstrumentedDriver:
+    """
+    Proxy that records every method call on the wrapped object with a CallRecorder.  Everything
+    else is passed through unchanged.
+    """
+
+    def __init__(self, target, recorder, prefix=""):
+        self._target = target
+        self._recorder = recorder
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+        call = "%s%s" % (self._prefix, name)
+
+        @functools.wraps(attribute)
+        def recorded(*args, **kwargs):
+            start = time.perf_counter()
+            error_code = None
+            try:
+                return attribute(*args, **kwargs)
+            except Exception as exception:
+                error_code = str(getattr(exception, "code", None) or type(exception).__name__)
+                raise
+            finally:
+                self._recorder.record_call(call, time.perf_counter() - start, error_code)
+        return recorded
+
+
+def recorded_operation(name):
+    """
+    Decorator for methods of objects with a "recorder" attribute, that records the method as the
+    client operation "name".  Does nothing if the recorder is None.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            if self.recorder is None:
+                return function(self, *args, **kwargs)
+            with self.recorder.operation(name):
+                return function(self, *args, **kwargs)
+        return wrapper
+    return decorator
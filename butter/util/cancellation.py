@@ -0,0 +1,96 @@
+"""
+Cancellation
+
+Lets long running operations, like waiting for instances to come up, be cancelled from another
+thread.  The provider retry and wait loops sleep with "sleep" from this module instead of
+"time.sleep", which raises OperationCancelled as soon as the operation they are part of gets
+cancelled, rather than after the sleep (and the rest of the operation) finishes.
+
+Usage:
+
+    token = CancelToken()
+    # In the thread doing the work:
+    with cancel_scope(token):
+        client.service.create(network, "web", blueprint)
+    # From anywhere else:
+    token.cancel()
+
+Outside of a cancel scope, "sleep" is just "time.sleep".
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from butter.util.exceptions import OperationCancelled
+
+_LOCAL = threading.local()
+
+
+class CancelToken:
+    """
+    Flag that can be set once to cancel the operations running in its scope.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """
+        Cancel the operations running in this token's scope.
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        """
+        Whether this token has been cancelled.
+        """
+        return self._event.is_set()
+
+    def wait(self, seconds):
+        """
+        Wait "seconds" seconds, or until this token is cancelled.  Returns whether it was cancelled.
+        """
+        return self._event.wait(seconds)
+
+
+@contextmanager
+def cancel_scope(token):
+    """
+    Make "token" the cancel token for everything run on this thread inside the "with" block.
+    """
+    previous = getattr(_LOCAL, "token", None)
+    _LOCAL.token = token
+    try:
+        yield token
+    finally:
+        _LOCAL.token = previous
+
+
+def current_token():
+    """
+    Returns the cancel token for the operation running on this thread, or None.
+    """
+    return getattr(_LOCAL, "token", None)
+
+
+def check():
+    """
+    Raise OperationCancelled if the operation running on this thread has been cancelled.
+    """
+    token = getattr(_LOCAL, "token", None)
+    if token is not None and token.cancelled:
+        raise OperationCancelled("Operation cancelled")
+
+
+def sleep(seconds):
+    """
+    Sleep for "seconds", raising OperationCancelled if the operation running on this thread gets
+    cancelled first.
+    """
+    token = getattr(_LOCAL, "token", None)
+    if token is None:
+        time.sleep(seconds)
+        return
+    if token.wait(seconds):
+        raise OperationCancelled("Operation cancelled")
@@ -0,0 +1,192 @@
+"""
+Declarative Environments
+
+Brings a whole environment (one network, its services, and the paths between them) in line with a
+spec, changing only what doesn't already match, so applying the same spec twice does nothing the
+second time.
+
+The spec is a dict, or the path to a YAML file, like this:
+
+    network:
+      name: dev
+      blueprint: network.yml
+    services:
+      web:
+        blueprint: web.yml
+        count: 3
+        template_vars:
+          Port: 443
+      db:
+        blueprint: db.yml
+    paths:
+      - {source: internet, destination: web, port: 443}
+      - {source: web, destination: db, port: 5432}
+
+Path sources are service names or CIDR blocks, where "internet" is short for "0.0.0.0/0", and
+destinations are service names.  Blueprint paths are relative to the spec file.
+
+Changes are made in dependency order, and the independent changes within each step run in
+parallel:
+
+    1. Create the network, if it doesn't exist.
+    2. Destroy services that aren't in the spec or need to be replaced.
+    3. Create services that don't exist (anymore).
+    4. Add and revoke paths, as planned by butter.util.netgraph, one target service at a time.
+
+A service gets replaced if it doesn't have the number of instances given by its "count", or if it
+is listed in "replace".  A changed blueprint can't be detected from what's running, so to redeploy
+a service after changing its blueprint, list it in "replace".
+"""
+import ipaddress
+
+from butter.log import logger
+from butter.types.networking import CidrBlock
+from butter.util.blueprint import EnvironmentBlueprint
+from butter.util.graph_export import EXTERNAL_NETWORK, node_id
+from butter.util.netgraph import paths_to_net, plan_firewall_changes
+from butter.util.parallel import run_parallel
+
+# Default for how many changes can be made at once.
+DEFAULT_MAX_WORKERS = 8
+
+
+def _desired_net(blueprint):
+    net = {}
+    network_name = blueprint.network_name()
+    services = blueprint.services()
+    for source, destination, port in blueprint.paths():
+        if source in services:
+            source_node = "%s (%s)" % (source, network_name)
+        else:
+            source_node = "%s (%s)" % (ipaddress.IPv4Network(source), EXTERNAL_NETWORK)
+        configs = net.setdefault(source_node, {}).setdefault(
+            "%s (%s)" % (destination, network_name), [])
+        configs.append({"protocol": "tcp", "port": port})
+    return net
+
+
+def _service_changes(live_services, desired_services, replace):
+    """
+    Returns the names of the services to destroy, and of the ones to create.
+    """
+    destroy = set(live_services) - set(desired_services)
+    for name, service in live_services.items():
+        count = desired_services.get(name, {}).get("count")
+        instance_count = sum(len(subnetwork.instances) for subnetwork in service.subnetworks)
+        if name in replace or (count is not None and count != instance_count):
+            destroy.add(name)
+    create = (set(desired_services) - set(live_services)) | (destroy & set(desired_services))
+    return destroy, create
+
+
+def _current_paths(snapshot, network_name, destroyed_nodes):
+    """
+    Returns the paths into "network_name" that the spec decides about, leaving out the ones that go
+    away with the destroyed services.  Sources that are services in other networks can't be named in
+    a spec, so paths from them are left alone rather than revoked.
+    """
+    def in_spec(source):
+        if not source.name:
+            return True
+        return (source.network.name == network_name and
+                node_id(source) not in destroyed_nodes)
+    return [path for path in snapshot.paths
+            if path.destination.network.name == network_name and
+            node_id(path.destination) not in destroyed_nodes and in_spec(path.source)]
+
+
+def _plan(client, blueprint, replace):
+    """
+    Returns the plan, the live network (or None), and a map from name to live service in it.
+    """
+    network_name = blueprint.network_name()
+    snapshot = client.snapshot()
+    network = next((network for network in snapshot.networks if network.name == network_name),
+                   None)
+    live_services = {service.name: service for service in snapshot.services
+                     if service.network.name == network_name}
+    destroy, create = _service_changes(live_services, blueprint.services(), replace)
+
+    # Destroying a service takes all its paths with it.
+    destroyed_nodes = {node_id(live_services[name]) for name in destroy}
+    current_paths = _current_paths(snapshot, network_name, destroyed_nodes)
+    plan = {
+        "network": {"name": network_name, "create": network is None},
+        "destroy": sorted(destroy),
+        "create": sorted(create),
+        "paths": plan_firewall_changes(_desired_net(blueprint), paths_to_net(current_paths)),
+        }
+    return plan, network, live_services
+
+
+def plan_environment(client, spec, replace=()):
+    """
+    Compare "spec" to what's running, and return the plan for making them match, as a dict with:
+
+        network: The name of the network, and whether it needs to be created.
+        destroy: The names of the services to destroy.
+        create: The names of the services to create.
+        paths: The path changes for each target, as returned by
+               butter.util.netgraph.plan_firewall_changes.
+
+    This only reads the current state, so it's safe to call to see what "apply" would do.
+    """
+    return _plan(client, EnvironmentBlueprint(spec), replace)[0]
+
+
+def apply_environment(client, spec, replace=(), dry_run=False, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Make what's running match "spec", and return the plan that was carried out.  See
+    "plan_environment" for the format.  With "dry_run", only return the plan.
+    """
+    blueprint = EnvironmentBlueprint(spec)
+    plan, network, live_services = _plan(client, blueprint, replace)
+    if dry_run:
+        return plan
+    logger.info("Applying environment plan: %s", plan)
+
+    # 1. Network
+    if network is None:
+        network = client.network.create(blueprint.network_name(), blueprint.network_blueprint())
+
+    # 2. Services that are going away.
+    destroyed = [live_services.pop(name) for name in plan["destroy"]]
+    run_parallel([lambda service=service: client.service.destroy(service)
+                  for service in destroyed], max_workers, client.recorder)
+
+    # 3. Services that are new, or being replaced.
+    desired_services = blueprint.services()
+
+    def create(name):
+        service = desired_services[name]
+        return client.service.create(network, name, service["blueprint"],
+                                     service["template_vars"], service["count"])
+    created = run_parallel([lambda name=name: create(name) for name in plan["create"]],
+                           max_workers, client.recorder)
+    live_services.update(zip(plan["create"], created))
+
+    # 4. Paths, with all the changes to each target made together.
+    _apply_paths(client, plan["paths"], live_services, max_workers)
+    return plan
+
+
+def _apply_paths(client, path_changes, live_services, max_workers):
+    """
+    Make the "path_changes" of a plan, between the services in "live_services".
+    """
+    nodes = {node_id(service): service for service in live_services.values()}
+
+    def node(name):
+        if name in nodes:
+            return nodes[name]
+        return CidrBlock(name[:-len(" (%s)" % EXTERNAL_NETWORK)])
+
+    def update_target(target, changes):
+        if changes["revoke"]:
+            client.paths.remove_many([(node(rule["source"]), nodes[target], rule["port"])
+                                      for rule in changes["revoke"]])
+        if changes["add"]:
+            client.paths.add_many([(node(rule["source"]), nodes[target], rule["port"])
+                                   for rule in changes["add"]])
+    run_parallel([lambda target=target, changes=changes: update_target(target, changes)
+                  for target, changes in path_changes.items()], max_workers, client.recorder)
@@ -37,3 +37,10 @@ class BlueprintException(Exception):
     Encountered error interpreting Blueprint file.
     """
     pass
+
+
+class OperationCancelled(Exception):
+    """
+    The operation was cancelled before it finished.
+    """
+    pass
@@ -0,0 +1,200 @@
+"""
+Graph Export
+
+Writes the services and paths in a snapshot (see butter.types.common.Snapshot) as a graph, in one of
+these formats:
+
+    dot: Graphviz dot, with one cluster per network.
+    json: JSON in the node link "adjacency" format that networkx's "adjacency_graph" reads.
+    graphml: GraphML, for tools like Gephi, yEd, or Cytoscape.
+
+Usage:
+
+    with open("graph.graphml", "w") as output:
+        export_graph(client.snapshot(), output, "graphml")
+
+The graph is written to the file object piece by piece as it's generated, so even for very large
+accounts it never has to exist as one big string.
+
+Services are nodes named "<service> (<network>)".  CIDR block sources, such as the internet, are
+nodes too, named "<cidr blocks> (external)".  Each path is an edge labeled with its protocol and
+port.  In snapshots with networks in more than one region, networks can have the same name, so there
+they go by "<network>, <region>" instead, and services by "<service> (<network>, <region>)".
+"""
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+from butter.util.exceptions import DisallowedOperationException
+
+EXTERNAL_NETWORK = "external"
+
+
+def spans_regions(networks):
+    """
+    Returns true if "networks" are in more than one region, in which case their names aren't
+    enough to tell them apart in a graph.
+    """
+    return len({network.region for network in networks}) > 1
+
+
+def network_label(network, qualified=False):
+    """
+    Returns the name "network" goes by in the graph, along with its region if "qualified".
+    """
+    if qualified and network.region is not None:
+        return "%s, %s" % (network.name, network.region)
+    return network.name
+
+
+def node_id(service, qualified=False):
+    """
+    Returns the graph node name for "service", which may be the nameless service that stands in for
+    CIDR blocks in paths.  With "qualified", its network is named along with its region.
+    """
+    if not service.name:
+        cidr_blocks = [subnetwork.cidr_block for subnetwork in service.subnetworks]
+        return "%s (%s)" % (",".join(cidr_blocks), EXTERNAL_NETWORK)
+    return "%s (%s)" % (service.name, network_label(service.network, qualified))
+
+
+def _network_key(network):
+    return (network.name, network.region)
+
+
+def _group_by_network(items):
+    by_network = {}
+    for item in items:
+        by_network.setdefault(_network_key(item.network), []).append(item)
+    return by_network
+
+
+def _nodes_and_edges(snapshot):
+    """
+    Returns an ordered map from node name to its attributes, and a map from each node name to its
+    outgoing edges as (target, protocol, port) tuples.
+    """
+    qualified = spans_regions(snapshot.networks)
+    nodes = {}
+    for service in snapshot.services:
+        nodes[node_id(service, qualified)] = {"name": service.name,
+                                              "network": service.network.name,
+                                              "kind": "service"}
+    edges = {}
+    for path in snapshot.paths:
+        source, target = node_id(path.source, qualified), node_id(path.destination, qualified)
+        if source not in nodes:
+            if path.source.name:
+                nodes[source] = {"name": path.source.name, "network": path.source.network.name,
+                                 "kind": "service"}
+            else:
+                nodes[source] = {"name": source[:-len(" (%s)" % EXTERNAL_NETWORK)],
+                                 "network": EXTERNAL_NETWORK, "kind": "cidr"}
+        edges.setdefault(source, []).append((target, path.protocol, path.port))
+    return nodes, edges
+
+
+def write_dot(snapshot, output):
+    """
+    Write the graph in graphviz dot format to the file object "output".
+    """
+    qualified = spans_regions(snapshot.networks)
+    net_to_service = _group_by_network(snapshot.services)
+    net_to_path = _group_by_network(snapshot.paths)
+    output.write("digraph services {\n\n")
+    cluster_id = 0
+    for network in snapshot.networks:
+
+        # Skip networks with no name for now
+        if not network.name:
+            continue
+
+        # Each network is a "cluster" in graphviz terms
+        label = network_label(network, qualified)
+        key = _network_key(network)
+        output.write("subgraph cluster_%s {\n" % cluster_id)
+        output.write("    label = \"%s\";\n" % label)
+        cluster_id += 1
+
+        # If the network is empty just make a placeholder node
+        if key not in net_to_service and key not in net_to_path:
+            output.write("    \"Empty Network (%s)\";\n" % label)
+            output.write("\n}\n")
+            continue
+
+        for service in net_to_service.get(key, []):
+            output.write("    \"%s\";\n" % node_id(service, qualified))
+        output.write("\n}\n")
+
+        # We do all paths outside the cluster so that public CIDRs will show up outside the
+        # networks.
+        for path in net_to_path.get(key, []):
+            output.write("\"%s\" -> \"%s\" [ label=\"(%s:%s)\" ];\n" % (
+                node_id(path.source, qualified), node_id(path.destination, qualified),
+                path.protocol, path.port))
+    output.write("\n}\n")
+
+
+def write_json(snapshot, output):
+    """
+    Write the graph as JSON in the networkx adjacency format to the file object "output".
+    """
+    nodes, edges = _nodes_and_edges(snapshot)
+    qualified = spans_regions(snapshot.networks)
+    graph = {"name": "services",
+             "networks": [network_label(network, qualified) for network in snapshot.networks
+                          if network.name]}
+    output.write('{"directed": true, "multigraph": true, "graph": %s,\n' % json.dumps(graph))
+    output.write('"nodes": [')
+    for index, (name, attributes) in enumerate(nodes.items()):
+        output.write(",\n" if index else "\n")
+        output.write(json.dumps(dict(attributes, id=name)))
+    output.write('\n],\n"adjacency": [')
+    for index, name in enumerate(nodes):
+        output.write(",\n" if index else "\n")
+        output.write(json.dumps([{"id": target, "key": "%s:%s" % (protocol, port),
+                                  "protocol": protocol, "port": port}
+                                 for target, protocol, port in edges.get(name, [])]))
+    output.write("\n]}\n")
+
+
+def write_graphml(snapshot, output):
+    """
+    Write the graph in GraphML format to the file object "output".
+    """
+    nodes, edges = _nodes_and_edges(snapshot)
+    output.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    output.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    for key, domain in [("name", "node"), ("network", "node"), ("kind", "node"),
+                        ("protocol", "edge"), ("port", "edge")]:
+        output.write('  <key id="%s" for="%s" attr.name="%s" attr.type="string"/>\n' % (
+            key, domain, key))
+    output.write('  <graph id="services" edgedefault="directed">\n')
+    for name, attributes in nodes.items():
+        output.write('    <node id=%s>' % quoteattr(name))
+        for key in ["name", "network", "kind"]:
+            output.write('<data key="%s">%s</data>' % (key, escape(str(attributes[key]))))
+        output.write('</node>\n')
+    for source, source_edges in edges.items():
+        for target, protocol, port in source_edges:
+            output.write('    <edge source=%s target=%s><data key="protocol">%s</data>'
+                         '<data key="port">%s</data></edge>\n' % (
+                             quoteattr(source), quoteattr(target), escape(str(protocol)),
+                             escape(str(port))))
+    output.write('  </graph>\n</graphml>\n')
+
+
+FORMATS = {
+    "dot": write_dot,
+    "json": write_json,
+    "graphml": write_graphml,
+    }
+
+
+def export_graph(snapshot, output, fmt="dot"):
+    """
+    Write the graph of "snapshot" to the file object "output" in the format "fmt".
+    """
+    if fmt not in FORMATS:
+        raise DisallowedOperationException(
+            "Unknown graph format %s, must be one of: %s" % (fmt, ", ".join(sorted(FORMATS))))
+    FORMATS[fmt](snapshot, output)
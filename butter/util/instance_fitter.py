@@ -4,8 +4,10 @@ Helper to return a fitting instance given the provided resource requirements.
 from butter.util.blueprint import ServiceBlueprint
 from butter.util.storage_size_parser import parse_storage_size
 from butter.util.log import logger
+from butter.util.tracing import traced
 
 # pylint: disable=unused-argument
+@traced("instance_fitter")
 def get_fitting_instance(instances_client, blueprint):
     """
     Finds the cheapest instance that satisfies the requirements specified in
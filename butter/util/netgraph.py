@@ -1,7 +1,23 @@
 """
 Functions to convert from a network graph to a list of firewall rules, and
-potentially back if possible.
+potentially back if possible, and to plan the smallest set of firewall changes
+that gets from one network graph to another.
+
+A network graph maps each source to each target it can reach, to the list of
+"protocol" and "port" combinations it can reach it on:
+
+    {"web": {"database": [{"protocol": "tcp", "port": 5432}]}}
+
+Usage:
+
+    current = paths_to_net(client.paths.list())
+    plan = plan_firewall_changes(desired, current)
+
+Firewall rules always live on the target, so the plan has one entry per target
+with all the rules to add to it and revoke from it, which can then be applied
+with one call per target.
 """
+from butter.util.graph_export import node_id
 
 
 def net_to_firewalls(net):
@@ -59,3 +75,84 @@ def firewalls_to_net(firewalls):
                     "port": rule["port"]
                     })
     return net
+
+
+def paths_to_net(paths):
+    """
+    Convert the result of "paths.list()" to a network graph.  Services are named
+    like in butter.util.graph_export, "<service> (<network>)", and each CIDR
+    block source is named "<cidr block> (external)".
+    """
+    net = {}
+    for path in paths:
+        if path.source.name:
+            sources = [node_id(path.source)]
+        else:
+            sources = ["%s (external)" % subnetwork.cidr_block
+                       for subnetwork in path.source.subnetworks]
+        for source in sources:
+            configs = net.setdefault(source, {}).setdefault(
+                node_id(path.destination), [])
+            config = {"protocol": path.protocol, "port": path.port}
+            if config not in configs:
+                configs.append(config)
+    return net
+
+
+def port_key(port):
+    """
+    Ports can be strings or integers depending on where they came from, so
+    compare them as integers when possible.
+    """
+    if isinstance(port, str) and port.isdigit():
+        return int(port)
+    return port
+
+
+def _net_rules(net):
+    """
+    Returns a map from each target to the set of (source, protocol, port)
+    ingress rules it needs for the network graph "net".
+    """
+    rules = {}
+    for source, targets in net.items():
+        for target, configs in targets.items():
+            if target == "external":
+                continue
+            target_rules = rules.setdefault(target, set())
+            for config in configs:
+                target_rules.add((source, config["protocol"],
+                                  port_key(config["port"])))
+    return rules
+
+
+def plan_firewall_changes(desired_net, current_net):
+    """
+    Compute the minimal set of firewall changes that turns "current_net" into
+    "desired_net".  Returns a map from each target that needs changes to a dict
+    with the "add" and "revoke" lists of ingress rules for it, in the same rule
+    format as "net_to_firewalls".  Targets that are already right are left out.
+
+    Egress is not planned, since only ingress is controlled.
+    """
+    desired_rules = _net_rules(desired_net)
+    current_rules = _net_rules(current_net)
+
+    def to_rules(rule_set):
+        return [{
+            "source": source,
+            "protocol": protocol,
+            "port": port,
+            "type": "ingress"
+            } for source, protocol, port in sorted(rule_set, key=str)]
+
+    plan = {}
+    for target in sorted(set(desired_rules) | set(current_rules)):
+        desired = desired_rules.get(target, set())
+        current = current_rules.get(target, set())
+        if desired != current:
+            plan[target] = {
+                "add": to_rules(desired - current),
+                "revoke": to_rules(current - desired),
+                }
+    return plan
@@ -0,0 +1,98 @@
+"""
+Operation Scoped Cache
+
+Some provider calls are expensive and get repeated many times over the course of a single high level
+operation, for example listing every subnetwork to find the one that was just created.  This cache
+only holds results while an operation is in progress, so nothing stale can leak between separate
+calls to the butter client.
+
+Usage:
+
+    cache = OperationCache()
+    with cache.operation():
+        cache.get("key", expensive_function)
+        cache.get("key", expensive_function) # Does not call expensive_function again
+
+Operations can be nested, and the cache is only cleared when the outermost one exits.  Outside of an
+operation every "get" calls through to the loader.
+"""
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class OperationCache:
+    """
+    Cache whose contents only live as long as the outermost active operation.  Each thread has its
+    own operations and its own cached values.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _depth(self):
+        return getattr(self._local, "depth", 0)
+
+    @contextmanager
+    def operation(self):
+        """
+        Mark the start and end of an operation.  Values are cached until the outermost operation
+        exits.
+        """
+        depth = self._depth()
+        if not depth:
+            self._local.values = {}
+        self._local.depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.depth = depth
+            if not depth:
+                self._local.values = {}
+
+    def active(self):
+        """
+        Returns true if we are currently inside an operation.
+        """
+        return self._depth() > 0
+
+    def get(self, key, loader):
+        """
+        Return the value cached under "key", calling "loader" to fill it in if necessary.
+        """
+        if not self.active():
+            return loader()
+        if key not in self._local.values:
+            self._local.values[key] = loader()
+        return self._local.values[key]
+
+    def peek(self, key):
+        """
+        Return the value cached under "key" if there is one, without loading it.
+        """
+        if not self.active():
+            return None
+        return self._local.values.get(key)
+
+    def invalidate(self, key=None):
+        """
+        Drop the value cached under "key", or everything if no key is given.
+        """
+        if not self.active():
+            return
+        if key is None:
+            self._local.values = {}
+        else:
+            self._local.values.pop(key, None)
+
+
+def cached_operation(function):
+    """
+    Decorator for methods of objects with a "cache" attribute, that runs the method as a single
+    operation on that cache.
+    """
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        with self.cache.operation():
+            return function(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,45 @@
+"""
+Parallel Calls
+
+Runs independent pieces of an operation, like deleting many route tables, in a thread pool, while
+keeping them part of the operation that started them.
+
+Usage:
+
+    run_parallel([lambda subnet_id=subnet_id: delete(subnet_id) for subnet_id in subnet_ids],
+                 recorder=driver.recorder)
+
+Each function runs in the caller's cancel scope (see butter.util.cancellation), under the span the
+caller is in (see butter.util.tracing), and, if "recorder" is given, with its provider calls
+attributed to the caller's operation (see butter.util.call_stats).
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from butter.util import cancellation, tracing
+
+# Default for how many functions can be running at once.
+DEFAULT_MAX_WORKERS = 8
+
+
+def run_parallel(functions, max_workers=DEFAULT_MAX_WORKERS, recorder=None):
+    """
+    Call every function in "functions" in parallel, and return their results in order.  Waits for
+    all of them to finish before raising the first error, if any, so nothing is left running in the
+    background.
+    """
+    if not functions:
+        return []
+    token = cancellation.current_token()
+    parent = tracing.current_span()
+    operation = recorder.current_operation() if recorder else None
+
+    def run(function):
+        with cancellation.cancel_scope(token), tracing.continue_span(parent):
+            if recorder is None:
+                return function()
+            with recorder.attributed_to(operation):
+                return function()
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(functions))) as executor:
+        futures = [executor.submit(run, function) for function in functions]
+    return [future.result() for future in futures]
@@ -0,0 +1,122 @@
+"""
+Adaptive Rate Limiting
+
+Client side token buckets that keep butter under a cloud provider's API rate limits, so that many
+threads (or many butter processes) making calls at once slow down instead of failing.
+
+Usage:
+
+    limiter = RateLimiter({"ec2.describe": (20, 100)}, default=(10, 40))
+    limiter.bucket("ec2.describe").acquire()
+    ...
+    limiter.bucket("ec2.describe").throttled() # The provider said we were going too fast.
+
+Each "family" of API calls that the provider rate limits together gets its own bucket.  Buckets
+adapt to what the provider tells us: the rate is cut in half every time a call is throttled, and
+slowly increases again with every call that succeeds, so it settles just under the highest rate the
+provider will actually sustain.
+"""
+import random
+import threading
+import time
+
+# How much to multiply the rate by when a call gets throttled.
+BACKOFF_FACTOR = 0.5
+
+
+# pylint: disable=too-many-instance-attributes
+class TokenBucket:
+    """
+    A thread safe token bucket that refills at "rate" tokens per second, up to "capacity" tokens.
+    The rate adapts between "min_rate" and "max_rate" based on throttling.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, rate, capacity, min_rate=None, max_rate=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.min_rate = float(min_rate) if min_rate is not None else self.rate / 16
+        self.max_rate = float(max_rate) if max_rate is not None else self.rate * 4
+        self.increase = self.max_rate / 100
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """
+        Take one token, waiting until one is available.  Returns how many seconds we waited.
+
+        Tokens are handed out in the order they were asked for, even if that means the bucket goes
+        into debt, so waiting callers can sleep without holding the lock.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+        return wait
+
+    def throttled(self):
+        """
+        Slow down, because the provider throttled a call made with a token from this bucket.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+            # Whatever burst we had saved up is what got us throttled.
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self):
+        """
+        Speed up a little, because a call made with a token from this bucket went through.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RateLimiter:
+    """
+    A set of token buckets, one per API family.  "limits" maps a family to the (rate, capacity) its
+    bucket starts with, and families not in "limits" use "default".
+    """
+
+    def __init__(self, limits, default):
+        self.limits = limits
+        self.default = default
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, family):
+        """
+        Returns the token bucket for "family", creating it if necessary.
+        """
+        with self._lock:
+            if family not in self._buckets:
+                rate, capacity = self.limits.get(family, self.default)
+                self._buckets[family] = TokenBucket(rate, capacity)
+            return self._buckets[family]
+
+    def rates(self):
+        """
+        Returns the current rate of each family's bucket.
+        """
+        with self._lock:
+            return {family: bucket.rate for family, bucket in self._buckets.items()}
+
+
+def backoff_delay(attempt, base=0.05, cap=20.0):
+    """
+    Returns how long to wait before retrying a throttled call for the "attempt"th time, using
+    exponential backoff with full jitter, so that clients throttled together don't retry together.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,265 @@
+"""
+Reachability
+
+Answers questions about the paths graph that go beyond a single path, like "what can the internet
+reach within three hops on port 22", without calling the provider for each question.
+
+Usage:
+
+    reachability = client.reachability()
+    reachability.reachable_from_internet(port=22, max_hops=3)
+    reachability.shortest_path(CidrBlock("8.8.8.8/32"), database)
+    reachability.sources_of(database, max_hops=2)
+
+    client.paths.add(web, database, 5432)
+    reachability.add(web, database, 5432) # Keep it up to date without rebuilding it
+
+Nodes are named the same way as in butter.util.graph_export: "<service> (<network>)" for services,
+or "<service> (<network>, <region>)" if the services are in more than one region, and
+"<cidr block> (external)" for each CIDR block that is the source of a path, so the results can be
+matched up with an exported graph.  Anywhere a node is expected, a Service, a CidrBlock, or a node
+name can be passed.
+
+A path from A to B on port P is an edge.  Queries that take a "port" only follow edges on that port,
+or on any of them if it's a list, or every edge if it's None.  "max_hops" limits how many edges long
+the routes considered can be.  Ports that are digit strings, like GCE lists them, are the same as
+the numbers, both in paths and in queries.
+
+Snapshots and paths can be either the butter.types.common or the butter.types.compact kind.
+
+Like the providers' "has_access", a CIDR block is treated as reaching whatever the CIDR block nodes
+it overlaps with can reach, and "the internet" is every CIDR block node that overlaps with public
+address space.
+"""
+import ipaddress
+from collections import deque
+
+from butter.types.common import Service
+from butter.types.compact import CompactService
+from butter.types.networking import CidrBlock
+from butter.util.exceptions import DisallowedOperationException
+from butter.util.graph_export import EXTERNAL_NETWORK, node_id, spans_regions
+from butter.util.netgraph import port_key
+from butter.util.public_blocks import get_public_blocks
+
+SERVICE_TYPES = (Service, CompactService)
+
+
+def _cidr_node(cidr_block):
+    return "%s (%s)" % (cidr_block, EXTERNAL_NETWORK)
+
+
+class Reachability:
+    """
+    Index of the paths graph for multi hop reachability queries.  Edges are indexed both by source
+    and by destination, and then by port, so queries only look at the edges they can follow.
+    Services are named with their region if "qualified".
+    """
+
+    def __init__(self, qualified=False):
+        self.qualified = qualified
+        self.services = {}
+        self._by_source = {}
+        self._by_destination = {}
+        self._cidrs = {}
+
+    @classmethod
+    def from_paths(cls, paths, services=()):
+        """
+        Build the index from the result of "paths.list()".  Passing "services" as well makes
+        services with no paths show up as unreachable nodes rather than unknown ones.
+        """
+        paths, services = list(paths), list(services)
+        reachability = cls(spans_regions(
+            [service.network for service in services] +
+            [path.destination.network for path in paths]))
+        for service in services:
+            reachability.services[node_id(service, reachability.qualified)] = service
+        for path in paths:
+            reachability.add_path(path)
+        return reachability
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Build the index from a butter.types.common.Snapshot.
+        """
+        return cls.from_paths(snapshot.paths, snapshot.services)
+
+    @staticmethod
+    def _cidr_blocks(source):
+        """
+        Returns the CIDR blocks "source" stands for, or None if it is a service.
+        """
+        if isinstance(source, CidrBlock):
+            return [source.cidr_block]
+        if isinstance(source, SERVICE_TYPES) and not source.name:
+            return [ipaddress.IPv4Network(subnetwork.cidr_block)
+                    for subnetwork in source.subnetworks]
+        return None
+
+    def _source_nodes(self, source):
+        cidr_blocks = self._cidr_blocks(source)
+        if cidr_blocks is None:
+            return [self._node(source)]
+        return [_cidr_node(cidr_block) for cidr_block in cidr_blocks]
+
+    def _node(self, node):
+        if isinstance(node, SERVICE_TYPES):
+            if not node.name:
+                raise DisallowedOperationException(
+                    "Pass CIDR blocks as butter.types.networking.CidrBlock objects")
+            return node_id(node, self.qualified)
+        if isinstance(node, CidrBlock):
+            return _cidr_node(node.cidr_block)
+        return node
+
+    def _add_edge(self, source, destination, port):
+        port = port_key(port)
+        self._by_source.setdefault(source, {}).setdefault(port, set()).add(destination)
+        self._by_destination.setdefault(destination, {}).setdefault(port, set()).add(source)
+
+    def _remove_edge(self, source, destination, port):
+        port = port_key(port)
+        for index, start, end in [(self._by_source, source, destination),
+                                  (self._by_destination, destination, source)]:
+            ports = index.get(start, {})
+            ports.get(port, set()).discard(end)
+            if port in ports and not ports[port]:
+                del ports[port]
+            if start in index and not ports:
+                del index[start]
+
+    def add(self, source, destination, port):
+        """
+        Add the path from "source" to "destination" on "port", after it was added with
+        "paths.add".
+        """
+        for cidr_block in self._cidr_blocks(source) or []:
+            self._cidrs[_cidr_node(cidr_block)] = cidr_block
+        for service in [source, destination]:
+            if isinstance(service, SERVICE_TYPES) and service.name:
+                self.services.setdefault(node_id(service, self.qualified), service)
+        for source_node in self._source_nodes(source):
+            self._add_edge(source_node, self._node(destination), port)
+
+    def remove(self, source, destination, port):
+        """
+        Remove the path from "source" to "destination" on "port", after it was removed with
+        "paths.remove".
+        """
+        for source_node in self._source_nodes(source):
+            self._remove_edge(source_node, self._node(destination), port)
+            if source_node in self._cidrs and source_node not in self._by_source:
+                del self._cidrs[source_node]
+
+    def add_path(self, path):
+        """
+        Add a butter.types.common.Path, as returned by "paths.list()".
+        """
+        self.add(path.source, path.destination, path.port)
+
+    def remove_path(self, path):
+        """
+        Remove a butter.types.common.Path, as returned by "paths.list()".
+        """
+        self.remove(path.source, path.destination, path.port)
+
+    def _start_nodes(self, source):
+        """
+        Returns the nodes that "source" can reach whatever they can reach.
+        """
+        if isinstance(source, CidrBlock):
+            return [node for node, cidr_block in self._cidrs.items()
+                    if cidr_block.overlaps(source.cidr_block)]
+        return self._source_nodes(source)
+
+    def internet_nodes(self):
+        """
+        Returns the CIDR block nodes that include public internet addresses.
+        """
+        public_blocks = [ipaddress.IPv4Network(block) for block in get_public_blocks()]
+        return [node for node, cidr_block in self._cidrs.items()
+                if any(cidr_block.overlaps(public_block) for public_block in public_blocks)]
+
+    @staticmethod
+    def _ports(port):
+        if port is None:
+            return port
+        if isinstance(port, (list, tuple, set, frozenset)):
+            return [port_key(each) for each in port]
+        return [port_key(port)]
+
+    def _search(self, start_nodes, index, port, max_hops):
+        """
+        Breadth first search from "start_nodes" following the edges in "index".  Returns a map from
+        every node found to the fewest hops it took to get to it, and the node we got to it from.
+        """
+        ports = self._ports(port)
+        found = {node: (0, None) for node in start_nodes}
+        queue = deque(start_nodes)
+        while queue:
+            node = queue.popleft()
+            hops = found[node][0]
+            if max_hops is not None and hops >= max_hops:
+                continue
+            edges = index.get(node, {})
+            for edge_port in edges if ports is None else ports:
+                for neighbor in edges.get(edge_port, ()):
+                    if neighbor not in found:
+                        found[neighbor] = (hops + 1, node)
+                        queue.append(neighbor)
+        return found
+
+    def has_access(self, source, destination, port):
+        """
+        Returns true if there is a path from "source" directly to "destination" on "port".
+        """
+        destination_node = self._node(destination)
+        port = port_key(port)
+        return any(destination_node in self._by_source.get(node, {}).get(port, ())
+                   for node in self._start_nodes(source))
+
+    def reachable(self, source, port=None, max_hops=None):
+        """
+        Returns a map from every node "source" can reach to the fewest hops it takes.
+        """
+        found = self._search(self._start_nodes(source), self._by_source, port, max_hops)
+        return {node: hops for node, (hops, _) in found.items() if hops}
+
+    def reachable_from_internet(self, port=None, max_hops=None):
+        """
+        Returns a map from every node the internet can reach to the fewest hops it takes.
+        """
+        found = self._search(self.internet_nodes(), self._by_source, port, max_hops)
+        return {node: hops for node, (hops, _) in found.items() if hops}
+
+    def sources_of(self, destination, port=None, max_hops=None):
+        """
+        Returns a map from every node that can reach "destination" to the fewest hops it takes.
+        """
+        found = self._search([self._node(destination)], self._by_destination, port, max_hops)
+        return {node: hops for node, (hops, _) in found.items() if hops}
+
+    def shortest_path(self, source, destination, port=None, max_hops=None):
+        """
+        Returns the list of nodes on a shortest route from "source" to "destination", including
+        both ends, or None if there is no such route.
+        """
+        destination_node = self._node(destination)
+        found = self._search(self._start_nodes(source), self._by_source, port, max_hops)
+        if destination_node not in found or not found[destination_node][0]:
+            return None
+        route = [destination_node]
+        while found[route[-1]][1] is not None:
+            route.append(found[route[-1]][1])
+        return list(reversed(route))
+
+    def paths(self):
+        """
+        Returns every edge as a (source node, destination node, port) tuple.
+        """
+        return [(source, destination, port)
+                for source, ports in self._by_source.items()
+                for port, destinations in ports.items()
+                for destination in destinations]
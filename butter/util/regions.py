@@ -0,0 +1,154 @@
+"""
+Regions
+
+Lets one butter client span several regions of a provider, rather than needing one client (or one
+process) per region and merging their results afterwards.
+
+Usage:
+
+    client = butter.Client("aws", {}, regions=["us-east-1", "eu-west-1", "ap-southeast-2"])
+    client.network.list() # The networks in all three regions
+    client.graph() # The paths in all three regions
+    client.network.create("dev", blueprint, region="eu-west-1")
+
+Each region gets its own driver, and its own provider clients, created with the credentials plus the
+region as "region", which is how every built in provider is told what region to use.  Then:
+
+    - List operations run in every region at once, and their results are merged.
+    - Operations on a network, service, or path run in the region it is in, which is the "region"
+      of its network, or for services in global networks, the region of their subnetworks.
+    - Networks are created in the first region, unless another one is given, and so are services
+      in global networks.
+
+Some things, like networks and firewalls on GCE, are global rather than in a region, so they are
+seen from every region.  Merging results drops the copies, and things that aren't in any one region
+are handled in the first region.  Looking up a service by name in a global network looks in every
+region.
+"""
+from butter.util.exceptions import DisallowedOperationException
+from butter.util.graph_export import node_id
+from butter.util.parallel import run_parallel
+
+
+def regional_credentials(credentials, region):
+    """
+    Returns "credentials" for using "region", or "credentials" itself if "region" is None.
+    """
+    if region is None:
+        return credentials
+    return dict(credentials or {}, region=region)
+
+
+def network_key(network):
+    """
+    Returns what identifies "network" across regions, for merging lists.
+    """
+    return (network.region, network.network_id)
+
+
+def service_key(service):
+    """
+    Returns what identifies "service" across regions, for merging lists.
+    """
+    return network_key(service.network) + (service.name,)
+
+
+def path_key(path):
+    """
+    Returns what identifies "path" across regions, for merging lists.
+    """
+    return network_key(path.destination.network) + (node_id(path.source, True),
+                                                    node_id(path.destination, True),
+                                                    path.protocol, path.port)
+
+
+def merge(results, key):
+    """
+    Returns the lists in "results" as one list, leaving out every item with the same "key" as one
+    before it.
+    """
+    seen = set()
+    merged = []
+    for result in results:
+        for item in result:
+            item_key = key(item)
+            if item_key not in seen:
+                seen.add(item_key)
+                merged.append(item)
+    return merged
+
+
+class RegionalClients:
+    """
+    The provider clients of one kind, like the network clients, for every region a butter client
+    spans, in the order the regions were given.  A butter client without regions has just one
+    client, for the region None, which is whatever region the provider uses by default.
+    """
+
+    def __init__(self, client_class, credentials, drivers):
+        self.clients = {region: client_class(regional_credentials(credentials, region),
+                                             driver=driver)
+                        for region, driver in drivers.items()}
+        self.default = next(iter(self.clients.values()))
+
+    def region(self, region):
+        """
+        Returns the client for "region", or the default one if "region" is None.
+        """
+        if region is None:
+            return self.default
+        if region not in self.clients:
+            raise DisallowedOperationException("Region %s is not one of this client's regions: %s"
+                                               % (region, ", ".join(map(str, self.clients))))
+        return self.clients[region]
+
+    def for_network(self, network):
+        """
+        Returns the client for the region "network" is in, or the default one if "network" isn't
+        in one of our regions, like global networks and CIDR blocks.
+        """
+        region = network.region if network is not None else None
+        return self.clients.get(region, self.default)
+
+    def spans_regions(self, network):
+        """
+        Returns true if "network" could have services in more than one of our regions, because it's
+        global, like networks on GCE.
+        """
+        return len(self.clients) > 1 and (network is None or network.region not in self.clients)
+
+    def for_service(self, service):
+        """
+        Returns the client for the region "service" is in: the region of its network, or if its
+        network is global, the region of its subnetworks.  CIDR blocks, and services with neither,
+        get the default client.
+        """
+        network = getattr(service, "network", None)
+        if not self.spans_regions(network):
+            return self.for_network(network)
+        for subnetwork in getattr(service, "subnetworks", None) or []:
+            if subnetwork.region in self.clients:
+                return self.clients[subnetwork.region]
+        return self.default
+
+    def fan_out(self, function, recorder=None):
+        """
+        Call "function" with each region's client, all at once, and return the results in region
+        order.  The calls are attributed to the caller's operation in "recorder", if given.
+        """
+        if len(self.clients) == 1:
+            return [function(self.default)]
+        return run_parallel([lambda client=client: function(client)
+                             for client in self.clients.values()],
+                            len(self.clients), recorder)
+
+    def split(self, items, service_of):
+        """
+        Returns a list of (client, items) pairs that assigns each of "items" to the client for the
+        region of its service, as returned by "service_of", keeping their order.
+        """
+        groups = {}
+        for item in items:
+            client = self.for_service(service_of(item))
+            groups.setdefault(id(client), (client, []))[1].append(item)
+        return list(groups.values())
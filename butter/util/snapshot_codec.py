@@ -0,0 +1,126 @@
+"""
+Snapshot Codec
+
+Converts a butter.types.common.Snapshot to and from a compact form made only of tuples, lists,
+strings, and numbers, for sending snapshots between processes or storing them.
+
+Usage:
+
+    data = encode_snapshot(client.snapshot())
+    snapshot = decode_snapshot(data)
+
+In a snapshot the same network and service objects show up many times: every service has its
+network, and every path has its network, source, and destination.  The encoded form has a table of
+networks and a table of services, and everything else refers to them by their position, so each one
+is only encoded once.  Decoding rebuilds the shared objects, so the services in the decoded paths
+are the same objects as the ones in the decoded services, like in the original.
+
+Path sources that aren't services, like CIDR blocks, are encoded in place.
+"""
+from butter.types.common import Instance, Network, Path, Service, Snapshot, Subnetwork
+from butter.util.exceptions import DisallowedOperationException
+
+# Version of the encoded form, bumped whenever it changes.
+SNAPSHOT_CODEC_VERSION = 1
+
+
+def _encode_network(network):
+    return (network.name, network.network_id, network.cidr_block, network.region)
+
+
+def _encode_subnetworks(subnetworks):
+    return [(subnetwork.subnetwork_id, subnetwork.name, subnetwork.cidr_block, subnetwork.region,
+             subnetwork.availability_zone,
+             [(instance.instance_id, instance.public_ip, instance.private_ip, instance.state)
+              for instance in subnetwork.instances])
+            for subnetwork in subnetworks]
+
+
+def _decode_subnetworks(subnetworks):
+    return [Subnetwork(subnetwork_id, name, cidr_block, region, availability_zone,
+                       [Instance(*instance) for instance in instances])
+            for subnetwork_id, name, cidr_block, region, availability_zone, instances
+            in subnetworks]
+
+
+class _Encoder:
+    """
+    The network and service tables of one snapshot being encoded.
+    """
+
+    def __init__(self):
+        self.networks = []
+        self.services = []
+        self._network_positions = {}
+        self._service_positions = {}
+
+    def network(self, network):
+        """
+        Returns the position of "network" in the table, adding it if it isn't there, or None for no
+        network.
+        """
+        if network is None:
+            return None
+        key = _encode_network(network)
+        if key not in self._network_positions:
+            self._network_positions[key] = len(self.networks)
+            self.networks.append(key)
+        return self._network_positions[key]
+
+    def add_service(self, service):
+        """
+        Add "service", one of the snapshot's services, to the table.
+        """
+        self._service_positions[id(service)] = len(self.services)
+        self.services.append((self.network(service.network), service.name,
+                              _encode_subnetworks(service.subnetworks)))
+
+    def service(self, service):
+        """
+        Returns the position of "service" in the table, or the whole service if it isn't there.
+        """
+        if id(service) in self._service_positions:
+            return self._service_positions[id(service)]
+        return (self.network(service.network), service.name,
+                _encode_subnetworks(service.subnetworks))
+
+
+def encode_snapshot(snapshot):
+    """
+    Returns "snapshot" in the compact encoded form.
+    """
+    encoder = _Encoder()
+    for network in snapshot.networks:
+        encoder.network(network)
+    for service in snapshot.services:
+        encoder.add_service(service)
+    paths = [(encoder.network(path.network), encoder.service(path.source),
+              encoder.service(path.destination), path.protocol, path.port)
+             for path in snapshot.paths]
+    return (SNAPSHOT_CODEC_VERSION, encoder.networks, len(snapshot.networks), encoder.services,
+            paths)
+
+
+def decode_snapshot(data):
+    """
+    Returns the snapshot that "encode_snapshot" returned "data" for.
+    """
+    version, networks, network_count, services, paths = data
+    if version != SNAPSHOT_CODEC_VERSION:
+        raise DisallowedOperationException("Cannot decode snapshot of version %s, expected %s"
+                                           % (version, SNAPSHOT_CODEC_VERSION))
+    networks = [Network(*network) for network in networks]
+
+    def decode_service(service):
+        network, name, subnetworks = service
+        return Service(networks[network] if network is not None else None, name,
+                       _decode_subnetworks(subnetworks))
+    services = [decode_service(service) for service in services]
+
+    def service_ref(ref):
+        return services[ref] if isinstance(ref, int) else decode_service(ref)
+    return Snapshot(
+        networks=networks[:network_count], services=services,
+        paths=[Path(networks[network] if network is not None else None, service_ref(source),
+                    service_ref(destination), protocol, port)
+               for network, source, destination, protocol, port in paths])
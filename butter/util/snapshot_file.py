@@ -0,0 +1,376 @@
+"""
+Snapshot Files
+
+Saves a whole inventory snapshot (networks, services, subnetworks, instances, and paths) to a
+compact binary file, and loads it back without reading all of it, so that tools like graph viewers
+and audit jobs can work from a saved inventory instead of listing everything in the cloud again.
+
+Usage:
+
+    save_snapshot(client.snapshot(), "inventory.snap")
+
+    with load_snapshot("inventory.snap") as snapshot:
+        print(len(snapshot.services))
+        export_graph(snapshot, output, "dot")
+        reachability = Reachability.from_snapshot(snapshot)
+
+Loading memory maps the file, and the "networks", "services", and "paths" of the loaded snapshot are
+sequences that only decode a record when it's first accessed.  Decoded records are the types in
+butter.types.compact, and the same record is always the same object, so like any compact snapshot
+its networks and services can be compared by identity and used as dict keys.  Use "compact()" to
+decode everything at once into a butter.types.compact.CompactSnapshot.
+
+The file is little endian, and starts with a header with a magic number, the format version, and
+the count and offset of each section.  Every string (names, ids, CIDR blocks, addresses, states) is
+stored once, in a string table, and the other sections are arrays of fixed size records that refer
+to strings, and to each other, by their position.  That's what makes it possible to decode any one
+record without reading the ones before it.  Fields that are None are stored as NONE.
+
+    Section       Record
+    strings       offset where each string ends in the string data
+    string data   the UTF-8 bytes of every string, one after the other
+    networks      name, network_id, cidr_block, region
+    services      network, name, first subnetwork, subnetwork count
+    subnetworks   subnetwork_id, name, cidr_block, region, availability_zone, first instance,
+                  instance count
+    instances     instance_id, public_ip, private_ip, state
+    paths         network, source service, destination service, protocol, port
+
+Like in butter.util.snapshot_codec, the networks and services sections start with the ones in the
+snapshot, followed by the ones only paths refer to, like the nameless services that stand in for
+CIDR blocks.  A service is only stored once however many objects the snapshot has for it, since
+they're told apart by network and name, or by CIDR blocks for the nameless ones.
+
+Ports are usually numbers, but some providers list them as strings, like "80" on GCE, or "N/A" on
+AWS for rules without one.  Those are stored in the string table, with STRING_PORT set in the port
+field, so they load back exactly as they were.
+"""
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+
+from butter.types.compact import (CompactInstance, CompactNetwork, CompactPath, CompactService,
+                                  CompactSnapshot, CompactSubnetwork, service_key)
+from butter.util.exceptions import DisallowedOperationException
+
+MAGIC = b"BTRSNAP\x00"
+
+# Version of the file format, bumped whenever it changes.  Version 1 files had no string ports,
+# but are otherwise the same, so they can still be loaded.
+SNAPSHOT_FILE_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+
+# Stands for None wherever a string or record position is expected.
+NONE = 0xFFFFFFFF
+
+# Set in the port of a path whose port is a string, with the rest of it being the string's position.
+STRING_PORT = 0x80000000
+
+# Magic, version, reserved, then the counts of strings, networks, networks in the snapshot,
+# services, services in the snapshot, subnetworks, instances, and paths, then the offsets of the
+# strings, string data, networks, services, subnetworks, instances, and paths sections.
+_HEADER = struct.Struct("<8sHH8I7Q")
+_STRING_END = struct.Struct("<I")
+_NETWORK = struct.Struct("<4I")
+_SERVICE = struct.Struct("<4I")
+_SUBNETWORK = struct.Struct("<7I")
+_INSTANCE = struct.Struct("<4I")
+_PATH = struct.Struct("<5I")
+
+
+# pylint: disable=too-many-instance-attributes
+class _Writer:
+    """
+    The sections of one snapshot file being written.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.networks = []
+        self.services = []
+        self.subnetworks = []
+        self.instances = []
+        self.paths = []
+        self._string_positions = {}
+        self._network_positions = {}
+        self._service_positions = {}
+
+    def string(self, value):
+        """
+        Returns the position of "value" in the string table, adding it if it isn't there, or NONE
+        for None.
+        """
+        if value is None:
+            return NONE
+        value = str(value)
+        if value not in self._string_positions:
+            self._string_positions[value] = len(self.strings)
+            self.strings.append(value)
+        return self._string_positions[value]
+
+    def network(self, network):
+        """
+        Returns the position of "network" in the networks section, adding it if it isn't there, or
+        NONE for no network.
+        """
+        if network is None:
+            return NONE
+        record = (self.string(network.name), self.string(network.network_id),
+                  self.string(network.cidr_block), self.string(network.region))
+        if record not in self._network_positions:
+            self._network_positions[record] = len(self.networks)
+            self.networks.append(record)
+        return self._network_positions[record]
+
+    def service(self, service):
+        """
+        Returns the position of "service" in the services section, adding it, along with its
+        subnetworks and instances, if it isn't there.
+        """
+        network = self.network(service.network)
+        key = service_key(network, service)
+        if key in self._service_positions:
+            return self._service_positions[key]
+        first_subnetwork = len(self.subnetworks)
+        for subnetwork in service.subnetworks:
+            first_instance = len(self.instances)
+            for instance in subnetwork.instances:
+                self.instances.append((self.string(instance.instance_id),
+                                       self.string(instance.public_ip),
+                                       self.string(instance.private_ip),
+                                       self.string(instance.state)))
+            self.subnetworks.append((self.string(subnetwork.subnetwork_id),
+                                     self.string(subnetwork.name),
+                                     self.string(subnetwork.cidr_block),
+                                     self.string(subnetwork.region),
+                                     self.string(subnetwork.availability_zone),
+                                     first_instance, len(subnetwork.instances)))
+        self._service_positions[key] = len(self.services)
+        self.services.append((network, self.string(service.name), first_subnetwork,
+                              len(service.subnetworks)))
+        return self._service_positions[key]
+
+    def port(self, port):
+        """
+        Returns the port field for "port".
+        """
+        if port is None:
+            return NONE
+        if isinstance(port, str):
+            return STRING_PORT | self.string(port)
+        return port
+
+    def path(self, path):
+        """
+        Add "path" to the paths section.
+        """
+        self.paths.append((self.network(path.network), self.service(path.source),
+                           self.service(path.destination), self.string(path.protocol),
+                           self.port(path.port)))
+
+    def write(self, output, network_count, service_count):
+        """
+        Write the header and every section to the binary file object "output".  The first
+        "network_count" networks and "service_count" services are the snapshot's own.
+        """
+        string_data = [value.encode("utf-8") for value in self.strings]
+        string_ends = []
+        end = 0
+        for data in string_data:
+            end += len(data)
+            string_ends.append(end)
+        sections = [
+            b"".join(_STRING_END.pack(string_end) for string_end in string_ends),
+            b"".join(string_data),
+            b"".join(_NETWORK.pack(*record) for record in self.networks),
+            b"".join(_SERVICE.pack(*record) for record in self.services),
+            b"".join(_SUBNETWORK.pack(*record) for record in self.subnetworks),
+            b"".join(_INSTANCE.pack(*record) for record in self.instances),
+            b"".join(_PATH.pack(*record) for record in self.paths),
+            ]
+        offsets = []
+        offset = _HEADER.size
+        for section in sections:
+            offsets.append(offset)
+            offset += len(section)
+        output.write(_HEADER.pack(MAGIC, SNAPSHOT_FILE_VERSION, 0, len(self.strings),
+                                  len(self.networks), network_count, len(self.services),
+                                  service_count, len(self.subnetworks), len(self.instances),
+                                  len(self.paths), *offsets))
+        for section in sections:
+            output.write(section)
+
+
+def dump_snapshot(snapshot, output):
+    """
+    Write "snapshot", either a butter.types.common.Snapshot or a compact one, to the binary file
+    object "output".
+    """
+    writer = _Writer()
+    for network in snapshot.networks:
+        writer.network(network)
+    network_count = len(writer.networks)
+    for service in snapshot.services:
+        writer.service(service)
+    service_count = len(writer.services)
+    for path in snapshot.paths:
+        writer.path(path)
+    writer.write(output, network_count, service_count)
+
+
+def save_snapshot(snapshot, path):
+    """
+    Save "snapshot" to the file at "path".
+    """
+    with open(path, "wb") as output:
+        dump_snapshot(snapshot, output)
+
+
+class _Records(Sequence):
+    """
+    One section of a loaded snapshot file, decoding each record the first time it's accessed.
+    """
+
+    def __init__(self, decode, count):
+        self._decode = decode
+        self._records = [None] * count
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        position = range(len(self._records))[index]
+        record = self._records[position]
+        if record is None:
+            record = self._records[position] = self._decode(position)
+        return record
+
+
+class _Head(Sequence):
+    """
+    The first "count" records of a section, without decoding them.
+    """
+
+    def __init__(self, records, count):
+        self._records = records
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        return self._records[range(self._count)[index]]
+
+
+# pylint: disable=too-many-instance-attributes
+class SnapshotFile:
+    """
+    A snapshot loaded from a file with "load_snapshot".  Has "networks", "services", and "paths"
+    like a snapshot, decoded as they are used.  The file stays open until "close" is called, or
+    the "with" block it's used in ends.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as snapshot_file:
+            if os.fstat(snapshot_file.fileno()).st_size < _HEADER.size:
+                raise DisallowedOperationException("%s is not a snapshot file" % path)
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, *rest = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise DisallowedOperationException("%s is not a snapshot file" % path)
+        if version not in READABLE_VERSIONS:
+            self._mmap.close()
+            raise DisallowedOperationException(
+                "Cannot load snapshot file of version %s, expected %s" %
+                (version, SNAPSHOT_FILE_VERSION))
+        (string_count, network_count, snapshot_networks, service_count, snapshot_services,
+         subnetwork_count, instance_count, path_count) = rest[:8]
+        (self._strings_at, self._string_data_at, self._networks_at, self._services_at,
+         self._subnetworks_at, self._instances_at, self._paths_at) = rest[8:]
+        self._strings = _Records(self._decode_string, string_count)
+        self._networks = _Records(self._decode_network, network_count)
+        self._services = _Records(self._decode_service, service_count)
+        self._subnetworks = _Records(self._decode_subnetwork, subnetwork_count)
+        self._instances = _Records(self._decode_instance, instance_count)
+        self.networks = _Head(self._networks, snapshot_networks)
+        self.services = _Head(self._services, snapshot_services)
+        self.paths = _Records(self._decode_path, path_count)
+
+    def _string(self, position):
+        return None if position == NONE else self._strings[position]
+
+    def _decode_string(self, position):
+        start = 0
+        if position:
+            start = _STRING_END.unpack_from(self._mmap,
+                                            self._strings_at + (position - 1) * _STRING_END.size)[0]
+        end = _STRING_END.unpack_from(self._mmap, self._strings_at + position * _STRING_END.size)[0]
+        return self._mmap[self._string_data_at + start:self._string_data_at + end].decode("utf-8")
+
+    def _network(self, position):
+        return None if position == NONE else self._networks[position]
+
+    def _decode_network(self, position):
+        record = _NETWORK.unpack_from(self._mmap, self._networks_at + position * _NETWORK.size)
+        return CompactNetwork(*[self._string(field) for field in record])
+
+    def _decode_service(self, position):
+        network, name, first_subnetwork, subnetwork_count = _SERVICE.unpack_from(
+            self._mmap, self._services_at + position * _SERVICE.size)
+        return CompactService(self._network(network), self._string(name),
+                              tuple(self._subnetworks[first_subnetwork:
+                                                      first_subnetwork + subnetwork_count]))
+
+    def _decode_subnetwork(self, position):
+        record = _SUBNETWORK.unpack_from(self._mmap,
+                                         self._subnetworks_at + position * _SUBNETWORK.size)
+        first_instance, instance_count = record[5:]
+        return CompactSubnetwork(*[self._string(field) for field in record[:5]],
+                                 instances=tuple(self._instances[first_instance:
+                                                                 first_instance + instance_count]))
+
+    def _decode_instance(self, position):
+        record = _INSTANCE.unpack_from(self._mmap, self._instances_at + position * _INSTANCE.size)
+        return CompactInstance(*[self._string(field) for field in record])
+
+    def _decode_path(self, position):
+        network, source, destination, protocol, port = _PATH.unpack_from(
+            self._mmap, self._paths_at + position * _PATH.size)
+        if port == NONE:
+            port = None
+        elif port & STRING_PORT:
+            port = self._string(port & ~STRING_PORT)
+        return CompactPath(self._network(network), self._services[source],
+                           self._services[destination], self._string(protocol), port)
+
+    def compact(self):
+        """
+        Decode the whole snapshot, and return it as a butter.types.compact.CompactSnapshot.
+        """
+        return CompactSnapshot(networks=tuple(self.networks), services=tuple(self.services),
+                               paths=tuple(self.paths))
+
+    def close(self):
+        """
+        Close the file.  Records that were already decoded can still be used.
+        """
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_snapshot(path):
+    """
+    Load the snapshot saved at "path", as a SnapshotFile.
+    """
+    return SnapshotFile(path)
@@ -0,0 +1,487 @@
+"""
+State Store
+
+Keeps what a butter client knows about its networks, services, instances, and paths in a local
+SQLite database, so that reads like listing services, exporting the graph, or checking access can be
+answered without calling the provider at all.
+
+Usage:
+
+    client = butter.Client("aws", {}, state_store="butter-state.db")
+    client.refresh() # List everything once, and store it
+    client.graph(max_staleness=300) # From the store, if it was refreshed in the last five minutes
+    client.paths.has_access(web, database, 5432, max_staleness=300)
+    client.service.list() # Still from the provider, and doesn't touch the store
+
+The store is refreshed with everything in the account every time the client lists everything, with
+"refresh", "snapshot", or "graph", and every create, destroy, add, or remove made through the client
+is applied to it as well.  Reads only use the store if they're given a "max_staleness", in seconds,
+and the store was refreshed at most that long ago.  Otherwise they go to the provider like always.
+Changes made outside the client only show up after the next refresh, which is what "max_staleness"
+bounds.
+
+Security groups and firewall rules are stored as the paths they implement, one row for each
+source service or CIDR block allowed into a destination service on a port.  Networks are indexed by
+name and id, services by network and name, instances by id and by private and public IP, and paths
+by destination and port and by source.
+
+The database uses write ahead logging, so other processes, like a graph UI, can read it while the
+client is writing to it.  Each database holds the state of one client, since refreshing replaces
+everything in it.
+"""
+import ipaddress
+import sqlite3
+import threading
+import time
+
+from butter.types.common import Instance, Network, Path, Service, Snapshot, Subnetwork
+from butter.types.networking import CidrBlock
+from butter.util.exceptions import DisallowedOperationException
+from butter.util.public_blocks import get_public_blocks
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS networks (
+    id INTEGER PRIMARY KEY,
+    region TEXT NOT NULL,
+    network_id TEXT NOT NULL,
+    name TEXT,
+    cidr_block TEXT,
+    UNIQUE (region, network_id)
+);
+CREATE INDEX IF NOT EXISTS networks_by_name ON networks (name);
+CREATE TABLE IF NOT EXISTS services (
+    id INTEGER PRIMARY KEY,
+    network INTEGER NOT NULL REFERENCES networks (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    UNIQUE (network, name)
+);
+CREATE INDEX IF NOT EXISTS services_by_name ON services (name);
+CREATE TABLE IF NOT EXISTS subnetworks (
+    id INTEGER PRIMARY KEY,
+    service INTEGER NOT NULL REFERENCES services (id) ON DELETE CASCADE,
+    subnetwork_id TEXT,
+    name TEXT,
+    cidr_block TEXT,
+    region TEXT,
+    availability_zone TEXT
+);
+CREATE INDEX IF NOT EXISTS subnetworks_by_service ON subnetworks (service);
+CREATE TABLE IF NOT EXISTS instances (
+    id INTEGER PRIMARY KEY,
+    subnetwork INTEGER NOT NULL REFERENCES subnetworks (id) ON DELETE CASCADE,
+    instance_id TEXT,
+    public_ip TEXT,
+    private_ip TEXT,
+    state TEXT
+);
+CREATE INDEX IF NOT EXISTS instances_by_subnetwork ON instances (subnetwork);
+CREATE INDEX IF NOT EXISTS instances_by_id ON instances (instance_id);
+CREATE INDEX IF NOT EXISTS instances_by_private_ip ON instances (private_ip);
+CREATE INDEX IF NOT EXISTS instances_by_public_ip ON instances (public_ip);
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    destination INTEGER NOT NULL REFERENCES services (id) ON DELETE CASCADE,
+    port INTEGER,
+    protocol TEXT,
+    source_service INTEGER REFERENCES services (id) ON DELETE CASCADE,
+    source_cidr TEXT
+);
+-- Paths have either a source service or a source CIDR block, and unique indexes never consider
+-- the NULL in the other one equal, so each kind of path gets its own partial index.  Stores
+-- written before these existed can have duplicate paths, which GROUP BY does consider equal.
+DELETE FROM paths WHERE id NOT IN (
+    SELECT MIN(id) FROM paths GROUP BY destination, port, source_service, source_cidr);
+CREATE UNIQUE INDEX IF NOT EXISTS paths_from_services ON paths (destination, port, source_service)
+    WHERE source_cidr IS NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS paths_from_cidr_blocks ON paths (destination, port, source_cidr)
+    WHERE source_service IS NULL;
+CREATE INDEX IF NOT EXISTS paths_by_destination ON paths (destination, port);
+CREATE INDEX IF NOT EXISTS paths_by_port ON paths (port);
+CREATE INDEX IF NOT EXISTS paths_by_source ON paths (source_service);
+"""
+
+# Regions are part of the networks key, and SQL never considers NULLs equal, so networks that
+# aren't in a region, like GCE's, are stored with this as their region.
+NO_REGION = ""
+
+
+def _network_key(network):
+    return (network.region if network.region is not None else NO_REGION, network.network_id)
+
+
+# pylint: disable=too-many-public-methods
+class StateStore:
+    """
+    Local state of one butter client, kept in the SQLite database at "path".  Safe to use from
+    multiple threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        """
+        Close the database.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _query(self, sql, *args):
+        with self._lock:
+            return self._connection.execute(sql, args).fetchall()
+
+    # Freshness
+
+    def refreshed_at(self):
+        """
+        Returns when the store was last refreshed, as a "time.time()" timestamp, or None if it never
+        was.
+        """
+        rows = self._query("SELECT value FROM meta WHERE key = 'refreshed_at'")
+        return rows[0][0] if rows else None
+
+    def fresh(self, max_staleness):
+        """
+        Returns true if reads allowing "max_staleness" seconds of staleness can use the store.  A
+        "max_staleness" of None means reads have to go to the provider.
+        """
+        if max_staleness is None:
+            return False
+        refreshed_at = self.refreshed_at()
+        return refreshed_at is not None and time.time() - refreshed_at <= max_staleness
+
+    # Writes
+
+    def _network_row(self, network, insert=True):
+        region, network_id = _network_key(network)
+        rows = self._connection.execute(
+            "SELECT id FROM networks WHERE region = ? AND network_id = ?",
+            (region, network_id)).fetchall()
+        if rows:
+            return rows[0][0]
+        if not insert:
+            return None
+        return self._connection.execute(
+            "INSERT INTO networks (region, network_id, name, cidr_block) VALUES (?, ?, ?, ?)",
+            (region, network_id, network.name, network.cidr_block)).lastrowid
+
+    def _service_row(self, service, insert=True):
+        network = self._network_row(service.network, insert)
+        if network is None:
+            return None
+        rows = self._connection.execute("SELECT id FROM services WHERE network = ? AND name = ?",
+                                        (network, service.name)).fetchall()
+        if rows:
+            return rows[0][0]
+        if not insert:
+            return None
+        return self._insert_service(network, service)
+
+    def _insert_service(self, network, service):
+        service_row = self._connection.execute(
+            "INSERT INTO services (network, name) VALUES (?, ?)", (network, service.name)).lastrowid
+        self._insert_subnetworks(service_row, service)
+        return service_row
+
+    def _insert_subnetworks(self, service_row, service):
+        for subnetwork in service.subnetworks:
+            subnetwork_row = self._connection.execute(
+                "INSERT INTO subnetworks (service, subnetwork_id, name, cidr_block, region, "
+                "availability_zone) VALUES (?, ?, ?, ?, ?, ?)",
+                (service_row, subnetwork.subnetwork_id, subnetwork.name, subnetwork.cidr_block,
+                 subnetwork.region, subnetwork.availability_zone)).lastrowid
+            self._connection.executemany(
+                "INSERT INTO instances (subnetwork, instance_id, public_ip, private_ip, state) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(subnetwork_row, instance.instance_id, instance.public_ip, instance.private_ip,
+                  instance.state) for instance in subnetwork.instances])
+
+    @staticmethod
+    def _path_sources(source):
+        """
+        Returns (source service, source CIDR block) pairs for "source", a service or CIDR block.
+        """
+        if isinstance(source, CidrBlock):
+            return [(None, str(source.cidr_block))]
+        if not source.name:
+            return [(None, str(ipaddress.IPv4Network(subnetwork.cidr_block)))
+                    for subnetwork in source.subnetworks]
+        return [(source, None)]
+
+    def _path_rows(self, source, destination, insert=True):
+        # Paths out to CIDR blocks aren't in what the providers list, so they aren't stored either.
+        if not isinstance(destination, Service):
+            return []
+        destination_row = self._service_row(destination, insert)
+        if destination_row is None:
+            return []
+        rows = []
+        for source_service, source_cidr in self._path_sources(source):
+            source_row = None
+            if source_service is not None:
+                source_row = self._service_row(source_service, insert)
+                if source_row is None:
+                    continue
+            rows.append((destination_row, source_row, source_cidr))
+        return rows
+
+    def _add_path(self, source, destination, port, protocol="tcp"):
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO paths (destination, port, protocol, source_service, "
+            "source_cidr) VALUES (?, ?, ?, ?, ?)",
+            [(destination_row, port, protocol, source_row, source_cidr)
+             for destination_row, source_row, source_cidr
+             in self._path_rows(source, destination)])
+
+    def replace(self, snapshot):
+        """
+        Replace everything in the store with the butter.types.common.Snapshot "snapshot", of
+        everything in the account, and mark the store as refreshed now.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM networks")
+            for network in snapshot.networks:
+                self._network_row(network)
+            for service in snapshot.services:
+                self._service_row(service)
+            for path in snapshot.paths:
+                self._add_path(path.source, path.destination, path.port, path.protocol)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('refreshed_at', ?)",
+                (time.time(),))
+
+    def add_network(self, network):
+        """
+        Store "network", after it was created.
+        """
+        with self._lock, self._connection:
+            self._network_row(network)
+
+    def remove_network(self, network):
+        """
+        Remove "network", and everything in it, after it was destroyed.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM networks WHERE region = ? AND network_id = ?",
+                                     _network_key(network))
+
+    def add_service(self, service):
+        """
+        Store "service", after it was created, replacing the subnetworks and instances stored for it
+        before.  Paths to and from it are kept.
+        """
+        with self._lock, self._connection:
+            existing = self._service_row(service, insert=False)
+            if existing is None:
+                self._insert_service(self._network_row(service.network), service)
+                return
+            self._connection.execute("DELETE FROM subnetworks WHERE service = ?", (existing,))
+            self._insert_subnetworks(existing, service)
+
+    def remove_service(self, service):
+        """
+        Remove "service", and every path to or from it, after it was destroyed.
+        """
+        with self._lock, self._connection:
+            existing = self._service_row(service, insert=False)
+            if existing is not None:
+                self._connection.execute("DELETE FROM services WHERE id = ?", (existing,))
+
+    def add_paths(self, paths):
+        """
+        Store every (source, destination, port) path in "paths", after they were added.
+        """
+        with self._lock, self._connection:
+            for source, destination, port in paths:
+                self._add_path(source, destination, port)
+
+    def remove_paths(self, paths):
+        """
+        Remove every (source, destination, port) path in "paths", after they were removed.
+        """
+        with self._lock, self._connection:
+            for source, destination, port in paths:
+                for destination_row, source_row, source_cidr in self._path_rows(
+                        source, destination, insert=False):
+                    self._connection.execute(
+                        "DELETE FROM paths WHERE destination = ? AND port = ? AND "
+                        "source_service IS ? AND source_cidr IS ?",
+                        (destination_row, port, source_row, source_cidr))
+
+    # Reads
+
+    def _networks(self, where="", args=()):
+        return {row[0]: Network(name=row[3], network_id=row[2], cidr_block=row[4],
+                                region=row[1] if row[1] != NO_REGION else None)
+                for row in self._query("SELECT id, region, network_id, name, cidr_block "
+                                       "FROM networks %s ORDER BY id" % where, *args)}
+
+    def _services(self, where="", args=(), networks=None):
+        """
+        Returns a map from row id to service for the services matching "where".
+        """
+        networks = networks if networks is not None else self._networks()
+        services = {}
+        subnetworks = {}
+        for service_row, network_row, name in self._query(
+                "SELECT id, network, name FROM services %s ORDER BY id" % where, *args):
+            services[service_row] = Service(network=networks[network_row], name=name,
+                                            subnetworks=[])
+        if not services:
+            return services
+        for row in self._query("SELECT id, service, subnetwork_id, name, cidr_block, region, "
+                               "availability_zone FROM subnetworks ORDER BY id"):
+            if row[1] in services:
+                subnetworks[row[0]] = Subnetwork(*row[2:], instances=[])
+                services[row[1]].subnetworks.append(subnetworks[row[0]])
+        for row in self._query("SELECT subnetwork, instance_id, public_ip, private_ip, state "
+                               "FROM instances ORDER BY id"):
+            if row[0] in subnetworks:
+                subnetworks[row[0]].instances.append(Instance(*row[1:]))
+        return services
+
+    def networks(self, name=None):
+        """
+        Returns the stored networks, or only the ones named "name".
+        """
+        if name is None:
+            return list(self._networks().values())
+        return list(self._networks("WHERE name = ?", (name,)).values())
+
+    def network(self, name):
+        """
+        Returns the first stored network named "name", or None.
+        """
+        networks = self.networks(name)
+        return networks[0] if networks else None
+
+    def services(self):
+        """
+        Returns the stored services.
+        """
+        return list(self._services().values())
+
+    def service(self, network, name):
+        """
+        Returns the stored service named "name" in "network", or None.
+        """
+        services = self._services(
+            "WHERE name = ? AND network IN (SELECT id FROM networks WHERE region = ? AND "
+            "network_id = ?)", (name,) + _network_key(network))
+        return next(iter(services.values()), None)
+
+    def service_with_instance(self, instance):
+        """
+        Returns the stored service with an instance with the id, private IP, or public IP
+        "instance", or None.
+        """
+        services = self._services(
+            "WHERE id IN (SELECT service FROM subnetworks WHERE id IN (SELECT subnetwork FROM "
+            "instances WHERE instance_id = ? OR private_ip = ? OR public_ip = ?))",
+            (instance, instance, instance))
+        return next(iter(services.values()), None)
+
+    def _paths(self, services, where="", args=()):
+        """
+        Returns the stored paths matching "where", between the services in "services", a map from
+        row id to service.  Like the providers, all the CIDR blocks allowed into a service on a port
+        are one path, with a nameless service as its source.
+        """
+        paths = []
+        cidr_paths = {}
+        for destination, port, protocol, source_service, source_cidr in self._query(
+                "SELECT destination, port, protocol, source_service, source_cidr FROM paths "
+                "%s ORDER BY id" % where, *args):
+            if destination not in services:
+                continue
+            destination_service = services[destination]
+            if source_service is not None:
+                if source_service in services:
+                    paths.append(Path(destination_service.network, services[source_service],
+                                      destination_service, protocol, port))
+                continue
+            key = (destination, port, protocol)
+            if key not in cidr_paths:
+                cidr_paths[key] = Path(destination_service.network,
+                                       Service(network=None, name=None, subnetworks=[]),
+                                       destination_service, protocol, port)
+                paths.append(cidr_paths[key])
+            cidr_paths[key].source.subnetworks.append(
+                Subnetwork(subnetwork_id=None, name=None, cidr_block=source_cidr, region=None,
+                           availability_zone=None, instances=[]))
+        return paths
+
+    def paths(self, services=None, port=None):
+        """
+        Returns the stored paths, only between "services" if given, and only on "port" if given.
+        """
+        if services is None:
+            by_row = self._services()
+        else:
+            with self._lock:
+                rows = [self._service_row(service, insert=False) for service in services]
+            by_row = {row: service for row, service in zip(rows, services) if row is not None}
+        if port is None:
+            return self._paths(by_row)
+        return self._paths(by_row, "WHERE port = ?", (port,))
+
+    def snapshot(self):
+        """
+        Returns everything in the store as a butter.types.common.Snapshot.
+        """
+        with self._lock:
+            networks = self._networks()
+            services = self._services(networks=networks)
+            return Snapshot(networks=list(networks.values()), services=list(services.values()),
+                            paths=self._paths(services))
+
+    def _sources(self, destination, port):
+        """
+        Returns the row ids of the services, and the CIDR blocks, allowed into "destination" on
+        "port".
+        """
+        if not isinstance(destination, Service):
+            raise DisallowedOperationException(
+                "Destination must be a butter.types.networking.Service object")
+        with self._lock:
+            destination_row = self._service_row(destination, insert=False)
+        rows = self._query("SELECT source_service, source_cidr FROM paths WHERE destination = ? "
+                           "AND port = ?", destination_row, port)
+        return ({row[0] for row in rows if row[0] is not None},
+                [ipaddress.IPv4Network(row[1]) for row in rows if row[1] is not None])
+
+    def has_access(self, source, destination, port):
+        """
+        Returns true if "source" is allowed into "destination" on "port", the same way the
+        providers' "has_access" would.
+        """
+        source_rows, cidr_blocks = self._sources(destination, port)
+        access = False
+        for source_service, source_cidr in self._path_sources(source):
+            if source_service is not None:
+                with self._lock:
+                    access = self._service_row(source_service, insert=False) in source_rows
+            else:
+                access = any(ipaddress.IPv4Network(source_cidr).overlaps(cidr_block)
+                             for cidr_block in cidr_blocks)
+            if access:
+                return True
+        return False
+
+    def internet_accessible(self, service, port):
+        """
+        Returns true if any public address is allowed into "service" on "port".
+        """
+        cidr_blocks = self._sources(service, port)[1]
+        return any(cidr_block.overlaps(public_block)
+                   for cidr_block in cidr_blocks for public_block in get_public_blocks())
@@ -0,0 +1,294 @@
+"""
+Operation Tracing
+
+Records a tree of timed spans for what a butter client is doing: each client operation, the
+internal stages of that operation, and each provider call made along the way.  This is for finding
+out which part of a slow operation is actually slow.
+
+Usage:
+
+    with client.trace() as tracer:
+        client.service.create(network, "web", blueprint)
+    tracer.to_json()
+    tracer.to_chrome_trace() # Load in chrome://tracing or https://ui.perfetto.dev
+
+Internal stages are marked with the "span" context manager or the "traced" decorator:
+
+    with span("security_group", vpc_id=vpc_id):
+        ...
+
+    @traced("subnetwork.create")
+    def create(self, ...):
+        ...
+
+Spans are only recorded on a thread while one of its client operations is being traced.  Otherwise
+"span" returns a shared no-op context manager and "traced" calls straight through, so leaving them
+in costs next to nothing.
+"""
+import functools
+import itertools
+import json
+import threading
+import time
+
+_LOCAL = threading.local()
+
+
+# pylint: disable=too-many-instance-attributes
+class Span:
+    """
+    A single timed piece of work.  Times are in seconds since the tracer was created.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, tracer, span_id, parent_id, name, category, start, attributes):
+        self.tracer = tracer
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = None
+        self.thread_id = threading.get_ident()
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """
+        Add attributes to this span.
+        """
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        """
+        Return this span as plain data, without its children.
+        """
+        return {
+            "id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "category": self.category,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.end - self.start if self.end is not None else None,
+            "thread_id": self.thread_id,
+            "attributes": dict(self.attributes),
+            }
+
+
+class _NoSpan:
+    """
+    What "span" returns when nothing is being traced.
+    """
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+def _stack():
+    if not hasattr(_LOCAL, "stack"):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+def current_span():
+    """
+    Returns the innermost span in progress on this thread, or None.
+    """
+    stack = getattr(_LOCAL, "stack", None)
+    return stack[-1] if stack else None
+
+
+def current_tracer():
+    """
+    Returns the tracer recording spans on this thread, or None.
+    """
+    stack = getattr(_LOCAL, "stack", None)
+    return stack[-1].tracer if stack else None
+
+
+class _ContinuedSpan:
+    """
+    Context manager that makes a span from another thread the current span on this one.
+    """
+
+    def __init__(self, parent):
+        self.parent = parent
+
+    def __enter__(self):
+        _stack().append(self.parent)
+        return self.parent
+
+    def __exit__(self, *exc_info):
+        _stack().pop()
+        return False
+
+
+def continue_span(parent):
+    """
+    Context manager that records everything traced inside it as part of "parent", a span in
+    progress on another thread, so work handed off to a thread pool still shows up where it belongs
+    in the trace.  Does nothing if "parent" is None.
+    """
+    if parent is None:
+        return NO_SPAN
+    return _ContinuedSpan(parent)
+
+
+class _ActiveSpan:
+    """
+    Context manager for a span that is in progress on the current thread.
+    """
+
+    def __init__(self, tracer, name, category, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.tracer.start_span(self.name, self.category, self.attributes)
+        _stack().append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _stack().pop()
+        if exc_type is not None:
+            self.span.set(error=exc_type.__name__)
+        self.tracer.end_span(self.span)
+        return False
+
+
+class Tracer:
+    """
+    Collects the spans for one trace.  Safe to use from multiple threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._origin = time.perf_counter()
+        self.spans = []
+
+    def now(self):
+        """
+        Seconds since this tracer was created.
+        """
+        return time.perf_counter() - self._origin
+
+    def span(self, name, category="stage", **attributes):
+        """
+        Context manager that records a span named "name" around its body, nested under whatever
+        span is in progress on this thread.
+        """
+        return _ActiveSpan(self, name, category, attributes)
+
+    def start_span(self, name, category, attributes, start=None):
+        """
+        Start and return a span.  Usually "span" is what you want instead.
+        """
+        parent = current_span()
+        new_span = Span(self, next(self._ids), parent.span_id if parent else None, name, category,
+                        self.now() if start is None else start, attributes)
+        with self._lock:
+            self.spans.append(new_span)
+        return new_span
+
+    def end_span(self, started_span, end=None):
+        """
+        Finish a span started with "start_span".
+        """
+        started_span.end = self.now() if end is None else end
+
+    def add_span(self, name, category, duration, **attributes):
+        """
+        Record a span that just finished after "duration" seconds, for things that are timed
+        elsewhere, like provider calls.
+        """
+        end = self.now()
+        finished_span = self.start_span(name, category, attributes, start=end - duration)
+        self.end_span(finished_span, end)
+        return finished_span
+
+    def to_dict(self):
+        """
+        Return the trace as a list of root spans, each with a list of its "children".
+        """
+        with self._lock:
+            spans = [recorded.to_dict() for recorded in self.spans]
+        by_id = {span_info["id"]: span_info for span_info in spans}
+        roots = []
+        for span_info in spans:
+            span_info["children"] = []
+        for span_info in spans:
+            if span_info["parent_id"] in by_id:
+                by_id[span_info["parent_id"]]["children"].append(span_info)
+            else:
+                roots.append(span_info)
+        return {"spans": roots}
+
+    def to_json(self, output=None, **kwargs):
+        """
+        Return the trace as a JSON string, or write it to the file object "output".
+        """
+        kwargs.setdefault("default", str)
+        if output is not None:
+            return json.dump(self.to_dict(), output, **kwargs)
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_chrome_trace(self, output=None):
+        """
+        Return the trace in the Chrome trace event format as a JSON string, or write it to the file
+        object "output".
+        """
+        with self._lock:
+            spans = [recorded.to_dict() for recorded in self.spans]
+        events = []
+        for span_info in spans:
+            end = span_info["end"] if span_info["end"] is not None else self.now()
+            events.append({
+                "name": span_info["name"],
+                "cat": span_info["category"],
+                "ph": "X",
+                "ts": span_info["start"] * 1e6,
+                "dur": (end - span_info["start"]) * 1e6,
+                "pid": 0,
+                "tid": span_info["thread_id"],
+                "args": span_info["attributes"],
+                })
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if output is not None:
+            return json.dump(trace, output, default=str)
+        return json.dumps(trace, default=str)
+
+
+def span(name, category="stage", **attributes):
+    """
+    Context manager that records a span on the tracer in use on this thread, if there is one.
+    """
+    tracer = current_tracer()
+    if tracer is None:
+        return NO_SPAN
+    return tracer.span(name, category, **attributes)
+
+
+def traced(name, category="stage"):
+    """
+    Decorator that records each call to the decorated function as a span named "name".
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = current_tracer()
+            if tracer is None:
+                return function(*args, **kwargs)
+            with tracer.span(name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,106 @@
+"""
+Tests for the compiled index of AWS security group ingress rules.
+"""
+import time
+from butter.providers.aws.impl.access_index import AccessIndex, CidrIntervals
+
+
+def test_cidr_intervals():
+    """
+    Test that overlap checks see every block, including after blocks are merged and removed.
+    """
+    intervals = CidrIntervals()
+    assert not intervals.overlaps("10.0.0.0/8")
+    intervals.add("10.0.0.0/24")
+    intervals.add("10.0.1.0/24")
+    intervals.add("192.168.0.0/16")
+    assert intervals.overlaps("10.0.1.5/32")
+    assert intervals.overlaps("10.0.0.0/8")
+    assert intervals.overlaps("0.0.0.0/0")
+    assert not intervals.overlaps("10.0.2.0/24")
+    assert not intervals.overlaps("172.16.0.0/12")
+
+    intervals.remove("10.0.1.0/24")
+    assert not intervals.overlaps("10.0.1.5/32")
+    assert intervals.overlaps("10.0.0.5/32")
+
+    # Added twice, so it has to be removed twice.
+    intervals.add("192.168.0.0/16")
+    intervals.remove("192.168.0.0/16")
+    assert intervals.overlaps("192.168.1.0/24")
+    intervals.remove("192.168.0.0/16")
+    assert not intervals.overlaps("192.168.1.0/24")
+
+
+def test_access_index():
+    """
+    Test that the index answers like the security group rules it was built from, and stays up to
+    date as rules are added and removed.
+    """
+    index = AccessIndex()
+    index.load([{"GroupId": "sg-web", "IpPermissions": [
+        {"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443,
+         "IpRanges": [{"CidrIp": "0.0.0.0/0"}], "UserIdGroupPairs": []},
+        {"IpProtocol": "tcp", "FromPort": 80, "ToPort": 80,
+         "IpRanges": [], "UserIdGroupPairs": [{"GroupId": "sg-lb"}]},
+        {"IpProtocol": "-1", "IpRanges": [{"CidrIp": "10.0.0.0/8"}], "UserIdGroupPairs": []},
+        ]}])
+    assert index.loaded("sg-web")
+    assert not index.loaded("sg-lb")
+    assert index.has_access("sg-web", 443, source_cidrs=["8.8.8.8/32"])
+    assert not index.has_access("sg-web", 80, source_cidrs=["8.8.8.8/32"])
+    assert index.has_access("sg-web", 80, source_group_id="sg-lb")
+    assert not index.has_access("sg-web", 443, source_group_id="sg-lb")
+    assert not index.has_access("sg-web", 22, source_cidrs=["10.0.0.1/32"])
+
+    index.add_permissions("sg-web", [{"IpProtocol": "tcp", "FromPort": 22, "ToPort": 22,
+                                      "IpRanges": [{"CidrIp": "10.0.0.0/8"}]}])
+    assert index.has_access("sg-web", 22, source_cidrs=["10.1.0.0/16"])
+    index.remove_permissions("sg-web", [{"IpProtocol": "tcp", "FromPort": 80, "ToPort": 80,
+                                         "UserIdGroupPairs": [{"GroupId": "sg-lb"}]}])
+    assert not index.has_access("sg-web", 80, source_group_id="sg-lb")
+
+    # Loading a group again replaces what was there.
+    index.load([{"GroupId": "sg-web", "IpPermissions": []}])
+    assert not index.has_access("sg-web", 443, source_cidrs=["0.0.0.0/0"])
+    assert not index.has_access("sg-web", 22, source_cidrs=["10.1.0.0/16"])
+
+
+def test_access_index_scaling(monkeypatch):
+    """
+    Test that loading security groups takes time linear in their number, and that each group's
+    CIDR blocks are only sorted once per load.
+    """
+    def security_groups(count):
+        return [{"GroupId": "sg-%s" % num, "IpPermissions": [
+            {"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443,
+             "IpRanges": [{"CidrIp": "10.%s.%s.0/24" % (block, num % 256)}
+                          for block in range(10)]},
+            {"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443,
+             "IpRanges": [{"CidrIp": "192.168.%s.0/24" % (num % 256)}]}]}
+                for num in range(count)]
+
+    def load_seconds(count):
+        groups = security_groups(count)
+        best = None
+        for _ in range(3):
+            index = AccessIndex()
+            start = time.perf_counter()
+            index.load(groups)
+            index.load(groups)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        return best
+
+    # Eight times the groups would take 64 times as long if loading were quadratic.
+    assert load_seconds(4000) < load_seconds(500) * 24
+
+    rebuilds = []
+    rebuild = CidrIntervals._rebuild  # pylint: disable=protected-access
+
+    def counting_rebuild(intervals):
+        rebuilds.append(intervals)
+        rebuild(intervals)
+    monkeypatch.setattr(CidrIntervals, "_rebuild", counting_rebuild)
+    AccessIndex().load(security_groups(1))
+    assert len(rebuilds) == 1
@@ -0,0 +1,93 @@
+"""
+Tests for the asyncio client.
+"""
+import asyncio
+import io
+import os
+import threading
+import pytest
+import butter.aio
+from butter.types.networking import CidrBlock
+from butter.util import cancellation
+from butter.util.exceptions import OperationCancelled
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+def run(coroutine):
+    """
+    Run "coroutine" in a new event loop.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_aio_client():
+    """
+    Test driving many operations at once through the asyncio client.
+    """
+    async def scenario():
+        async with butter.aio.Client("memory", {"account": "test_aio_client"},
+                                     max_workers=4) as client:
+            network = await client.network.create("network", blueprint=None)
+            services = await asyncio.gather(*[
+                client.service.create(network, "service-%s" % num, AWS_SERVICE_BLUEPRINT)
+                for num in range(20)])
+            assert sorted(service.name for service in await client.service.list()) == sorted(
+                service.name for service in services)
+            await client.paths.add(services[0], services[1], 80)
+            await client.paths.add(CidrBlock("0.0.0.0/0"), services[0], 443)
+            assert await client.paths.has_access(services[0], services[1], 80)
+            assert await client.paths.internet_accessible(services[0], 443)
+            assert "service-1" in await client.graph()
+            output = io.StringIO()
+            await client.graph(output, "json")
+            assert "service-1" in output.getvalue()
+            assert len(await client.paths.list(services[:2])) == 2
+            assert not await client.paths.list(services[1:])
+            ready = await client.service.wait(network, "service-0", count=1, interval=0.01)
+            assert client.service.get_instances(ready)
+            assert client.stats()["operations"]["service.create"]["count"] == 20
+            # Creates only start the instances in the pool, and wait for them with "service.get".
+            assert client.stats()["operations"]["service.get"]["count"] >= 20
+            await asyncio.gather(*[client.service.destroy(service) for service in services])
+            await client.network.destroy(network)
+            assert not await client.network.list()
+    run(scenario())
+
+
+def test_aio_cancellation():
+    """
+    Test that cancelling a task stops the operation it was waiting on at its next wait.
+    """
+    started = threading.Event()
+    outcome = []
+
+    def slow_operation():
+        started.set()
+        try:
+            for _ in range(100):
+                cancellation.sleep(0.1)
+        except OperationCancelled:
+            outcome.append("cancelled")
+            raise
+        outcome.append("finished")
+
+    async def scenario():
+        client = butter.aio.Client("memory", {"account": "test_aio_cancellation"})
+        task = asyncio.ensure_future(client.run(slow_operation))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        client.close()
+    run(scenario())
+    assert outcome == ["cancelled"]
@@ -0,0 +1,29 @@
+"""
+Make sure the benchmarks keep working.
+"""
+import json
+import os
+import subprocess
+import sys
+
+SCALE_BENCHMARK = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "scale.py")
+
+
+def test_scale_benchmark():
+    """
+    Run the scale benchmark on a tiny environment and check the results make sense.
+    """
+    output = subprocess.check_output([sys.executable, SCALE_BENCHMARK, "--config", "2,3,4",
+                                      "--repeat", "1", "--samples", "5"])
+    results = json.loads(output.decode("utf-8"))
+    assert results["provider"] == "memory"
+    assert len(results["runs"]) == 1
+    run = results["runs"][0]
+    assert run["seed"]["services"] == 6
+    assert run["seed"]["paths"] == 10
+    operations = {result["operation"]: result for result in run["results"]}
+    assert sorted(operations) == sorted(["network.list", "service.get", "service.list",
+                                         "paths.list", "paths.has_access",
+                                         "paths.internet_accessible", "graph"])
+    assert operations["service.get"]["calls"] == 5
+    assert operations["network.list"]["provider_calls"]["total"] >= 1
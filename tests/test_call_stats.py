@@ -0,0 +1,77 @@
+"""
+Tests for provider call accounting.
+"""
+import pytest
+import butter
+from butter.util.call_stats import CallRecorder, UNATTRIBUTED
+
+
+def test_call_recorder():
+    """
+    Test that calls are counted and attributed to the outermost operation.
+    """
+    recorder = CallRecorder()
+    recorder.record_call("describe", 0.002)
+    with recorder.operation("graph"):
+        with recorder.operation("service.list"):
+            recorder.record_call("describe", 0.02, retries=2)
+        recorder.record_call("describe", 2.0, error_code="Throttling")
+
+    stats = recorder.snapshot()
+    assert stats["calls"]["describe"]["count"] == 3
+    assert stats["calls"]["describe"]["retries"] == 2
+    assert stats["calls"]["describe"]["errors"] == {"Throttling": 1}
+    assert stats["calls"]["describe"]["max_time"] == 2.0
+    assert stats["calls"]["describe"]["histogram"]["le_0.005"] == 1
+    assert stats["calls"]["describe"]["histogram"]["le_0.05"] == 1
+    assert stats["calls"]["describe"]["histogram"]["le_5.0"] == 1
+    assert sorted(stats["operations"]) == sorted(["graph", UNATTRIBUTED])
+    assert stats["operations"]["graph"]["count"] == 1
+    assert stats["operations"]["graph"]["calls"]["describe"]["count"] == 2
+    assert stats["operations"][UNATTRIBUTED]["calls"]["describe"]["count"] == 1
+
+    # Snapshots don't change, and reset starts over.
+    assert recorder.snapshot(reset=True) == stats
+    assert recorder.snapshot() == {"calls": {}, "operations": {}}
+
+
+def test_instrumented_driver_errors():
+    """
+    Test that calls through an instrumented driver are recorded, including failures.
+    """
+    class Driver:
+        # pylint: disable=missing-docstring,no-self-use
+        def works(self):
+            return "result"
+
+        def fails(self):
+            raise KeyError("nope")
+
+    recorder = CallRecorder()
+    driver = recorder.instrument(Driver(), "test.")
+    assert driver.works() == "result"
+    with pytest.raises(KeyError):
+        driver.fails()
+    stats = recorder.snapshot()
+    assert stats["calls"]["test.works"]["count"] == 1
+    assert stats["calls"]["test.fails"]["errors"] == {"KeyError": 1}
+
+
+def test_client_stats():
+    """
+    Test that the client records provider calls for each operation.
+    """
+    client = butter.Client("memory", {"account": "test_client_stats"})
+    network = client.network.create("network", blueprint=None)
+    client.stats(reset=True)
+    client.network.get("network")
+    client.network.get("network")
+    client.graph()
+    stats = client.stats()
+    assert stats["operations"]["network.get"]["count"] == 2
+    assert list(stats["operations"]["network.get"]["calls"]) == ["memory.describe_networks"]
+    assert stats["operations"]["network.get"]["calls"]["memory.describe_networks"]["count"] == 2
+    # Everything graph does is attributed to graph, not the list operations it calls.
+    assert "paths.list" not in stats["operations"]
+    assert stats["operations"]["graph"]["calls"]["memory.describe_ingress"]["count"] == 1
+    client.network.destroy(network)
@@ -0,0 +1,92 @@
+"""
+Tests for the compact snapshot types.
+"""
+import io
+import os
+import tracemalloc
+import attr
+import pytest
+import butter
+from butter.types.common import Instance, Network, Service, Snapshot, Subnetwork
+from butter.types.compact import compact_snapshot
+from butter.types.networking import CidrBlock
+from butter.util.graph_export import export_graph
+from butter.util.reachability import Reachability
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+def test_compact_snapshot():
+    """
+    Test that a compact snapshot shares one object per network and service, that those are usable
+    as dict keys, and that it works with the graph and reachability helpers.
+    """
+    client = butter.Client("memory", {"account": "test_compact_snapshot"})
+    network = client.network.create("net", blueprint=None)
+    web = client.service.create(network, "web", AWS_SERVICE_BLUEPRINT, count=2)
+    database = client.service.create(network, "db", AWS_SERVICE_BLUEPRINT)
+    client.paths.add(web, database, 5432)
+    client.paths.add(CidrBlock("0.0.0.0/0"), web, 443)
+    client.paths.add(CidrBlock("0.0.0.0/0"), database, 443)
+
+    snapshot = client.snapshot()
+    compact = client.snapshot(compact=True)
+    assert compact_snapshot(snapshot).services[0] is not compact.services[0]
+    net, = compact.networks
+    assert all(service.network is net for service in compact.services)
+    assert all(path.network is net for path in compact.paths)
+    compact_web, compact_database = compact.services
+    assert {path.destination for path in compact.paths} == {compact_web, compact_database}
+    assert compact_web != compact_database
+    internet_sources = {path.source for path in compact.paths if not path.source.name}
+    assert len(internet_sources) == 1
+    assert {path.source: path for path in compact.paths}[compact_web].port == 5432
+    with pytest.raises(attr.exceptions.FrozenInstanceError):
+        compact_web.name = "other"
+    assert not hasattr(compact_web, "__dict__")
+
+    def graph(graph_snapshot):
+        output = io.StringIO()
+        export_graph(graph_snapshot, output, "json")
+        return output.getvalue()
+    assert graph(compact) == graph(snapshot)
+    reachability = Reachability.from_snapshot(compact)
+    assert reachability.reachable_from_internet(port=443) == {"web (net)": 1, "db (net)": 1}
+    assert reachability.shortest_path(compact_web, compact_database) == ["web (net)", "db (net)"]
+
+
+def test_compact_snapshot_memory():
+    """
+    Test that a large compact snapshot takes several times less memory than the regular one.
+    """
+    def build():
+        networks = [Network("net-%s" % num, "vpc-%s" % num, "10.%s.0.0/16" % num, "us-east-1")
+                    for num in range(5)]
+        services = [
+            Service(Network(network.name, network.network_id, network.cidr_block, network.region),
+                    "service-%s" % num,
+                    [Subnetwork("subnet-%s-%s" % (num, zone), "service-%s" % num,
+                                "10.0.%s.0/24" % zone, "us-east-1", "us-east-1" + zone,
+                                [Instance("i-%s-%s-%s" % (num, zone, instance), None,
+                                          "10.0.0.%s" % instance, "running")
+                                 for instance in range(10)])
+                     for zone in "abc"])
+            for network in networks for num in range(40)]
+        return Snapshot(networks=networks, services=services, paths=[])
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        snapshot = build()
+        regular = tracemalloc.get_traced_memory()[0] - before
+        before = tracemalloc.get_traced_memory()[0]
+        compact = compact_snapshot(snapshot)
+        compact_size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert len(compact.services) == 200
+    assert compact_size * 2 < regular
@@ -0,0 +1,111 @@
+"""
+Tests for declaratively applying whole environments.
+"""
+import copy
+import os
+import pytest
+import butter
+from butter.util.exceptions import BlueprintException
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+SPEC = {
+    "network": {"name": "env"},
+    "services": {
+        "web": {"blueprint": AWS_SERVICE_BLUEPRINT, "count": 3},
+        "app": {"blueprint": AWS_SERVICE_BLUEPRINT},
+        "db": {"blueprint": AWS_SERVICE_BLUEPRINT},
+        },
+    "paths": [
+        {"source": "internet", "destination": "web", "port": 443},
+        {"source": "web", "destination": "app", "port": 80},
+        {"source": "app", "destination": "db", "port": 5432},
+        ],
+    }
+
+
+def test_apply():
+    """
+    Test that apply only makes the changes needed to match the spec.
+    """
+    client = butter.Client("memory", {"account": "test_apply"})
+    plan = client.apply(SPEC)
+    assert plan["network"]["create"]
+    assert plan["create"] == ["app", "db", "web"]
+    assert len(client.paths.list()) == 3
+    network = client.network.get("env")
+    web = client.service.get(network, "web")
+    assert len(client.service.get_instances(web)) == 3
+
+    # Nothing to do the second time.
+    client.stats(reset=True)
+    plan = client.apply(SPEC)
+    assert plan == {"network": {"name": "env", "create": False}, "destroy": [], "create": [],
+                    "paths": {}}
+    assert "service.create" not in client.stats()["operations"]
+
+    # Scale one service, drop another, and change the paths.
+    spec = copy.deepcopy(SPEC)
+    spec["services"]["web"]["count"] = 6
+    del spec["services"]["db"]
+    spec["paths"] = [
+        {"source": "internet", "destination": "web", "port": 443},
+        {"source": "web", "destination": "app", "port": 8080},
+        ]
+    dry_run = client.apply(spec, dry_run=True)
+    assert client.service.get(network, "db")
+    plan = client.apply(spec)
+    assert plan == dry_run
+    assert plan["destroy"] == ["db", "web"]
+    assert plan["create"] == ["web"]
+    assert sorted(plan["paths"]) == ["app (env)", "web (env)"]
+    assert not client.service.get(network, "db")
+    assert len(client.service.get_instances(client.service.get(network, "web"))) == 6
+    web = client.service.get(network, "web")
+    app = client.service.get(network, "app")
+    assert client.paths.has_access(web, app, 8080)
+    assert not client.paths.has_access(web, app, 80)
+    assert client.paths.internet_accessible(web, 443)
+
+    # Forcing a redeploy.
+    assert client.apply(spec, replace=["app"], dry_run=True)["create"] == ["app"]
+
+
+def test_apply_bad_spec():
+    """
+    Test that paths must be between things in the spec.
+    """
+    client = butter.Client("memory", {"account": "test_apply_bad_spec"})
+    spec = copy.deepcopy(SPEC)
+    spec["paths"].append({"source": "web", "destination": "cache", "port": 6379})
+    with pytest.raises(BlueprintException):
+        client.apply(spec)
+    spec["paths"][-1] = {"source": "cache", "destination": "web", "port": 6379}
+    with pytest.raises(BlueprintException):
+        client.apply(spec)
+    assert not client.network.list()
+
+
+def test_apply_cross_network_paths():
+    """
+    Test that paths from services in other networks, which a spec can't name, are left alone.
+    """
+    client = butter.Client("memory", {"account": "test_apply_cross_network_paths"})
+    client.apply(SPEC)
+    network = client.network.get("env")
+    other = client.network.create("other", blueprint=None)
+    api = client.service.create(other, "api", AWS_SERVICE_BLUEPRINT)
+    web = client.service.get(network, "web")
+    # Security groups can refer to each other across networks, even though paths.add won't do it.
+    client.driver.authorize_ingress(
+        client.driver.get_security_group(network.network_id, "web"), 8443,
+        [client.driver.get_security_group(other.network_id, "api")])
+    assert len(client.paths.list()) == 4
+
+    plan = client.apply(SPEC)
+    assert plan["paths"] == {}
+    assert [path.source for path in client.paths.list([api, web]) if path.port == 8443] == [api]
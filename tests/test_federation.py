@@ -0,0 +1,47 @@
+"""
+Tests for taking inventory of many accounts at once.
+"""
+import os
+import butter
+from butter.federation import FederatedClient
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+def test_federation():
+    """
+    Test that every account's inventory comes back, and that one broken account doesn't stop the
+    others.  The worker processes are forked, so they see the memory clouds built here.
+    """
+    accounts = {}
+    for name in ["a", "b", "c"]:
+        credentials = {"account": "test_federation_%s" % name}
+        client = butter.Client("memory", credentials)
+        network = client.network.create("net-%s" % name, blueprint=None)
+        web = client.service.create(network, "web", AWS_SERVICE_BLUEPRINT, count=2)
+        client.paths.add(butter.paths.CidrBlock("0.0.0.0/0"), web, 443)
+        accounts[name] = {"provider": "memory", "credentials": credentials}
+    accounts["broken"] = {"provider": "no-such-provider", "credentials": {}}
+
+    federation = FederatedClient(accounts, max_workers=2)
+    assert sorted(account.account for account in federation.iter_inventory()) == [
+        "a", "b", "broken", "c"]
+
+    inventory = federation.inventory()
+    assert list(inventory.accounts) == ["a", "b", "c", "broken"]
+    assert list(inventory.errors) == ["broken"]
+    assert "no-such-provider" in inventory.errors["broken"]
+    assert inventory.accounts["broken"].snapshot is None
+    for name in ["a", "b", "c"]:
+        account = inventory.accounts[name]
+        assert account.seconds > 0
+        assert account.stats["operations"]["snapshot"]["count"] == 1
+        assert [network.name for network in account.snapshot.networks] == ["net-%s" % name]
+    snapshot = inventory.snapshot
+    assert [network.name for network in snapshot.networks] == ["net-a", "net-b", "net-c"]
+    assert len(snapshot.services) == 3
+    assert len(snapshot.paths) == 3
@@ -0,0 +1,116 @@
+"""
+Tests for exporting the paths graph.
+"""
+import io
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+import pytest
+import butter
+from butter.types.networking import CidrBlock
+from butter.util.exceptions import DisallowedOperationException
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+GRAPHML = "{http://graphml.graphdrawing.org/xmlns}"
+
+
+@pytest.fixture(name="client", scope="module")
+def fixture_client():
+    """
+    Client with a small environment to graph.
+    """
+    graph_client = butter.Client("memory", {"account": "test_graph_export"})
+    network = graph_client.network.create("net", blueprint=None)
+    graph_client.network.create("empty", blueprint=None)
+    web = graph_client.service.create(network, "web", AWS_SERVICE_BLUEPRINT)
+    database = graph_client.service.create(network, "db", AWS_SERVICE_BLUEPRINT)
+    graph_client.service.create(network, "lonely", AWS_SERVICE_BLUEPRINT)
+    graph_client.paths.add(web, database, 5432)
+    graph_client.paths.add(CidrBlock("0.0.0.0/0"), web, 443)
+    return graph_client
+
+
+def test_graph_dot(client):
+    """
+    Test the dot output, and that it only lists everything once.
+    """
+    client.stats(reset=True)
+    graph = client.graph()
+    assert graph.startswith("digraph services {")
+    assert '"web (net)" -> "db (net)" [ label="(tcp:5432)" ];' in graph
+    assert '"0.0.0.0/0 (external)" -> "web (net)" [ label="(tcp:443)" ];' in graph
+    assert '"lonely (net)";' in graph
+    assert '"Empty Network (empty)";' in graph
+    assert client.stats()["operations"]["graph"]["calls"]["memory.describe_services"]["count"] == 1
+
+    output = io.StringIO()
+    assert client.graph(output) is None
+    assert output.getvalue() == graph
+
+
+def test_graph_json(client):
+    """
+    Test the JSON adjacency output.
+    """
+    graph = json.loads(client.graph(fmt="json"))
+    node_ids = [node["id"] for node in graph["nodes"]]
+    assert sorted(node_ids) == sorted(["web (net)", "db (net)", "lonely (net)",
+                                       "0.0.0.0/0 (external)"])
+    assert len(graph["adjacency"]) == len(node_ids)
+    adjacency = dict(zip(node_ids, graph["adjacency"]))
+    assert [edge["id"] for edge in adjacency["web (net)"]] == ["db (net)"]
+    assert adjacency["web (net)"][0]["port"] == 5432
+    assert [edge["id"] for edge in adjacency["0.0.0.0/0 (external)"]] == ["web (net)"]
+    assert graph["nodes"][node_ids.index("0.0.0.0/0 (external)")]["kind"] == "cidr"
+    assert graph["graph"]["networks"] == ["net", "empty"]
+
+
+def test_graph_graphml(client):
+    """
+    Test the GraphML output.
+    """
+    root = ElementTree.fromstring(client.graph(fmt="graphml"))
+    graph = root.find(GRAPHML + "graph")
+    assert len(graph.findall(GRAPHML + "node")) == 4
+    edges = {(edge.get("source"), edge.get("target")) for edge in graph.findall(GRAPHML + "edge")}
+    assert edges == {("web (net)", "db (net)"), ("0.0.0.0/0 (external)", "web (net)")}
+
+
+def test_graph_unknown_format(client):
+    """
+    Test that unknown formats fail before doing anything.
+    """
+    client.stats(reset=True)
+    with pytest.raises(DisallowedOperationException):
+        client.graph(fmt="png")
+    assert not client.stats()["operations"]["graph"]["calls"]
+
+
+def test_graph_regions():
+    """
+    Test that same-named networks in different regions stay apart, in the graph and reachability.
+    """
+    regions_client = butter.Client("memory", {"account": "test_graph_regions"},
+                                   regions=["memory-1", "memory-2"])
+    for region in ["memory-1", "memory-2"]:
+        network = regions_client.network.create("dev", blueprint=None, region=region)
+        web = regions_client.service.create(network, "web", AWS_SERVICE_BLUEPRINT)
+        regions_client.service.create(network, "db", AWS_SERVICE_BLUEPRINT)
+    regions_client.paths.add(CidrBlock("0.0.0.0/0"), web, 443)
+
+    graph = json.loads(regions_client.graph(fmt="json"))
+    assert sorted(node["id"] for node in graph["nodes"]) == sorted([
+        "web (dev, memory-1)", "db (dev, memory-1)", "web (dev, memory-2)", "db (dev, memory-2)",
+        "0.0.0.0/0 (external)"])
+    assert graph["graph"]["networks"] == ["dev, memory-1", "dev, memory-2"]
+    dot = regions_client.graph()
+    assert 'label = "dev, memory-1";' in dot and 'label = "dev, memory-2";' in dot
+    assert '"0.0.0.0/0 (external)" -> "web (dev, memory-2)" [ label="(tcp:443)" ];' in dot
+
+    reachability = regions_client.reachability()
+    assert reachability.reachable_from_internet(port=443) == {"web (dev, memory-2)": 1}
+    assert reachability.services["web (dev, memory-1)"].network.region == "memory-1"
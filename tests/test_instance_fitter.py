@@ -21,13 +21,19 @@ def run_instance_fitter_test(provider, credentials):
     client = butter.Client(provider, credentials)
 
     # If no memory, cpu, or storage is passed in, find the cheapest.
-    if provider == "aws":
+    if provider in ["aws", "memory"]:
         assert get_fitting_instance(client.service, SMALL_INSTANCE_BLUEPRINT) == "t2.small"
         assert get_fitting_instance(client.service, LARGE_INSTANCE_BLUEPRINT) == "m4.xlarge"
     if provider == "gce":
         assert get_fitting_instance(client.service, SMALL_INSTANCE_BLUEPRINT) == "n1-highcpu-4"
         assert get_fitting_instance(client.service, LARGE_INSTANCE_BLUEPRINT) == "n1-highmem-4"
 
+def test_instance_fitter_memory():
+    """
+    Test instance fitter with the in memory provider.
+    """
+    run_instance_fitter_test(provider="memory", credentials={})
+
 @pytest.mark.aws
 def test_instance_fitter_aws():
     """
@@ -0,0 +1,103 @@
+"""
+Tests for the in memory provider.
+"""
+import os
+import pytest
+import butter
+from butter.types.networking import CidrBlock
+from butter.providers.memory.driver import CidrAllocator
+from butter.util.exceptions import DisallowedOperationException, NotEnoughIPSpaceException
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+def test_cidr_allocator():
+    """
+    Test that blocks don't overlap and get reused once they are freed.
+    """
+    allocator = CidrAllocator("10.0.0.0/22")
+    assert allocator.allocate(24, 2) == ["10.0.0.0/24", "10.0.1.0/24"]
+    assert allocator.allocate(23, 1) == ["10.0.2.0/23"]
+    with pytest.raises(NotEnoughIPSpaceException):
+        allocator.allocate(24, 1)
+    allocator.free("10.0.1.0/24")
+    assert allocator.allocate(25, 2) == ["10.0.1.0/25", "10.0.1.128/25"]
+
+
+def test_memory_accounts():
+    """
+    Test that clients with the same account share state, and clients with different accounts don't.
+    """
+    client = butter.Client("memory", {"account": "test_memory_accounts"})
+    same_account = butter.Client("memory", {"account": "test_memory_accounts"})
+    other_account = butter.Client("memory", {"account": "test_memory_accounts_other"})
+
+    network = client.network.create("network", blueprint=None)
+    service = client.service.create(network, "service", AWS_SERVICE_BLUEPRINT, {}, count=5)
+    assert same_account.network.get("network") == network
+    assert same_account.service.get(network, "service") == service
+    assert not other_account.network.get("network")
+
+    with pytest.raises(DisallowedOperationException):
+        client.network.destroy(network)
+    client.paths.add(service, service, 443)
+    assert client.paths.list()
+    client.paths.add(service, service, "80")
+    assert client.paths.has_access(service, service, "80")
+    assert client.paths.has_access(service, service, 80)
+    assert client.paths.has_access(CidrBlock("10.0.0.0/8"), service, "80") is False
+    client.service.destroy(service)
+    assert not client.paths.list()
+    client.network.destroy(network)
+    assert not same_account.network.list()
+
+
+def test_memory_regions():
+    """
+    Test that a client spanning several regions lists all of them, and works on each thing in the
+    region it's in.
+    """
+    credentials = {"account": "test_memory_regions"}
+    client = butter.Client("memory", credentials, regions=["memory-1", "memory-2"])
+    east = butter.Client("memory", dict(credentials, region="memory-1"))
+    west = butter.Client("memory", dict(credentials, region="memory-2"))
+
+    east_network = client.network.create("dev", blueprint=None)
+    west_network = client.network.create("dev", blueprint=None, region="memory-2")
+    assert east_network.region == "memory-1"
+    assert west_network.region == "memory-2"
+    assert east.network.list() == [east_network]
+    assert west.network.list() == [west_network]
+    assert client.network.list() == [east_network, west_network]
+    with pytest.raises(DisallowedOperationException):
+        client.network.create("dev", blueprint=None, region="memory-3")
+
+    east_web = client.service.create(east_network, "web", AWS_SERVICE_BLUEPRINT, {}, count=2)
+    west_web = client.service.create(west_network, "web", AWS_SERVICE_BLUEPRINT, {}, count=2)
+    west_db = client.service.create(west_network, "db", AWS_SERVICE_BLUEPRINT, {}, count=1)
+    assert west_web.subnetworks[0].region == "memory-2"
+    assert [service.name for service in west.service.list()] == ["web", "db"]
+    assert len(client.service.list()) == 3
+
+    internet = butter.paths.CidrBlock("0.0.0.0/0")
+    client.paths.add_many([(internet, east_web, 443), (internet, west_web, 443),
+                           (west_web, west_db, 5432)])
+    assert len(east.paths.list()) == 1
+    assert len(west.paths.list()) == 2
+    assert len(client.paths.list()) == 3
+    assert client.paths.has_access(west_web, west_db, 5432)
+    with pytest.raises(DisallowedOperationException):
+        client.paths.has_access(east_web, west_db, 5432)
+    assert client.paths.internet_accessible(east_web, 443)
+    assert client.snapshot().paths == client.paths.list()
+    assert "db (dev, memory-2)" in client.graph()
+
+    for service in [east_web, west_web, west_db]:
+        client.service.destroy(service)
+    for network in [east_network, west_network]:
+        client.network.destroy(network)
+    assert not client.network.list()
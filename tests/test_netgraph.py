@@ -1,6 +1,7 @@
 """
 Test conversions between different firewall representations.
 """
+from butter.types.common import Network, Service, Subnetwork, Path
 from butter.util import netgraph
 
 NET = {
@@ -53,3 +54,61 @@ def test_firewalls_to_net():
     Test conversion from a list based to a graph based format.
     """
     assert NET == netgraph.firewalls_to_net(FIREWALLS)
+
+
+def test_plan_firewall_changes():
+    """
+    Test that the plan only has the differences, grouped by target.
+    """
+    desired = {
+        "0": {"1": [{"protocol": "tcp", "port": 443}, {"protocol": "tcp", "port": 80}]},
+        "external": {"1": [{"protocol": "tcp", "port": 443}]},
+        "2": {"0": [{"protocol": "tcp", "port": 22}]},
+        }
+    plan = netgraph.plan_firewall_changes(desired, NET)
+    assert plan == {
+        "0": {
+            "add": [{"source": "2", "protocol": "tcp", "port": 22, "type": "ingress"}],
+            "revoke": [],
+            },
+        "1": {
+            "add": [{"source": "0", "protocol": "tcp", "port": 80, "type": "ingress"}],
+            "revoke": [],
+            },
+        }
+    assert netgraph.plan_firewall_changes(NET, NET) == {}
+    assert netgraph.plan_firewall_changes({}, NET) == {
+        "1": {
+            "add": [],
+            "revoke": [
+                {"source": "0", "protocol": "tcp", "port": 443, "type": "ingress"},
+                {"source": "external", "protocol": "tcp", "port": 443, "type": "ingress"},
+                ],
+            },
+        }
+
+
+def test_paths_to_net():
+    """
+    Test that paths from "paths.list()" plan against the graph they came from as no changes.
+    """
+    network = Network(name="dev", network_id="net-1")
+    web = Service(network=network, name="web", subnetworks=[])
+    database = Service(network=network, name="db", subnetworks=[])
+    internet = Service(network=None, name=None, subnetworks=[
+        Subnetwork(subnetwork_id=None, name=None, cidr_block="0.0.0.0/0", region=None,
+                   availability_zone=None, instances=[])])
+    paths = [Path(network, web, database, "tcp", 5432), Path(network, internet, web, "tcp", 443)]
+    net = netgraph.paths_to_net(paths)
+    assert net == {
+        "web (dev)": {"db (dev)": [{"protocol": "tcp", "port": 5432}]},
+        "0.0.0.0/0 (external)": {"web (dev)": [{"protocol": "tcp", "port": 443}]},
+        }
+    desired = {"web (dev)": {"db (dev)": [{"protocol": "tcp", "port": "5432"}]}}
+    assert netgraph.plan_firewall_changes(desired, net) == {
+        "web (dev)": {
+            "add": [],
+            "revoke": [{"source": "0.0.0.0/0 (external)", "protocol": "tcp", "port": 443,
+                        "type": "ingress"}],
+            },
+        }
@@ -57,6 +57,13 @@ def test_network_mock():
     run_network_test(provider="mock-aws", credentials={})
 
 
+def test_network_memory():
+    """
+    Run tests using the in memory provider.
+    """
+    run_network_test(provider="memory", credentials={})
+
+
 @pytest.mark.aws
 def test_network_aws():
     """
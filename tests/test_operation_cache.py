@@ -0,0 +1,31 @@
+"""
+Test the operation scoped cache used to avoid repeated provider calls.
+"""
+from butter.util.operation_cache import OperationCache
+
+
+def test_operation_cache():
+    """
+    Test that values are only cached inside an operation, and cleared when the outermost operation
+    exits.
+    """
+    calls = []
+
+    def loader():
+        calls.append(True)
+        return len(calls)
+
+    cache = OperationCache()
+    assert cache.get("key", loader) == 1
+    assert cache.get("key", loader) == 2
+    assert not cache.peek("key")
+    with cache.operation():
+        assert cache.get("key", loader) == 3
+        with cache.operation():
+            assert cache.get("key", loader) == 3
+        assert cache.peek("key") == 3
+        cache.invalidate("key")
+        assert cache.get("key", loader) == 4
+    assert not cache.active()
+    with cache.operation():
+        assert cache.get("key", loader) == 5
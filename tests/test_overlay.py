@@ -0,0 +1,56 @@
+"""
+Tests for the read your writes overlay of AWS resources.
+"""
+import pytest
+from moto import mock_ec2
+import butter
+from butter.providers.aws.overlay import ResourceOverlay
+from butter.providers.aws.schemas import get_name, get_tag, name_tags
+
+
+def test_overlay():
+    """
+    Test that recorded resources are merged into describe results until AWS catches up.
+    """
+    overlay = ResourceOverlay()
+    overlay.record("vpc", "vpc-1", {"VpcId": "vpc-1", "Tags": name_tags("dev")})
+    overlay.record("vpc", "vpc-2", {"VpcId": "vpc-2", "Tags": name_tags("prod")})
+    overlay.record("subnet", "subnet-1", {"SubnetId": "subnet-1", "VpcId": "vpc-1"})
+
+    # Not described yet, so it comes from the overlay.
+    vpcs = overlay.merge("vpc", "VpcId", [], lambda vpc: get_name(vpc) == "dev")
+    assert vpcs == [{"VpcId": "vpc-1", "Tags": name_tags("dev")}]
+    assert len(overlay.merge("vpc", "VpcId", [])) == 2
+
+    # Described without its tags, so they're added.
+    vpcs = overlay.merge("vpc", "VpcId", [{"VpcId": "vpc-1", "Tags": []}],
+                         lambda vpc: get_name(vpc) == "dev")
+    assert vpcs == [{"VpcId": "vpc-1", "Tags": name_tags("dev")}]
+
+    # Described with its tags, so AWS has caught up and the overlay lets it go.
+    described = [{"VpcId": "vpc-1", "Tags": name_tags("dev")}]
+    assert overlay.merge("vpc", "VpcId", described) == described + [
+        {"VpcId": "vpc-2", "Tags": name_tags("prod")}]
+    assert overlay.merge("vpc", "VpcId", [], lambda vpc: get_name(vpc) == "dev") == []
+
+    overlay.forget("vpc-2")
+    assert overlay.merge("vpc", "VpcId", []) == []
+    assert overlay.merge("subnet", "SubnetId", []) == [{"SubnetId": "subnet-1", "VpcId": "vpc-1"}]
+    assert get_tag({"SubnetId": "subnet-1"}, "Name") is None
+
+
+@mock_ec2
+@pytest.mark.mock_aws
+def test_create_without_polling_mock():
+    """
+    Test that creating a network tags it as it's created rather than polling for the tag.
+    """
+    client = butter.Client("mock-aws", {})
+    client.stats(reset=True)
+    network = client.network.create("overlay-test", blueprint=None)
+    calls = client.stats()["operations"]["network.create"]["calls"]
+    assert "ec2.CreateTags" not in calls
+    assert calls["ec2.DescribeVpcs"]["count"] == 1
+    assert client.network.get("overlay-test") == network
+    client.network.destroy(network)
+    assert client.network.get("overlay-test") is None
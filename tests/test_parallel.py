@@ -0,0 +1,45 @@
+"""
+Tests for running parts of an operation in parallel.
+"""
+import threading
+import pytest
+from butter.util.call_stats import CallRecorder
+from butter.util.cancellation import CancelToken, cancel_scope, check
+from butter.util.exceptions import OperationCancelled
+from butter.util.parallel import run_parallel
+from butter.util.tracing import Tracer
+
+
+def test_run_parallel():
+    """
+    Test that functions run in other threads stay part of the caller's operation, span, and cancel
+    scope.
+    """
+    recorder = CallRecorder()
+    tracer = Tracer()
+    recorder.tracer = tracer
+    threads = set()
+
+    def call(number):
+        threads.add(threading.get_ident())
+        recorder.record_call("describe", 0.001)
+        return number
+
+    with recorder.operation("destroy"):
+        assert run_parallel([lambda number=number: call(number) for number in range(5)],
+                            recorder=recorder) == list(range(5))
+    assert threading.get_ident() not in threads
+    stats = recorder.snapshot()
+    assert list(stats["operations"]) == ["destroy"]
+    assert stats["operations"]["destroy"]["count"] == 1
+    assert stats["operations"]["destroy"]["calls"]["describe"]["count"] == 5
+    spans = tracer.to_dict()["spans"]
+    assert len(spans) == 1
+    assert len(spans[0]["children"]) == 5
+
+    token = CancelToken()
+    token.cancel()
+    with cancel_scope(token):
+        with pytest.raises(OperationCancelled):
+            run_parallel([check])
+    assert run_parallel([]) == []
@@ -6,6 +6,8 @@ import pytest
 import butter
 from butter.types.common import Path
 from butter.testutils.blueprint_tester import generate_unique_name
+from butter.providers.aws.impl.asg import ASG, SecurityGroupIndex
+from butter.util.exceptions import BadEnvironmentStateException
 
 EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
                                       "..",
@@ -33,7 +35,7 @@ def run_paths_test(provider, credentials):
 
     # Provision all the resources
     test_network = client.network.create(network_name, blueprint=NETWORK_BLUEPRINT)
-    if provider in ["aws", "mock-aws"]:
+    if provider in ["aws", "mock-aws", "memory"]:
         lb_service = client.service.create(test_network, "web-lb", AWS_SERVICE_BLUEPRINT, {})
         web_service = client.service.create(test_network, "web", AWS_SERVICE_BLUEPRINT, {})
     else:
@@ -62,6 +64,23 @@ def run_paths_test(provider, credentials):
     client.paths.remove(internet, lb_service, 80)
     assert not client.paths.internet_accessible(lb_service, 80)
 
+    # Batched changes, including one that's already there and one that's repeated.
+    client.paths.add(lb_service, web_service, 80)
+    results = client.paths.add_many([(lb_service, web_service, 80),
+                                     (lb_service, web_service, 443),
+                                     (lb_service, web_service, 443),
+                                     (internet, web_service, 443)])
+    assert results[0] is True
+    assert isinstance(results[1], Path)
+    assert client.paths.has_access(lb_service, web_service, 443)
+    assert client.paths.internet_accessible(web_service, 443)
+    client.paths.remove_many([(lb_service, web_service, 80),
+                              (lb_service, web_service, 443),
+                              (internet, web_service, 443)])
+    assert not client.paths.has_access(lb_service, web_service, 80)
+    assert not client.paths.has_access(lb_service, web_service, 443)
+    assert not client.paths.internet_accessible(web_service, 443)
+
     client.service.destroy(lb_service)
     client.service.destroy(web_service)
     client.network.destroy(test_network)
@@ -73,6 +92,125 @@ def test_paths_mock():
     """
     run_paths_test(provider="mock-aws", credentials={})
 
+@pytest.mark.mock_aws
+def test_paths_batched_mock():
+    """
+    Test that batched path changes make one firewall change per destination on AWS, and that
+    security groups are looked up in bulk.
+    """
+    client = butter.Client("mock-aws", {})
+    test_network = client.network.create(generate_unique_name("unittest"),
+                                         blueprint=NETWORK_BLUEPRINT)
+    lb_service = client.service.create(test_network, "web-lb", AWS_SERVICE_BLUEPRINT, {})
+    web_service = client.service.create(test_network, "web", AWS_SERVICE_BLUEPRINT, {})
+    internet = butter.paths.CidrBlock("0.0.0.0/0")
+    paths = [(lb_service, web_service, port) for port in [80, 443, 8080]] + [
+        (internet, lb_service, 443)]
+
+    client.stats(reset=True)
+    client.paths.add_many(paths)
+    calls = client.stats()["operations"]["paths.add_many"]["calls"]
+    assert calls["ec2.AuthorizeSecurityGroupIngress"]["count"] == 2
+    assert calls["ec2.DescribeSecurityGroups"]["count"] == 1
+    assert calls["autoscaling.DescribeLaunchConfigurations"]["count"] == 1
+    for source, destination, port in paths:
+        assert client.paths.has_access(source, destination, port)
+
+    # Listing looks up every service's security group with one call, however many there are.
+    client.stats(reset=True)
+    assert len(client.paths.list()) == 4
+    calls = client.stats()["operations"]["paths.list"]["calls"]
+    assert calls["autoscaling.DescribeLaunchConfigurations"]["count"] == 1
+
+    client.paths.remove_many(paths)
+    calls = client.stats()["operations"]["paths.remove_many"]["calls"]
+    assert calls["ec2.RevokeSecurityGroupIngress"]["count"] == 2
+    for source, destination, port in paths:
+        assert not client.paths.has_access(source, destination, port)
+
+    client.service.destroy(lb_service)
+    client.service.destroy(web_service)
+    client.network.destroy(test_network)
+
+
+def test_security_group_index():
+    """
+    Test that launch configurations in a bad state only fail lookups of their own services.
+    """
+    index = SecurityGroupIndex({("net", "web"): "sg-1", ("net", "db"): "sg-2",
+                                ("other", "a"): "sg-3", ("other", "b"): "sg-3"},
+                               {("other", "broken"): "Expected exactly one security group"})
+    assert index.security_group("net", "web") == "sg-1"
+    assert index.service("sg-2") == ("net", "db")
+    assert index.security_group("net", "missing") is None
+    with pytest.raises(BadEnvironmentStateException):
+        index.security_group("other", "broken")
+    with pytest.raises(BadEnvironmentStateException):
+        index.security_group("other", "a")
+    with pytest.raises(BadEnvironmentStateException):
+        index.service("sg-3")
+
+
+class LaunchConfigurations:
+    """
+    Stands in for the AWS driver, with one launch configuration for each of "names", and remembers
+    the "describe_launch_configurations" calls made.
+    """
+    def __init__(self, names):
+        self.names = names
+        self.calls = []
+
+    def client(self, _):
+        """
+        Returns the autoscaling client, which is this object too.
+        """
+        return self
+
+    def get_paginator(self, _):
+        """
+        Returns the "describe_launch_configurations" paginator, which is this object too.
+        """
+        return self
+
+    def paginate(self, LaunchConfigurationNames=None): # pylint: disable=invalid-name
+        """
+        Returns the pages of launch configurations named "LaunchConfigurationNames", or all of them.
+        """
+        self.calls.append(LaunchConfigurationNames)
+        names = LaunchConfigurationNames or self.names
+        return [{"LaunchConfigurations": [{"LaunchConfigurationName": name,
+                                           "SecurityGroups": ["sg-%s" % name]}
+                                          for name in names if name in self.names]}]
+
+
+def test_security_group_index_services():
+    """
+    Test that building the index for some services only describes their launch configurations, in
+    as few calls as the API allows.
+    """
+    driver = LaunchConfigurations(["net.web", "net.db"] + ["net.%s" % num for num in range(60)])
+    index = ASG(driver, {}).security_group_index([("net", "web"), ("net", "missing")])
+    assert driver.calls == [["net.web", "net.missing"]]
+    assert index.security_group("net", "web") == "sg-net.web"
+    assert index.security_group("net", "db") is None
+
+    driver.calls = []
+    index = ASG(driver, {}).security_group_index([("net", str(num)) for num in range(60)])
+    assert [len(names) for names in driver.calls] == [50, 10]
+    assert index.security_group("net", "59") == "sg-net.59"
+
+    driver.calls = []
+    index = ASG(driver, {}).security_group_index()
+    assert driver.calls == [None]
+    assert index.security_group("net", "db") == "sg-net.db"
+
+
+def test_paths_memory():
+    """
+    Run tests using the in memory provider.
+    """
+    run_paths_test(provider="memory", credentials={})
+
 @pytest.mark.aws
 def test_paths_aws():
     """
@@ -0,0 +1,47 @@
+"""
+Test the lazy provider registry.
+"""
+import json
+import subprocess
+import sys
+import types
+import pytest
+from butter.providers import get_provider, register_provider, list_providers
+
+# Importing butter must not pull in any provider libraries, and should stay well under this many
+# seconds.  Before providers were loaded lazily this was around two seconds.
+IMPORT_TIME_BUDGET = 0.5
+PROVIDER_LIBRARIES = ["boto3", "botocore", "moto", "libcloud"]
+
+IMPORT_TIME_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import butter
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def test_import_time_budget():
+    """
+    Test that "import butter" is fast and doesn't import any provider.
+    """
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_TIME_SCRIPT])
+    result = json.loads(output.decode("utf-8"))
+    for library in PROVIDER_LIBRARIES:
+        assert library not in result["modules"]
+    assert result["elapsed"] < IMPORT_TIME_BUDGET
+
+
+def test_register_provider():
+    """
+    Test that providers can be registered at runtime, and that unknown providers fail.
+    """
+    custom_provider = types.ModuleType("custom_provider")
+    register_provider("custom", custom_provider)
+    assert get_provider("custom") is custom_provider
+    assert "custom" in list_providers()
+    register_provider("custom-by-path", "butter.util.netgraph")
+    assert get_provider("custom-by-path") is sys.modules["butter.util.netgraph"]
+    with pytest.raises(NotImplementedError):
+        get_provider("does-not-exist")
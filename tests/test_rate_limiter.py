@@ -0,0 +1,124 @@
+"""
+Tests for the adaptive rate limiter and the AWS throttling retries.
+"""
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from butter.util.call_stats import CallRecorder
+from butter.util.rate_limiter import TokenBucket, RateLimiter
+import butter.providers.aws.driver
+from butter.providers.aws.driver import AwsDriver, THROTTLE_RETRIES
+
+THROTTLED = (b'<Response><Errors><Error><Code>RequestLimitExceeded</Code>'
+             b'<Message>Request limit exceeded.</Message></Error></Errors>'
+             b'<RequestID>1</RequestID></Response>')
+DESCRIBED = (b'<DescribeVpcsResponse xmlns="http://ec2.amazonaws.com/doc/2016-11-15/">'
+             b'<requestId>2</requestId><vpcSet/></DescribeVpcsResponse>')
+
+
+class FakeClock:
+    """
+    Clock that only moves when something sleeps.
+    """
+    # pylint: disable=missing-docstring
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket():
+    """
+    Test that the bucket allows bursts, then waits, and adapts its rate.
+    """
+    clock = FakeClock()
+    bucket = TokenBucket(10, 5, clock=clock.time, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+    assert bucket.acquire() == pytest.approx(0.1)
+    assert clock.now == pytest.approx(0.1)
+
+    bucket.throttled()
+    assert bucket.rate == 5
+    assert bucket.acquire() == pytest.approx(0.2)
+    for _ in range(10):
+        bucket.throttled()
+    assert bucket.rate == bucket.min_rate
+    for _ in range(1000):
+        bucket.succeeded()
+    assert bucket.rate == bucket.max_rate
+
+
+def test_rate_limiter_families():
+    """
+    Test that each family gets its own bucket with its own limits.
+    """
+    limiter = RateLimiter({"ec2.describe": (20, 100)}, default=(1, 1))
+    assert limiter.bucket("ec2.describe") is limiter.bucket("ec2.describe")
+    assert limiter.bucket("ec2.describe").capacity == 100
+    assert limiter.bucket("ec2.mutate").rate == 1
+    limiter.bucket("ec2.mutate").throttled()
+    assert limiter.rates() == {"ec2.describe": 20, "ec2.mutate": 0.5}
+
+
+class FakeRaw:
+    """
+    Raw HTTP body for a fake botocore response.
+    """
+    # pylint: disable=missing-docstring,too-few-public-methods
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        # pylint: disable=unused-argument
+        yield self.body
+
+
+def fake_ec2(throttles):
+    """
+    Returns an ec2 client from a rate limited driver, that gets throttled "throttles" times before
+    each call goes through, and the driver's recorder.
+    """
+    recorder = CallRecorder()
+    driver = AwsDriver(boto3.session.Session(aws_access_key_id="test", aws_secret_access_key="test",
+                                             region_name="us-east-1"), recorder)
+    ec2 = driver.client("ec2")
+    sent = []
+
+    def send(request, **kwargs):
+        # pylint: disable=unused-argument
+        sent.append(request)
+        if len(sent) <= throttles:
+            return AWSResponse(request.url, 503, {}, FakeRaw(THROTTLED))
+        return AWSResponse(request.url, 200, {}, FakeRaw(DESCRIBED))
+    ec2.meta.events.register("before-send", send)
+    return driver, ec2, recorder
+
+
+def test_aws_throttling_retries():
+    """
+    Test that throttled AWS calls are retried transparently, and slow down the family's bucket.
+    """
+    driver, ec2, recorder = fake_ec2(3)
+    assert ec2.describe_vpcs()["Vpcs"] == []
+    stats = recorder.snapshot()["calls"]["ec2.DescribeVpcs"]
+    assert stats["retries"] == 3
+    assert not stats["errors"]
+    assert driver.rate_limiter.rates()["ec2.describe"] < 20
+
+
+def test_aws_throttling_gives_up(monkeypatch):
+    """
+    Test that we still raise the throttling error if AWS never stops throttling.
+    """
+    monkeypatch.setattr(butter.providers.aws.driver, "backoff_delay", lambda attempt: 0)
+    driver, ec2, _ = fake_ec2(THROTTLE_RETRIES + 1)
+    # Don't actually wait for the bucket to slow down.
+    driver.rate_limiter.bucket("ec2.describe").min_rate = 1000
+    with pytest.raises(ClientError) as error:
+        ec2.describe_vpcs()
+    assert error.value.response["Error"]["Code"] == "RequestLimitExceeded"
@@ -0,0 +1,75 @@
+"""
+Tests for the multi hop reachability index.
+"""
+import os
+import butter
+from butter.types.networking import CidrBlock
+from butter.util.reachability import Reachability
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+def test_reachability():
+    """
+    Test multi hop queries, and keeping the index up to date as paths change.
+    """
+    client = butter.Client("memory", {"account": "test_reachability"})
+    network = client.network.create("net", blueprint=None)
+    web, app, database, lonely = [client.service.create(network, name, AWS_SERVICE_BLUEPRINT)
+                                  for name in ["web", "app", "db", "lonely"]]
+    client.paths.add(CidrBlock("0.0.0.0/0"), web, 443)
+    client.paths.add(CidrBlock("10.0.0.0/8"), app, 22)
+    client.paths.add(web, app, 443)
+    client.paths.add(app, database, 5432)
+
+    reachability = client.reachability()
+    assert "lonely (net)" in reachability.services
+    assert reachability.has_access(web, app, 443)
+    assert not reachability.has_access(web, database, 5432)
+    assert reachability.has_access(CidrBlock("1.2.3.4/32"), web, 443)
+
+    assert reachability.reachable_from_internet() == {
+        "web (net)": 1, "app (net)": 2, "db (net)": 3}
+    assert reachability.reachable_from_internet(max_hops=2) == {"web (net)": 1, "app (net)": 2}
+    assert reachability.reachable_from_internet(port=443) == {"web (net)": 1, "app (net)": 2}
+    # This overlaps with both CIDR blocks that have paths.
+    assert reachability.reachable(CidrBlock("10.1.0.0/16")) == {
+        "web (net)": 1, "app (net)": 1, "db (net)": 2}
+    assert reachability.sources_of(database) == {
+        "app (net)": 1, "web (net)": 2, "10.0.0.0/8 (external)": 2, "0.0.0.0/0 (external)": 3}
+    assert reachability.shortest_path(CidrBlock("8.8.8.8/32"), database) == [
+        "0.0.0.0/0 (external)", "web (net)", "app (net)", "db (net)"]
+    assert reachability.shortest_path(database, web) is None
+
+    client.paths.add(CidrBlock("0.0.0.0/0"), lonely, 80)
+    reachability.add(CidrBlock("0.0.0.0/0"), lonely, 80)
+    client.paths.remove(app, database, 5432)
+    reachability.remove(app, database, 5432)
+    assert reachability.reachable_from_internet() == {
+        "web (net)": 1, "app (net)": 2, "lonely (net)": 1}
+    assert sorted(reachability.paths()) == sorted(
+        Reachability.from_snapshot(client.snapshot()).paths())
+
+
+def test_reachability_string_ports():
+    """
+    Test that ports given as digit strings, like GCE lists them, match the same ports as numbers.
+    """
+    client = butter.Client("memory", {"account": "test_reachability_string_ports"})
+    network = client.network.create("net", blueprint=None)
+    web, database = [client.service.create(network, name, AWS_SERVICE_BLUEPRINT)
+                     for name in ["web", "db"]]
+    reachability = Reachability()
+    reachability.add(CidrBlock("0.0.0.0/0"), web, "80")
+    reachability.add(web, database, 5432)
+    assert reachability.has_access(CidrBlock("1.2.3.4/32"), web, 80)
+    assert reachability.has_access(web, database, "5432")
+    assert reachability.reachable_from_internet(port=80) == {"web (net)": 1}
+    assert reachability.reachable_from_internet(port=["80", "5432"]) == {
+        "web (net)": 1, "db (net)": 2}
+    reachability.remove(web, database, "5432")
+    assert not reachability.has_access(web, database, 5432)
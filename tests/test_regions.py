@@ -0,0 +1,51 @@
+"""
+Tests for spanning several regions with one client.
+"""
+from butter.providers.gce.driver import zone_region
+from butter.types.common import Network, Service, Subnetwork
+from butter.types.networking import CidrBlock
+from butter.util.regions import RegionalClients
+
+
+# pylint: disable=too-few-public-methods
+class RegionClient:
+    """
+    Stands in for a provider client, remembering its region.
+    """
+    def __init__(self, credentials, driver=None):
+        self.region = credentials.get("region")
+        self.driver = driver
+
+
+def service_in(network, region):
+    """
+    Returns a service in "network" with one subnetwork in "region".
+    """
+    return Service(network=network, name="web", subnetworks=[
+        Subnetwork(subnetwork_id="subnet", name="web", cidr_block="10.0.0.0/24", region=region,
+                   availability_zone=None, instances=[])])
+
+
+def test_regional_routing():
+    """
+    Test that services go to the region of their network, or if it's global, of their subnetworks.
+    """
+    regions = RegionalClients(RegionClient, {}, {"east": None, "west": None})
+    regional = Network(name="net", network_id="net-1", region="west")
+    global_network = Network(name="net", network_id="net-2", region=None)
+
+    assert regions.for_service(service_in(regional, "east")).region == "west"
+    assert regions.for_service(service_in(global_network, "west")).region == "west"
+    assert regions.for_service(service_in(global_network, "north")).region == "east"
+    assert regions.for_service(CidrBlock("0.0.0.0/0")).region == "east"
+    assert regions.spans_regions(global_network)
+    assert not regions.spans_regions(regional)
+    assert not RegionalClients(RegionClient, {}, {None: None}).spans_regions(global_network)
+
+
+def test_zone_region():
+    """
+    Test that zones only belong to their own region, not ones whose names start the same way.
+    """
+    assert zone_region("europe-west1-b") == "europe-west1"
+    assert zone_region("europe-west10-a") != "europe-west1"
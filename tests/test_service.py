@@ -37,7 +37,7 @@ def run_instances_test(provider, credentials):
 
     # Provision all the resources
     test_network = client.network.create(network_name, blueprint=NETWORK_BLUEPRINT)
-    if provider in ["aws", "mock-aws"]:
+    if provider in ["aws", "mock-aws", "memory"]:
         lb_service = client.service.create(test_network, "web-lb", AWS_SERVICE_BLUEPRINT, {})
         web_service = client.service.create(test_network, "web", AWS_SERVICE_BLUEPRINT, {}, count=6)
     else:
@@ -180,6 +180,75 @@ def test_instances_mock():
     """
     run_instances_test(provider="mock-aws", credentials={})
 
+@mock_ec2
+@mock_autoscaling
+@pytest.mark.mock_aws
+def test_route_tables_mock():
+    """
+    Test that creating a service uses the route tables it created rather than looking them up, that
+    destroying it describes the route tables once, and that the internet gateway is only deleted
+    once nothing routes through it.
+    """
+    client = butter.Client("mock-aws", {})
+    ec2 = boto3.client("ec2")
+    test_network = client.network.create(generate_unique_name("unittest"),
+                                         blueprint=NETWORK_BLUEPRINT)
+    client.stats(reset=True)
+    lb_service = client.service.create(test_network, "web-lb", AWS_SERVICE_BLUEPRINT, {})
+    calls = client.stats()["operations"]["service.create"]["calls"]
+    assert "ec2.DescribeRouteTables" not in calls
+    assert calls["ec2.CreateRoute"]["count"] == len(lb_service.subnetworks)
+    assert client.service.get(test_network, "web-lb") == lb_service
+    web_service = client.service.create(test_network, "web", AWS_SERVICE_BLUEPRINT, {})
+    igw_filter = [{"Name": "attachment.vpc-id", "Values": [test_network.network_id]}]
+    assert len(ec2.describe_internet_gateways(Filters=igw_filter)["InternetGateways"]) == 1
+
+    client.stats(reset=True)
+    client.service.destroy(lb_service)
+    calls = client.stats()["operations"]["service.destroy"]["calls"]
+    assert calls["ec2.DescribeRouteTables"]["count"] == 1
+    assert calls["ec2.DeleteRouteTable"]["count"] == len(lb_service.subnetworks)
+    assert calls["ec2.DeleteSubnet"]["count"] == len(lb_service.subnetworks)
+    assert len(ec2.describe_internet_gateways(Filters=igw_filter)["InternetGateways"]) == 1
+
+    client.service.destroy(web_service)
+    assert not ec2.describe_internet_gateways(Filters=igw_filter)["InternetGateways"]
+    client.network.destroy(test_network)
+
+@mock_ec2
+@mock_autoscaling
+@pytest.mark.mock_aws
+def test_subnetwork_list_mock():
+    """
+    Test that listing subnetworks on AWS makes the same two calls however many subnets there are.
+    """
+    client = butter.Client("mock-aws", {})
+    network_name = generate_unique_name("unittest")
+    test_network = client.network.create(network_name, blueprint=NETWORK_BLUEPRINT)
+    lb_service = client.service.create(test_network, "web-lb", AWS_SERVICE_BLUEPRINT, {})
+    web_service = client.service.create(test_network, "web", AWS_SERVICE_BLUEPRINT, {}, count=6)
+    subnetwork_client = butter.providers.aws.impl.subnetwork.SubnetworkClient(
+        client.driver, {}, mock=True)
+
+    client.stats(reset=True)
+    subnetworks = subnetwork_client.list()
+    calls = client.stats()["calls"]
+    assert sorted(calls) == ["ec2.DescribeSubnets", "ec2.DescribeVpcs"]
+    assert all(call["count"] == 1 for call in calls.values())
+    assert sorted(subnetwork.subnetwork_id for subnetwork in subnetworks[network_name]["web-lb"]) \
+        == sorted(subnetwork.subnetwork_id for subnetwork in lb_service.subnetworks)
+    assert len(subnetworks[network_name]["web"]) == len(web_service.subnetworks)
+
+    client.service.destroy(lb_service)
+    client.service.destroy(web_service)
+    client.network.destroy(test_network)
+
+def test_instances_memory():
+    """
+    Run tests using the in memory provider.
+    """
+    run_instances_test(provider="memory", credentials={})
+
 @pytest.mark.aws
 def test_instances_aws():
     """
@@ -0,0 +1,43 @@
+"""
+Tests for encoding and decoding snapshots.
+"""
+import os
+import pickle
+import pytest
+import butter
+from butter.types.networking import CidrBlock
+from butter.util.exceptions import DisallowedOperationException
+from butter.util.snapshot_codec import decode_snapshot, encode_snapshot
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+def test_snapshot_codec():
+    """
+    Test that a snapshot survives encoding, with its shared objects still shared, and that the
+    encoded form is smaller than the snapshot itself.
+    """
+    client = butter.Client("memory", {"account": "test_snapshot_codec"})
+    network = client.network.create("net", blueprint=None)
+    client.network.create("empty", blueprint=None)
+    web = client.service.create(network, "web", AWS_SERVICE_BLUEPRINT, count=3)
+    database = client.service.create(network, "db", AWS_SERVICE_BLUEPRINT, count=2)
+    client.paths.add(web, database, 5432)
+    client.paths.add(CidrBlock("0.0.0.0/0"), web, 443)
+    snapshot = client.snapshot()
+
+    data = encode_snapshot(snapshot)
+    assert len(pickle.dumps(data)) < len(pickle.dumps(snapshot))
+    decoded = decode_snapshot(pickle.loads(pickle.dumps(data)))
+    assert decoded == snapshot
+    for path in decoded.paths:
+        assert path.destination in decoded.services
+        assert any(path.destination is service for service in decoded.services)
+        assert path.destination.network is decoded.networks[0]
+
+    with pytest.raises(DisallowedOperationException):
+        decode_snapshot((0,) + tuple(data[1:]))
@@ -0,0 +1,142 @@
+"""
+Tests for saving snapshots to files and loading them back.
+"""
+import io
+import os
+import struct
+import attr
+import pytest
+import butter
+from butter.types.common import Instance, Network, Path, Service, Snapshot, Subnetwork
+from butter.types.networking import CidrBlock
+from butter.util.exceptions import DisallowedOperationException
+from butter.util.graph_export import export_graph
+from butter.util.reachability import Reachability
+from butter.util.snapshot_codec import encode_snapshot
+from butter.util.snapshot_file import load_snapshot, save_snapshot
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+def graph(snapshot):
+    """
+    Returns the JSON graph of "snapshot".
+    """
+    output = io.StringIO()
+    export_graph(snapshot, output, "json")
+    return output.getvalue()
+
+
+def test_snapshot_file(tmpdir):
+    """
+    Test that a saved snapshot loads back the same, with shared records, and works anywhere a
+    snapshot does.
+    """
+    client = butter.Client("memory", {"account": "test_snapshot_file"})
+    network = client.network.create("net", blueprint=None)
+    client.network.create("empty", blueprint=None)
+    web = client.service.create(network, "web", AWS_SERVICE_BLUEPRINT, count=3)
+    database = client.service.create(network, "db", AWS_SERVICE_BLUEPRINT, count=2)
+    client.paths.add(web, database, 5432)
+    client.paths.add(CidrBlock("0.0.0.0/0"), web, 443)
+    snapshot = client.snapshot()
+    path = str(tmpdir.join("inventory.snap"))
+    save_snapshot(snapshot, path)
+
+    with load_snapshot(path) as loaded:
+        assert len(loaded.networks) == 2
+        assert len(loaded.services) == 2
+        assert len(loaded.paths) == 2
+        assert {id(path.destination) for path in loaded.paths} == {
+            id(service) for service in loaded.services}
+        assert loaded.services[0].network is loaded.networks[0]
+        assert encode_snapshot(loaded) == encode_snapshot(snapshot)
+        assert encode_snapshot(loaded.compact()) == encode_snapshot(snapshot)
+        assert graph(loaded) == graph(snapshot)
+        assert Reachability.from_snapshot(loaded).reachable_from_internet() == {
+            "web (net)": 1, "db (net)": 2}
+        with pytest.raises(IndexError):
+            loaded.services[2] # pylint: disable=pointless-statement
+
+
+def test_snapshot_file_lazy(tmpdir):
+    """
+    Test that loading a large snapshot only decodes what gets used.
+    """
+    network = Network("net", "vpc-1", "10.0.0.0/16", "us-east-1")
+    services = [Service(network, "service-%s" % num,
+                        [Subnetwork("subnet-%s" % num, None, "10.0.0.0/24", "us-east-1",
+                                    "us-east-1a",
+                                    [Instance("i-%s-%s" % (num, instance), None,
+                                              "10.0.0.%s" % instance, "running")
+                                     for instance in range(100)])])
+                for num in range(200)]
+    path = str(tmpdir.join("large.snap"))
+    save_snapshot(Snapshot(networks=[network], services=services, paths=[]), path)
+    # Strings are only stored once.
+    assert os.path.getsize(path) < 20000 * 40
+
+    with load_snapshot(path) as loaded:
+        assert len(loaded.services) == 200
+        service = loaded.services[150]
+        assert service.name == "service-150"
+        assert [instance.instance_id for instance in service.subnetworks[0].instances][:2] == [
+            "i-150-0", "i-150-1"]
+        # pylint: disable=protected-access
+        assert sum(record is not None for record in loaded._instances._records) == 100
+
+
+def test_snapshot_file_errors(tmpdir):
+    """
+    Test that files that aren't snapshots, or are from another version, don't load.
+    """
+    path = str(tmpdir.join("bad.snap"))
+    for contents in [b"", b"not a snapshot" * 10]:
+        with open(path, "wb") as bad:
+            bad.write(contents)
+        with pytest.raises(DisallowedOperationException):
+            load_snapshot(path)
+    save_snapshot(Snapshot(networks=[], services=[], paths=[]), path)
+    with open(path, "r+b") as snapshot_file:
+        snapshot_file.seek(8)
+        snapshot_file.write(struct.pack("<H", 99))
+    with pytest.raises(DisallowedOperationException):
+        load_snapshot(path)
+
+
+def test_snapshot_file_ports(tmpdir):
+    """
+    Test that string ports load back as they were, and that services which are equal but separate
+    objects are only stored once.
+    """
+    network = Network("net", "vpc-1", "10.0.0.0/16", "us-east-1")
+
+    def web():
+        return Service(network, "web", [Subnetwork("subnet-1", None, "10.0.0.0/24", "us-east-1",
+                                                   "us-east-1a",
+                                                   [Instance("i-1", None, "10.0.0.1",
+                                                             "running")])])
+    internet = Service(None, None, [Subnetwork(None, None, "0.0.0.0/0", None, None, [])])
+    paths = [Path(network, internet, web(), "tcp", "80"),
+             Path(network, internet, web(), "tcp", "N/A"),
+             Path(network, internet, web(), "tcp", 443),
+             Path(network, internet, web(), "tcp", None)]
+    snapshot = Snapshot(networks=[network], services=[web()], paths=paths)
+    path = str(tmpdir.join("ports.snap"))
+    save_snapshot(snapshot, path)
+
+    with load_snapshot(path) as loaded:
+        assert [path.port for path in loaded.paths] == ["80", "N/A", 443, None]
+        assert {id(path.destination) for path in loaded.paths} == {id(loaded.services[0])}
+        # pylint: disable=protected-access
+        assert len(loaded._services._records) == 2
+        assert len(loaded._subnetworks._records) == 2
+        assert len(loaded._instances._records) == 1
+        service = snapshot.services[0]
+        assert encode_snapshot(loaded) == encode_snapshot(Snapshot(
+            networks=[network], services=[service],
+            paths=[attr.evolve(path, destination=service) for path in paths]))
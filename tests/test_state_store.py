@@ -0,0 +1,149 @@
+"""
+Tests for the local state store.
+"""
+import io
+import json
+import os
+import sqlite3
+import butter
+from butter.types.networking import CidrBlock
+from butter.util.graph_export import export_graph
+from butter.util.state_store import StateStore
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+def graph(snapshot):
+    """
+    Returns the JSON graph of "snapshot".
+    """
+    output = io.StringIO()
+    export_graph(snapshot, output, "json")
+    return json.loads(output.getvalue())
+
+
+def environment(tmpdir, account):
+    """
+    Returns a client with a state store, and a refreshed network with a "web" service open to the
+    internet on 443 and a "db" service open to it on 5432.
+    """
+    client = butter.Client("memory", {"account": account},
+                           state_store=str(tmpdir.join("state.db")))
+    network = client.network.create("net", blueprint=None)
+    web = client.service.create(network, "web", AWS_SERVICE_BLUEPRINT, {}, count=2)
+    database = client.service.create(network, "db", AWS_SERVICE_BLUEPRINT, {}, count=1)
+    client.paths.add(CidrBlock("0.0.0.0/0"), web, 443)
+    client.paths.add(web, database, 5432)
+    return client, network, web, database
+
+
+def test_state_store_reads(tmpdir):
+    """
+    Test that a client with a state store answers reads from it without calling the provider, but
+    only once it has been refreshed.
+    """
+    client, network, web, database = environment(tmpdir, "test_state_store_reads")
+    assert not client.state_store.fresh(300)
+    live = client.refresh()
+    assert client.state_store.fresh(300)
+    assert not client.state_store.fresh(None)
+
+    client.stats(reset=True)
+    assert client.network.list(max_staleness=300) == [network]
+    assert client.network.get("net", max_staleness=300) == network
+    assert client.service.list(max_staleness=300) == [web, database]
+    assert client.service.get(network, "db", max_staleness=300) == database
+    assert client.paths.has_access(web, database, 5432, max_staleness=300)
+    assert not client.paths.has_access(database, web, 5432, max_staleness=300)
+    assert client.paths.has_access(CidrBlock("8.8.8.8/32"), web, 443, max_staleness=300)
+    assert client.paths.internet_accessible(web, 443, max_staleness=300)
+    assert not client.paths.internet_accessible(database, 5432, max_staleness=300)
+    assert graph(client.snapshot(max_staleness=300)) == graph(live)
+    assert client.graph(max_staleness=300) == client.graph(max_staleness=300)
+    assert client.reachability(max_staleness=300).reachable_from_internet(port=443)
+    assert not client.stats()["calls"]
+    client.state_store.close()
+
+
+def test_state_store_mutations(tmpdir):
+    """
+    Test that mutations through the client update the store.
+    """
+    client, network, web, database = environment(tmpdir, "test_state_store_mutations")
+    client.refresh()
+    queue = client.service.create(network, "queue", AWS_SERVICE_BLUEPRINT, {}, count=1)
+    client.paths.add_many([(web, queue, 5672), (database, queue, 5672)])
+    client.paths.remove(web, database, 5432)
+    assert not client.paths.has_access(web, database, 5432, max_staleness=300)
+    assert client.paths.has_access(database, queue, 5672, max_staleness=300)
+    assert graph(client.snapshot(max_staleness=300)) == graph(client.snapshot())
+    client.service.destroy(queue)
+    assert client.service.list(max_staleness=300) == [web, database]
+    assert client.paths.list(max_staleness=300) == client.paths.list()
+
+    client.paths.remove(CidrBlock("0.0.0.0/0"), web, 443)
+    client.service.destroy(web)
+    client.service.destroy(database)
+    client.network.destroy(network)
+    client.refresh()
+    assert client.state_store.snapshot().networks == []
+    client.state_store.close()
+
+
+def test_state_store_repeated_adds(tmpdir):
+    """
+    Test that storing the same paths or services again doesn't duplicate them, and that storing a
+    service again keeps the paths to and from it.
+    """
+    client, _, web, database = environment(tmpdir, "test_state_store_repeated_adds")
+    client.refresh()
+    store = client.state_store
+    paths = store.paths()
+    for _ in range(3):
+        store.add_paths([(CidrBlock("0.0.0.0/0"), web, 443), (web, database, 5432)])
+    assert store.paths() == paths
+    with sqlite3.connect(store.path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM paths").fetchone()[0] == 2
+
+    store.add_service(web)
+    store.add_service(database)
+    assert store.services() == [web, database]
+    assert store.paths() == paths
+    store.close()
+
+
+def test_state_store_lookups(tmpdir):
+    """
+    Test looking up services by instance id and address, from another connection to the store.
+    """
+    client, _, web, _ = environment(tmpdir, "test_state_store_lookups")
+    client.refresh()
+    instance = web.subnetworks[0].instances[0]
+    store = StateStore(client.state_store.path)
+    assert store.service_with_instance(instance.instance_id) == web
+    assert store.service_with_instance(instance.private_ip) == web
+    assert store.service_with_instance("10.255.255.255") is None
+    assert store.fresh(300)
+    store.close()
+    with sqlite3.connect(client.state_store.path) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    client.state_store.close()
+
+
+def test_state_store_stale(tmpdir):
+    """
+    Test that reads go back to the provider once the store is stale.
+    """
+    client, _, web, database = environment(tmpdir, "test_state_store_stale")
+    client.refresh()
+    with sqlite3.connect(client.state_store.path) as connection:
+        connection.execute("UPDATE meta SET value = 0 WHERE key = 'refreshed_at'")
+    assert not client.state_store.fresh(300)
+    client.stats(reset=True)
+    assert client.service.list(max_staleness=300) == [web, database]
+    assert client.stats()["calls"]
+    client.state_store.close()
@@ -0,0 +1,81 @@
+"""
+Tests for operation tracing.
+"""
+import io
+import json
+import os
+import butter
+from butter.util.tracing import NO_SPAN, Tracer, span, traced
+
+EXAMPLE_BLUEPRINTS_DIR = os.path.join(os.path.dirname(__file__),
+                                      "..",
+                                      "example-blueprints")
+AWS_SERVICE_BLUEPRINT = os.path.join(EXAMPLE_BLUEPRINTS_DIR,
+                                     "aws-nginx", "blueprint.yml")
+
+
+@traced("traced_stage")
+def traced_stage():
+    """
+    Function to check that the "traced" decorator records spans.
+    """
+    with span("inner", answer=42):
+        return 42
+
+
+def test_tracing_disabled():
+    """
+    Test that nothing is recorded when not tracing.
+    """
+    assert span("nothing") is NO_SPAN
+    assert traced_stage() == 42
+
+
+def test_tracer():
+    """
+    Test that spans nest and export properly.
+    """
+    tracer = Tracer()
+    with tracer.span("outer", "operation"):
+        assert traced_stage() == 42
+        tracer.add_span("call", "call", 0.0)
+    tree = tracer.to_dict()
+    assert len(tree["spans"]) == 1
+    outer = tree["spans"][0]
+    assert outer["name"] == "outer"
+    assert [child["name"] for child in outer["children"]] == ["traced_stage", "call"]
+    inner = outer["children"][0]["children"][0]
+    assert inner["name"] == "inner"
+    assert inner["attributes"] == {"answer": 42}
+    assert outer["start"] <= inner["start"] <= inner["end"] <= outer["end"]
+
+    output = io.StringIO()
+    tracer.to_chrome_trace(output)
+    events = json.loads(output.getvalue())["traceEvents"]
+    assert sorted(event["name"] for event in events) == ["call", "inner", "outer",
+                                                         "traced_stage"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert json.loads(tracer.to_json()) == tree
+
+
+def test_client_trace():
+    """
+    Test that client operations, their stages, and their provider calls all get recorded.
+    """
+    client = butter.Client("memory", {"account": "test_client_trace"})
+    network = client.network.create("network", blueprint=None)
+    with client.trace() as tracer:
+        service = client.service.create(network, "service", AWS_SERVICE_BLUEPRINT, {})
+    span_count = len(tracer.spans)
+    client.service.destroy(service)
+    client.network.destroy(network)
+
+    tree = tracer.to_dict()
+    assert [root["name"] for root in tree["spans"]] == ["service.create"]
+    children = tree["spans"][0]["children"]
+    assert "instance_fitter" in [child["name"] for child in children]
+    assert "memory.create_service" in [child["name"] for child in children
+                                       if child["category"] == "call"]
+    # Nothing is recorded once the block exits.
+    assert len(tracer.spans) == span_count
+    assert client.recorder.tracer is None
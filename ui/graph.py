@@ -4,9 +4,9 @@ import os
 import sys
 import butter
 
-def print_graph(provider):
+def print_graph(provider, fmt="dot"):
     """
-    Print a graph of all services for provider.
+    Print a graph of all services for provider, in the format "fmt" ("dot", "json", or "graphml").
     """
     if provider == "aws":
         client = butter.Client("aws", {})
@@ -17,5 +17,6 @@ def print_graph(provider):
             "project": os.environ['BUTTER_GCE_PROJECT_NAME']})
     else:
         raise NotImplementedError("Provider %s not supported" % provider)
-    print(client.graph())
-print_graph(sys.argv[1])
+    # Write the graph out as it's generated, rather than building it all in memory first.
+    client.graph(sys.stdout, fmt)
+print_graph(*sys.argv[1:3])